@@ -9,12 +9,10 @@ import os
 import os.path as osp
 import re
 import webbrowser
-import numpy as np
 from PIL import Image
 
 import imgviz
-import natsort
-import cv2
+import numpy as np
 from qtpy import QtCore
 from qtpy.QtCore import Qt
 from qtpy import QtGui
@@ -25,14 +23,25 @@ from labelme import PY2
 
 
 from . import utils
+from labelme.autosave import AutosaveWriter
+from labelme.calibration import get_calibration
 from labelme.config import get_config
+from labelme.dataset_index import DatasetIndex
+from labelme.dataset_index import DatasetScanThread
+from labelme.edit_journal import apply_edits
+from labelme.edit_journal import EditJournal
 from labelme.label_file import LabelFile
 from labelme.label_file import LabelFileError
 from labelme.logger import logger
+from labelme.prefetch import FramePrefetcher
+from labelme.prefetch import neighbour_rows
+from labelme.preview_cache import DepthPreviewCache
 from labelme.shape import Shape
+from labelme.shape_history import ShapeHistory
 from labelme.widgets import BrightnessContrastDialog
 from labelme.widgets import Canvas
 from labelme.widgets import FileDialogPreview
+from labelme.widgets import FileListWidget
 from labelme.widgets import LabelDialog
 from labelme.widgets import LabelListWidget
 from labelme.widgets import LabelListWidgetItem
@@ -56,6 +65,9 @@ class MainWindow(QtWidgets.QMainWindow):
     #控制缩放模式的字典变量，参考self.scaler
     FIT_WINDOW, FIT_WIDTH, MANUAL_ZOOM = 0, 1, 2
 
+    # emitted by the autosave thread with the label file it failed to write
+    autosaveFailed = QtCore.Signal(str, object)
+
     #类构造函数，输入参数config，filename，output，output_file,output_dir,都来自与运行初始化参数
     def __init__(
         self,
@@ -188,15 +200,30 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.fileSearch = QtWidgets.QLineEdit()
         self.fileSearch.setPlaceholderText(self.tr("Search Filename"))
-        self.fileSearch.textChanged.connect(self.fileSearchChanged)
-        self.fileListWidget = QtWidgets.QListWidget()
+        # filter once typing pauses, not on every keystroke
+        self.fileSearchTimer = QtCore.QTimer(self)
+        self.fileSearchTimer.setSingleShot(True)
+        self.fileSearchTimer.setInterval(200)
+        self.fileSearchTimer.timeout.connect(self.fileSearchChanged)
+        self.fileSearch.textChanged.connect(
+            lambda: self.fileSearchTimer.start()
+        )
+        self.fileSearchMode = QtWidgets.QComboBox()
+        self.fileSearchMode.addItem(self.tr("Substring"), "substring")
+        self.fileSearchMode.addItem(self.tr("Glob"), "glob")
+        self.fileSearchMode.addItem(self.tr("Regex"), "regex")
+        self.fileSearchMode.currentIndexChanged.connect(self.fileSearchChanged)
+        self.fileListWidget = FileListWidget()
         self.fileListWidget.itemSelectionChanged.connect(
             self.fileSelectionChanged
         )
         fileListLayout = QtWidgets.QVBoxLayout()
         fileListLayout.setContentsMargins(0, 0, 0, 0)
         fileListLayout.setSpacing(0)
-        fileListLayout.addWidget(self.fileSearch)
+        fileSearchLayout = QtWidgets.QHBoxLayout()
+        fileSearchLayout.addWidget(self.fileSearch)
+        fileSearchLayout.addWidget(self.fileSearchMode)
+        fileListLayout.addLayout(fileSearchLayout)
         fileListLayout.addWidget(self.fileListWidget)
         self.file_dock = QtWidgets.QDockWidget(self.tr("File List"), self)
         self.file_dock.setObjectName("Files")
@@ -233,17 +260,21 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
         #canvasLeft，画布，帆布：对应的是整个界面还是说图片？
+        # one undo history for both canvases, so undo keeps them in step
+        self.history = ShapeHistory(
+            max_size=self._config["undo_max_size"] * 1024 ** 2
+        )
         self.canvasLeft = self.labelListColor.canvas = Canvas(
             epsilon=self._config["epsilon"],
             double_click=self._config["canvasLeft"]["double_click"],
-            num_backups=self._config["canvasLeft"]["num_backups"],
+            history=self.history,
         )
 
         #TODO Canvas2的功能只有显示，没有标注，看看怎么从canvas继承还是重写
         self.canvasRight = self.labelListDepth.canvas = Canvas(
             epsilon=self._config["epsilon"],
             double_click=self._config["canvasRight"]["double_click"],
-            num_backups=self._config["canvasRight"]["num_backups"],
+            history=self.history,
         )
         self.canvasLeft.zoomRequest.connect(self.zoomRequest)
         self.canvasRight.zoomRequest.connect(self.zoomRequest)
@@ -578,6 +609,14 @@ class MainWindow(QtWidgets.QMainWindow):
             self.tr("Undo last add and edit of shape"),
             enabled=False,
         )
+        redo = action(
+            self.tr("Redo"),
+            self.redoShapeEdit,
+            shortcuts["redo"],
+            None,
+            self.tr("Redo last undone add and edit of shape"),
+            enabled=False,
+        )
 
         hideAll = action(
             self.tr("&Hide\nPolygons"),
@@ -750,6 +789,7 @@ class MainWindow(QtWidgets.QMainWindow):
             paste=paste,
             undoLastPoint=undoLastPoint,
             undo=undo,
+            redo=redo,
             removePoint=removePoint,
             createMode=createMode,
             editMode=editMode,
@@ -780,6 +820,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 delete,
                 None,
                 undo,
+                redo,
                 undoLastPoint,
                 None,
                 removePoint,
@@ -802,6 +843,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 paste,
                 delete,
                 undo,
+                redo,
                 undoLastPoint,
                 removePoint,
             ),
@@ -916,6 +958,21 @@ class MainWindow(QtWidgets.QMainWindow):
             fitWidth,
         )
 
+        self.importThread = None
+        self.importLabel = QtWidgets.QLabel()
+        self.importProgress = QtWidgets.QProgressBar()
+        self.importProgress.setRange(0, 0)
+        self.importProgress.setMaximumWidth(120)
+        self.importCancelButton = QtWidgets.QPushButton(self.tr("Cancel"))
+        self.importCancelButton.clicked.connect(self.cancelImportDir)
+        for widget in [
+            self.importLabel,
+            self.importProgress,
+            self.importCancelButton,
+        ]:
+            self.statusBar().addPermanentWidget(widget)
+            widget.hide()
+
         self.statusBar().showMessage(str(self.tr("%s started.")) % __appname__)
         self.statusBar().show()
 
@@ -928,11 +985,38 @@ class MainWindow(QtWidgets.QMainWindow):
         self.output_file = output_file
         self.output_dir = output_dir
 
+        datasetIndex = self._config["dataset_index"]
+        if datasetIndex is not None:
+            datasetIndex = osp.expanduser(datasetIndex)
+        self.datasetIndex = DatasetIndex(datasetIndex)
+
+        self.autosaveWriter = AutosaveWriter(
+            delay=self._config["autosave_delay"]
+        )
+        self.autosaveFailed.connect(self.onAutosaveFailed)
+        # edits not yet in the open label file, replayed after a crash
+        self.journal = None
+
+        # Decoded neighbouring frames, so that next/prev is served from memory
+        self.prefetcher = FramePrefetcher(
+            cache_size=self._config["prefetch"]["cache_size"],
+            lookahead=self._config["prefetch"]["lookahead"],
+            num_workers=self._config["prefetch"]["num_workers"],
+            preview_cache=DepthPreviewCache(
+                cache_dir=self._config["depth_cache"]["dir"],
+                max_size=self._config["depth_cache"]["max_size"] * 1024 ** 2,
+            ),
+        )
+
         # Application state.
         #一些app的初始状态
         self.image = QtGui.QImage()
         self.imageDepth = QtGui.QImage()
+        # frame of the open depth image, its raw 16-bit depth is read only
+        # when shapes are projected
+        self.depthFrame = None
         self.imagePath = None
+        self._imageExtensions = None
         self.recentFiles = []
         self.maxRecent = 7
         self.otherData = None
@@ -1036,14 +1120,24 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def setDirty(self):
         # Even if we autosave the file, we keep the ability to undo
-        self.actions.undo.setEnabled(self.canvasLeft.isShapeRestorable or self.canvasRight.isShapeRestorable)
+        self.actions.undo.setEnabled(self.history.canUndo)
+        self.actions.redo.setEnabled(self.history.canRedo)
+        if self.journal is not None:
+            self.journal.record(*self.formatShapes())
         if self._config["auto_save"] or self.actions.saveAuto.isChecked():
-            label_file = osp.splitext(self.imagePath)[0] + ".json"
-            if self.output_dir:
-                label_file_without_path = osp.basename(label_file)
-                label_file = osp.join(self.output_dir, label_file_without_path)
-            self.saveLabels(label_file,self.saveMode)
+            if self.labelFile is not None:
+                label_file = self.labelFile.filename
+            else:
+                label_file = osp.splitext(self.imagePath)[0] + ".json"
+                if self.output_dir:
+                    label_file_without_path = osp.basename(label_file)
+                    label_file = osp.join(self.output_dir, label_file_without_path)
+            # written by the autosave thread once the edits pause
+            self.saveLabels(label_file, self.saveMode, background=True)
             return
+        self.setUnsaved()
+
+    def setUnsaved(self):
         self.dirty = True
         self.actions.save.setEnabled(True)
         title = __appname__
@@ -1051,6 +1145,16 @@ class MainWindow(QtWidgets.QMainWindow):
             title = "{} - {}*".format(title, self.filename)
         self.setWindowTitle(title)
 
+    def onAutosaveFailed(self, filename, error):
+        # the edits stay dirty, so they are saved by hand or asked about
+        # before the frame is left
+        if self.labelFile is not None and self.labelFile.filename == filename:
+            self.setUnsaved()
+        self.errorMessage(
+            self.tr("Error saving label data"),
+            self.tr("<b>%s</b><br>%s") % (filename, error),
+        )
+
     def setClean(self):
         self.dirty = False
         self.actions.save.setEnabled(False)
@@ -1092,6 +1196,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.filename = None
         self.imagePath = None
         self.imageData = None
+        self.depthFrame = None
         self.labelFile = None
         self.otherData = None
         self.canvasLeft.resetState()
@@ -1120,41 +1225,36 @@ class MainWindow(QtWidgets.QMainWindow):
     # Callbacks
     #unDo,函数如其名
     def undoShapeEdit(self):
+        self.applyShapeChanges(self.history.undo())
 
-        if self.nowFocus=='RGB':
-            if self.canvasLeft.isShapeRestorable:
-                self.canvasLeft.restoreShape()
-                self.labelListColor.clear()
-                self.labelListDepth.clear()
-                self.loadShapes(self.canvasLeft.shapes, self.canvasRight.shapes)
-                self.canvasRight.shapesBackups.pop()
-
-            elif self.canvasRight.isShapeRestorable:
-                self.canvasRight.restoreShape()
-                self.labelListColor.clear()
-                self.labelListDepth.clear()
-                self.loadShapes(self.canvasLeft.shapes, self.canvasRight.shapes)
-                self.canvasLeft.shapesBackups.pop()
-        else:
-            if self.canvasRight.isShapeRestorable:
-                self.canvasRight.restoreShape()
-                self.labelListColor.clear()
-                self.labelListDepth.clear()
-                self.loadShapes(self.canvasLeft.shapes, self.canvasRight.shapes)
-                self.canvasLeft.shapesBackups.pop()
-
-            elif self.canvasLeft.isShapeRestorable:
-                self.canvasLeft.restoreShape()
-                self.labelListColor.clear()
-                self.labelListDepth.clear()
-                self.loadShapes(self.canvasLeft.shapes, self.canvasRight.shapes)
-                self.canvasRight.shapesBackups.pop()
-
-
-        #FIXME 做出真正意义上的loadshapes
-
-        self.actions.undo.setEnabled(self.canvasLeft.isShapeRestorable or self.canvasRight.isShapeRestorable)
+    def redoShapeEdit(self):
+        self.applyShapeChanges(self.history.redo())
 
+    def applyShapeChanges(self, changes):
+        # update only the label items of the shapes the history changed
+        if not changes:
+            return
+        self._noSelectionSlot = True
+        for change in changes:
+            if change.canvas is self.canvasLeft:
+                labelList, addLabel = self.labelListColor, self.addLabelColor
+            else:
+                labelList, addLabel = self.labelListDepth, self.addLabelDepth
+            labelList.clearSelection()
+            for _, shape, _ in change.removed:
+                labelList.removeItem(labelList.findItemByShape(shape))
+            for i, shape, _ in change.added:
+                addLabel(shape)
+                labelList.moveItem(labelList.findItemByShape(shape), i)
+            if change.order is not None:
+                for i, shape in enumerate(change.canvas.shapes):
+                    labelList.moveItem(labelList.findItemByShape(shape), i)
+            for shape, _, _ in change.modified:
+                self._update_shape_color(shape)
+                self._setLabelItemText(labelList.findItemByShape(shape), shape)
+            change.canvas.restoreShape()
+        self._noSelectionSlot = False
+        self.setDirty()
 
     def tutorial(self):
         url = "https://github.com/wkentaro/labelme/tree/main/examples/tutorial"  # NOQA
@@ -1168,6 +1268,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.actions.editMode.setEnabled(not drawing)
         self.actions.undoLastPoint.setEnabled(drawing)
         self.actions.undo.setEnabled(not drawing)
+        self.actions.redo.setEnabled(not drawing and self.history.canRedo)
         self.actions.delete.setEnabled(not drawing)
 
     #这部分对应的是，右键选择创建多边形模式之后，就把现有的模式在右键菜单改变为不可选
@@ -1318,16 +1419,10 @@ class MainWindow(QtWidgets.QMainWindow):
         shape.label = text
         shape.flags = flags
         shape.group_id = group_id
+        self.history.commit()
 
         self._update_shape_color(shape)
-        if shape.group_id is None:
-            item.setText(
-                '{} <font color="#{:02x}{:02x}{:02x}">●</font>'.format(
-                    html.escape(shape.label), *shape.fill_color.getRgb()[:3]
-                )
-            )
-        else:
-            item.setText("{} ({})".format(shape.label, shape.group_id))
+        self._setLabelItemText(item, shape)
         self.setDirty()
         if not self.uniqLabelList.findItemsByLabel(shape.label):
             item = QtWidgets.QListWidgetItem()
@@ -1348,24 +1443,25 @@ class MainWindow(QtWidgets.QMainWindow):
             # self.canvasRight.repaint()
     #搜索文件相关，在文件listdock里
     def fileSearchChanged(self):
-        self.importDirImages(
-            self.lastOpenDir,
-            pattern=self.fileSearch.text(),
-            load=False,
-        )
+        self.fileSearchTimer.stop()
+        try:
+            self.fileListWidget.setFilter(
+                self.fileSearch.text(), mode=self.fileSearchMode.currentData()
+            )
+        except re.error:
+            # most likely an incomplete expression, keep the last result
+            return
 
     #和file在filelist dock里被选取有关
     def fileSelectionChanged(self):
-        items = self.fileListWidget.selectedItems()
-        if not items:
+        rows = self.fileListWidget.selectedRows()
+        if not rows:
             return
-        item = items[0]
 
         if not self.mayContinue():
             return
-        currIndex = self.imageList.index(str(item.text()))   # self.lastOpenDir
-        if currIndex < len(self.imageList):
-            filename = self.imageList[currIndex]
+        if rows[0] < len(self.imageList):
+            filename = self.imageList[rows[0]]
 
             if filename:
                 fileNameDepth = filename[:filename.index('color')] + 'depth.png'
@@ -1381,11 +1477,15 @@ class MainWindow(QtWidgets.QMainWindow):
     #一旦选择到shape就会调用此函数，用于更改shape是否被选中的状态
     #FIXME Canvas判斷1
     def shapeSelectionChangedColor(self, selected_shapes):
-        self.nowFocus='RGB'
-        self._noSelectionSlot = True
-        self.canvasRight.deSelectShape()
         for shape in self.canvasLeft.selectedShapes:
             shape.selected = False
+        # deSelectShape runs shapeSelectionChangedDepth, which sets the
+        # focus and clears _noSelectionSlot when it is done, and deselects
+        # this canvas again unless its selection is cleared first
+        self.canvasLeft.selectedShapes = []
+        self.canvasRight.deSelectShape()
+        self.nowFocus='RGB'
+        self._noSelectionSlot = True
         self.labelListColor.clearSelection()
         self.canvasLeft.selectedShapes = selected_shapes
         for shape in self.canvasLeft.selectedShapes:
@@ -1402,11 +1502,12 @@ class MainWindow(QtWidgets.QMainWindow):
         self.actions.edit.setEnabled(n_selected == 1)
 
     def shapeSelectionChangedDepth(self, selected_shapes):
-        self.nowFocus = 'Depth'
-        self._noSelectionSlot = True
-        self.canvasLeft.deSelectShape()
         for shape in self.canvasRight.selectedShapes:
             shape.selected = False
+        self.canvasRight.selectedShapes = []
+        self.canvasLeft.deSelectShape()
+        self.nowFocus = 'Depth'
+        self._noSelectionSlot = True
         self.labelListDepth.clearSelection()
         self.canvasRight.selectedShapes = selected_shapes
         for shape in self.canvasRight.selectedShapes:
@@ -1468,6 +1569,16 @@ class MainWindow(QtWidgets.QMainWindow):
             )
         )
 
+    def _setLabelItemText(self, item, shape):
+        if shape.group_id is None:
+            item.setText(
+                '{} <font color="#{:02x}{:02x}{:02x}">●</font>'.format(
+                    html.escape(shape.label), *shape.fill_color.getRgb()[:3]
+                )
+            )
+        else:
+            item.setText("{} ({})".format(shape.label, shape.group_id))
+
     #更新颜色，通过get rgb by label函数得到rgb，然后赋值到shape数据结构里
     def _update_shape_color(self, shape):
         r, g, b = self._get_rgb_by_label(shape.label)
@@ -1510,112 +1621,58 @@ class MainWindow(QtWidgets.QMainWindow):
     #读取shape
     # TODO 两边显示点管线：读取形状，如果此函数加入了canvasright，就是同时显示两边，那符合需求吗，试一试
     # FIXME Canvas判斷4
-    def loadShapeSync(self, shapestoR, shapestoD, replace=True):
-        self._noSelectionSlot = True
-        labelShapeColor = []
-        labelShapeDepth = []
-        dupR = []
-        dupD = []
-        dupROri = []
-        dupDOri = []
-        for it in self.labelListColor:
-            labelShapeColor.append(it.shape())
-        for it in self.labelListDepth:
-            labelShapeDepth.append(it.shape())
-        for it in shapestoR:
-            for it2 in labelShapeColor:
-                if it.label == it2.label:
-                    dupD.append(it)
-                    dupDOri.append(it2)
-
-        for it in shapestoD:
-            for it2 in labelShapeDepth:
-                if it.label == it2.label:
-                    dupR.append(it)
-                    dupROri.append(it2)
-
-        if len(dupD)!=0:
-            reply = QtWidgets.QMessageBox.question(self, 'Message', 'Points {} have been exist in RGB canvas. Do you want to overwrite them?'.format([it.label for it in dupD]),
-                                                   QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
-                                                   QtWidgets.QMessageBox.No)
-
-            if reply == QtWidgets.QMessageBox.No:
-                for it in dupD:
-                    for it2 in shapestoR:
-                        if it2.label == it.label:
-                            shapestoR.remove(it2)
-                # label shape里去除现在说重复的shape，然后加上整个shapeto，
-                labelShapeColor = labelShapeColor + shapestoR
-            else:
-                for it2 in dupDOri:
-                    for it in labelShapeColor:
-                        if it.label == it2.label:
-                            item = self.labelListColor.findItemByShape(it)
-                            self.labelListColor.removeItem(item)
-                            labelShapeColor.remove(it)
-                            if len(labelShapeColor) == 0:
-                                break
-                    if len(labelShapeColor)==0:
-                        break
-                labelShapeColor = labelShapeColor + shapestoR
-
-        elif len(dupR)!=0:
-            reply = QtWidgets.QMessageBox.question(self, 'Message', 'Points {} have been exist in Depth canvas. Do you want to overwrite them?'.format([it.label for it in dupR]),
-                                                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
-                                                QtWidgets.QMessageBox.No)
-
-            if reply == QtWidgets.QMessageBox.No:
-                for it in dupR:
-                    for it2 in shapestoD:
-                        if it2.label == it.label:
-                            shapestoD.remove(it2)
-
-                #label shape里去除现在说重复的shape，然后加上整个shapeto，
-                labelShapeDepth = labelShapeDepth + shapestoD
-            else:
-                for it2 in dupROri:
-                    for it in labelShapeDepth:
-                        if it.label==it2.label:
-                            item = self.labelListDepth.findItemByShape(it)
-                            self.labelListDepth.removeItem(item)
-                            labelShapeDepth.remove(it)
-                            if len(labelShapeColor) == 0:
-                                break
-                    if len(labelShapeDepth)==0:
-                        break
-                labelShapeDepth=labelShapeDepth+shapestoD
-        else:
-            labelShapeDepth = labelShapeDepth + shapestoD
-            labelShapeColor = labelShapeColor + shapestoR
-        if len(shapestoR) != 0:
-            for shape in shapestoR:
-                self.addLabelColor(shape)
-            self.labelListColor.clearSelection()
-            self.canvasLeft.loadShapes(labelShapeColor, replace=replace)
-            self.canvasLeft.selectShapes(labelShapeColor)
-            self.canvasLeft.deSelectShape()
-            for it in shapestoR:
-                itm=self.labelListColor.findItemByShape(it)
-                self.labelListColor.selectItem(itm)
-            self.nowFocus = 'RGB'
-
-
-
-        if len(shapestoD) != 0:
-            for shape in shapestoD:
-                self.addLabelDepth(shape)
-            self.labelListDepth.clearSelection()
-            self.canvasRight.loadShapes(labelShapeDepth, replace=replace)
-            self.canvasRight.selectShapes(labelShapeDepth)
-            self.canvasRight.deSelectShape()
-            for it in shapestoD:
-                itm=self.labelListDepth.findItemByShape(it)
-                self.labelListDepth.selectItem(itm)
-            self.nowFocus = 'Depth'
-
-
+    def loadShapeSync(self, shapestoR, shapestoD):
+        """Merge shapes transferred from the other view by label.
 
-        self._noSelectionSlot = False
+        A shape whose label is in the canvas already replaces that shape
+        in place, if the user agrees, and the others are appended.
+        """
+        targets = [
+            (
+                shapestoR,
+                self.canvasLeft,
+                self.labelListColor,
+                self.addLabelColor,
+                "RGB",
+            ),
+            (
+                shapestoD,
+                self.canvasRight,
+                self.labelListDepth,
+                self.addLabelDepth,
+                "Depth",
+            ),
+        ]
+        for shapes, canvas, labelList, addLabel, view in targets:
+            if not shapes:
+                continue
+            labels = {shape.label for shape in canvas.shapes}
+            dup = [shape.label for shape in shapes if shape.label in labels]
+            if dup:
+                reply = QtWidgets.QMessageBox.question(
+                    self,
+                    "Message",
+                    "Points {} have been exist in {} canvas. "
+                    "Do you want to overwrite them?".format(dup, view),
+                    QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+                    QtWidgets.QMessageBox.No,
+                )
+                if reply == QtWidgets.QMessageBox.No:
+                    shapes = [s for s in shapes if s.label not in labels]
+            self._noSelectionSlot = True
+            labelList.clearSelection()
+            for shape, old in zip(shapes, canvas.mergeShapes(shapes)):
+                if old is None:
+                    addLabel(shape)
+                    continue
+                # the row keeps its place and check state
+                item = labelList.findItemByShape(old)
+                item.setShape(shape)
+                self._update_shape_color(shape)
+                self._setLabelItemText(item, shape)
+            self._noSelectionSlot = False
+            if shapes:
+                canvas.selectShapes(shapes)
 
     def loadShapes(self, shapesR, shapesD, replace=True):
         self._noSelectionSlot = True
@@ -1786,9 +1843,8 @@ class MainWindow(QtWidgets.QMainWindow):
             item.setCheckState(Qt.Checked if flag else Qt.Unchecked)
             self.flag_widget.addItem(item)
 
-    #保存label
-    def saveLabels(self, filename,savemode):
-        lf = LabelFile()
+    def formatShapes(self):
+        """Return the shapes of both label lists as saved in label files."""
 
         def format_shape(s):
             data = s.other_data.copy()
@@ -1802,6 +1858,16 @@ class MainWindow(QtWidgets.QMainWindow):
                 )
             )
             return data
+
+        return (
+            [format_shape(item.shape()) for item in self.labelListColor],
+            [format_shape(item.shape()) for item in self.labelListDepth],
+        )
+
+    #保存label
+    def saveLabels(self, filename, savemode, background=False):
+        lf = LabelFile()
+
         #TODO 在此写入固定的dict内容，包括所有的部位label
         #我想的是，shapes的结构先不变，按照梁佳敏的存，然后在shapes里找，看看label里哪些有变化，就替换，这样保证shapes结构不变
         oridict={
@@ -1819,28 +1885,27 @@ class MainWindow(QtWidgets.QMainWindow):
         #     shape_dictR.append(dictit)
         #     shape_dictD.append(dictit)
 
-        shapesColor = [format_shape(item.shape()) for item in self.labelListColor]
-        shapesDepth = [format_shape(item.shape()) for item in self.labelListDepth]
-        with open(filename, 'r', encoding='utf8') as fp:
-            json_data = json.load(fp)
-        shape_dictR=json_data['shapes_rgb']
-        shape_dictD = json_data['shapes_depth']
+        shapesColor, shapesDepth = self.formatShapes()
+        # the open label file holds the joints as last saved, so nothing
+        # has to be read back from disk
+        document = self.labelFile
+        if document is None or document.savedShapesRGB is None:
+            try:
+                document = LabelFile(filename)
+            except LabelFileError as e:
+                self.errorMessage(
+                    self.tr("Error saving label data"), self.tr("<b>%s</b>") % e
+                )
+                return False
         if len(shapesColor)>26 or len(shapesDepth)>26:
             self.errorMessage(
                 self.tr("Error saving label data,Label more than 26."),self.tr("Repeat shape:{}")
             )
 
         #TODO ！！！！！保存函数！！！！！把标的shapes替换到对应dict位置
-        for its in shapesColor:
-            find=its['label']
-            for i in range(0,len(shape_dictR)):
-                if shape_dictR[i]['label']==find:
-                    shape_dictR[i]=its
-        for its in shapesDepth:
-            find=its['label']
-            for i in range(0,len(shape_dictD)):
-                if shape_dictD[i]['label']==find:
-                    shape_dictD[i]=its
+        shape_dictR, shape_dictD = document.merge_shapes(
+            shapesColor, shapesDepth
+        )
         if savemode=='R':
             shape_dictR=shape_dictR
             shape_dictD=shape_dictD
@@ -1864,6 +1929,25 @@ class MainWindow(QtWidgets.QMainWindow):
             imageData = self.imageData if self._config["store_data"] else None
             if osp.dirname(filename) and not osp.exists(osp.dirname(filename)):
                 os.makedirs(osp.dirname(filename))
+            journal = self.journal
+            if journal is not None and journal.label_file != filename:
+                journal = None
+            if background:
+                callback = None
+                if journal is not None:
+                    # edits made while the write is queued stay journaled
+                    callback = functools.partial(
+                        journal.mark_saved, journal.seq
+                    )
+                writer = functools.partial(
+                    self.autosaveWriter.submit,
+                    callback=callback,
+                    errback=functools.partial(
+                        self.autosaveFailed.emit, filename
+                    ),
+                )
+            else:
+                writer = self.autosaveWriter.write
             lf.save(
                 filename=filename,
                 shapes_rgb=shape_dictR,
@@ -1874,16 +1958,14 @@ class MainWindow(QtWidgets.QMainWindow):
                 imageData=imageData,
                 otherData=self.otherData,
                 flags=flags,
+                writer=writer,
             )
+            if journal is not None and not background:
+                journal.mark_saved(journal.seq)
 
             self.labelFile = lf
-            items = self.fileListWidget.findItems(
-                self.imagePath, Qt.MatchExactly
-            )
-            if len(items) > 0:
-                if len(items) != 1:
-                    raise RuntimeError("There are duplicate files.")
-                items[0].setCheckState(Qt.Checked)
+            self.prefetcher.invalidate(filename)
+            self.fileListWidget.setChecked(osp.basename(self.imagePath), True)
             # disable allows next and previous image to proceed
             # self.filename = filename
             return True
@@ -1923,10 +2005,42 @@ class MainWindow(QtWidgets.QMainWindow):
         self._copied_shapes = [s.copy() for s in self.canvasLeft.selectedShapes]
         self.actions.paste.setEnabled(len(self._copied_shapes) > 0)
 
+    def projectShapes(self, shapes, toDepth):
+        """Move shapes copied to the other view where the camera sees them.
+
+        Without a calibration file, or for points the depth image has no
+        value for, the coordinates are kept as they are.
+        """
+        if not shapes or self.filename is None:
+            return
+        calibration = get_calibration(osp.dirname(self.filename))
+        if calibration is None or self.depthFrame is None:
+            return
+        depth = self.depthFrame.depth
+        if depth is None:
+            return
+        points = np.concatenate([s.xy for s in shapes])
+        if toDepth:
+            size = (self.image.width(), self.image.height())
+            projected = calibration.color_to_depth(points, depth, size)
+        else:
+            projected = calibration.depth_to_color(points, depth)
+        valid = ~np.isnan(projected).any(axis=1)
+        projected = np.where(valid[:, None], projected, points)
+        start = 0
+        for shape in shapes:
+            shape.points = projected[start : start + len(shape)]
+            start += len(shape)
+
     def transferSelectedShape(self):
         added_shapesL = [s.copy() for s in self.canvasLeft.selectedShapes]
         added_shapesR = [s.copy() for s in self.canvasRight.selectedShapes]
-        self.loadShapeSync(added_shapesR,added_shapesL, replace=True)
+        # joints of the color view go to the depth view and the other way
+        self.projectShapes(added_shapesL, toDepth=True)
+        self.projectShapes(added_shapesR, toDepth=False)
+        self.loadShapeSync(added_shapesR, added_shapesL)
+        # one undo step for the joints merged into both canvases
+        self.history.commit()
         self.setDirty()
 
         self.toggleDrawMode(True)
@@ -2010,6 +2124,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
     #labelOrderChanged
     def labelOrderChangedRGB(self):
+        if self._noSelectionSlot:
+            # items removed by the app, not dragged by the user
+            return
         self.setDirty()
         #TODO LabelList要分开
         self.canvasLeft.loadShapes([item.shape() for item in self.labelListColor])
@@ -2024,6 +2141,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
     #labelOrderChanged
     def labelOrderChangedDepth(self):
+        if self._noSelectionSlot:
+            # items removed by the app, not dragged by the user
+            return
         self.setDirty()
         #TODO LabelList要分开
         self.canvasRight.loadShapes([item.shape() for item in self.labelListDepth])
@@ -2079,8 +2199,7 @@ class MainWindow(QtWidgets.QMainWindow):
         if text:
             self.labelListColor.clearSelection()
             self.labelListDepth.clearSelection()
-            shape = self.canvasRight.setLastLabel(text, flags)
-            shape.group_id = group_id
+            shape = self.canvasRight.setLastLabel(text, flags, group_id)
             self.addLabelDepth(shape)
             self.actions.editMode.setEnabled(True)
             self.actions.undoLastPoint.setEnabled(False)
@@ -2088,7 +2207,6 @@ class MainWindow(QtWidgets.QMainWindow):
             self.setDirty()
         else:
             self.canvasRight.undoLastLine()
-            self.canvasRight.shapesBackups.pop()
 
     def newShapeRGB(self):
         """Pop-up and give focus to the label editor.
@@ -2137,8 +2255,7 @@ class MainWindow(QtWidgets.QMainWindow):
         if text:
             self.labelListColor.clearSelection()
             self.labelListDepth.clearSelection()
-            shape = self.canvasLeft.setLastLabel(text, flags)
-            shape.group_id = group_id
+            shape = self.canvasLeft.setLastLabel(text, flags, group_id)
             self.addLabelColor(shape)
             self.actions.editMode.setEnabled(True)
             self.actions.undoLastPoint.setEnabled(False)
@@ -2146,7 +2263,6 @@ class MainWindow(QtWidgets.QMainWindow):
             self.setDirty()
         else:
             self.canvasLeft.undoLastLine()
-            self.canvasLeft.shapesBackups.pop()
 
     #和画布有关的缩放滚动
     def scrollRequest(self, delta, orientation):
@@ -2322,20 +2438,50 @@ class MainWindow(QtWidgets.QMainWindow):
                    'calibrationExist': True, 'creator': 'default', 'reviewer': None}
         with open(filename, 'w') as f:
             json.dump(jsontext,f,indent=4,ensure_ascii=False)
+        self.prefetcher.invalidate(filename)
 
     #读取文件，这个可能要改动
 
 
     def calThresh(self, data):
-        flat_data = data.flatten()
-        flat_data = np.sort(flat_data)
-        flat_data = flat_data[:int(0.97 * flat_data.size)]  # use 97% data to eliminate outliers
+        return utils.depth_threshold(data)
+
+    def getLabelFileSelect(self, filenameRGB=None, filenameDepth=None):
+        if filenameRGB is not None:
+            label_file = osp.splitext(filenameRGB)[0]
+            label_file = label_file[: label_file.index("color")] + "label.json"
+        elif filenameDepth is not None:
+            label_file = osp.splitext(filenameDepth)[0]
+            label_file = label_file[: label_file.index("depth")] + "label.json"
+        if self.output_dir:
+            label_file_without_path = osp.basename(label_file)
+            label_file = osp.join(self.output_dir, label_file_without_path)
+        return label_file
 
-        mean = np.mean(flat_data)
-        sigma = np.std(flat_data)
-        # print(mean + 3*sigma)
-        thresh = np.uint16(mean + 3 * sigma)
-        return thresh
+    def prefetchNeighbours(self, filename):
+        imageList = self.imageList
+        currIndex = self.fileListWidget.row(osp.basename(filename))
+        if self.lastOpenDir is None or currIndex == -1:
+            return
+        keys = []
+        for row in neighbour_rows(
+            currIndex,
+            len(imageList),
+            self.prefetcher.lookahead,
+        ):
+            name = imageList[row]
+            fileNameRGB = osp.join(self.lastOpenDir, name)
+            fileNameDepth = osp.join(
+                self.lastOpenDir, name[: name.index("color")] + "depth.png"
+            )
+            keys.append(
+                (
+                    fileNameRGB,
+                    fileNameDepth,
+                    self.getLabelFileSelect(fileNameRGB, fileNameDepth),
+                )
+            )
+        self.prefetcher.prefetch(keys)
 
     # TODO 读取文件
     def loadFileSelect(self, filenameRGB=None, filenameDepth=None):
@@ -2346,23 +2492,23 @@ class MainWindow(QtWidgets.QMainWindow):
             if filenameRGB is not None:
                 filenameBasename = filenameRGB.replace(self.lastOpenDir + '\\', '')
 
-                if filenameBasename in self.imageList and (
-                        self.fileListWidget.currentRow() != self.imageList.index(filenameBasename)
-                ):
-                    self.fileListWidget.setCurrentRow(self.imageList.index(filenameBasename))
+                row = self.fileListWidget.row(filenameBasename)
+                if row != -1 and self.fileListWidget.currentRow() != row:
+                    self.fileListWidget.setCurrentRow(row)
                     self.fileListWidget.repaint()
                     return
 
             if filenameDepth is not None:
                 filenameDepthBasename = filenameDepth.replace(self.lastOpenDir + '\\', '')
 
-                if filenameDepthBasename in self.imageList and (
-                        self.fileListWidget.currentRow() != self.imageList.index(filenameDepthBasename)
-                ):
-                    self.fileListWidget.setCurrentRow(self.imageList.index(filenameDepthBasename))
+                row = self.fileListWidget.row(filenameDepthBasename)
+                if row != -1 and self.fileListWidget.currentRow() != row:
+                    self.fileListWidget.setCurrentRow(row)
                     self.fileListWidget.repaint()
                     return
 
+        # the label file of the next frame may still be queued
+        self.autosaveWriter.flush()
         self.resetState()
         self.canvasLeft.setEnabled(False)
         self.canvasRight.setEnabled(False)
@@ -2387,76 +2533,55 @@ class MainWindow(QtWidgets.QMainWindow):
             )
 
         # TODO
-        if filenameRGB is not None:
-            label_fileColor = osp.splitext(filenameRGB)[0]
-            label_fileColor = label_fileColor[:label_fileColor.index('color')] + 'label.json'
-        elif filenameDepth is not None:
-            label_fileColor = osp.splitext(filenameDepth)[0]
-            label_fileColor = label_fileColor[:label_fileColor.index('depth')] + 'label.json'
-        label_fileDepth = label_fileColor
-        if self.output_dir:
-            label_file_without_path_Color = osp.basename(label_fileColor)
-            label_fileColor = osp.join(self.output_dir, label_file_without_path_Color)
-            label_file_without_path_Depth = osp.basename(label_fileDepth)
-            label_fileDepth = osp.join(self.output_dir, label_file_without_path_Depth)
-        if QtCore.QFile.exists(label_fileColor) and LabelFile.is_label_file(
-                label_fileColor
-        ):
-            try:
-                self.labelFile = LabelFile(label_fileColor)
-            except LabelFileError as e:
-                # TODO 创建默认Json文件
-                self.saveDefaultLabels(label_fileColor)
-                self.labelFile = LabelFile(label_fileColor)
-            self.imageData = self.labelFile.imageData
+        label_fileColor = self.getLabelFileSelect(filenameRGB, filenameDepth)
+        labelFileExists = QtCore.QFile.exists(
+            label_fileColor
+        ) and LabelFile.is_label_file(label_fileColor)
+        frame = self.prefetcher.get(
+            (filenameRGB, filenameDepth, label_fileColor)
+        )
+        self.labelFile = frame.labelFile
+        if self.labelFile is None:
+            # TODO 创建默认Json文件
+            self.saveDefaultLabels(label_fileColor)
+            self.labelFile = LabelFile(label_fileColor)
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = EditJournal(label_fileColor)
+        edits = self.journal.recover()
+        if edits is not None:
+            # unsaved edits of a session that crashed, the prefetched frame
+            # must not keep them if they are discarded
+            self.prefetcher.invalidate(label_fileColor)
+            self.labelFile.shapesRGB = apply_edits(
+                self.labelFile.shapesRGB, edits["rgb"]
+            )
+            self.labelFile.shapesDepth = apply_edits(
+                self.labelFile.shapesDepth, edits["depth"]
+            )
+        if labelFileExists:
+            if filenameRGB is None:
+                # the color frame below already carries the image bytes
+                self.imageData = self.labelFile.imageData
             self.imagePath = osp.join(
                 osp.dirname(label_fileColor),
                 self.labelFile.imagePath,
             )
             self.otherData = self.labelFile.otherData
 
-        else:
-
-            try:
-                self.labelFile = LabelFile(label_fileColor)
-            except LabelFileError as e:
-
-                # TODO 创建默认Json文件
-                self.saveDefaultLabels(label_fileColor)
-                self.labelFile = LabelFile(label_fileColor)
-
-
         # if os.path.exists(filenameRGB):
         if filenameRGB is not None:
 
-            self.imageData = LabelFile.load_image_file(filenameRGB)
+            self.imageData = frame.imageData
             if self.imageData:
                 self.imagePath = filenameRGB
             # self.labelFile = None
-            image = QtGui.QImage.fromData(self.imageData)
+            image = frame.image
 
         # if os.path.exists(filenameDepth):
         if filenameDepth is not None:
-            self.imageDataDepthori = cv2.imread(filenameDepth, cv2.IMREAD_ANYDEPTH)
-            widthD = self.imageDataDepthori.shape[1]
-            heightD = self.imageDataDepthori.shape[0]
-            img_rgb_data = self.imageDataDepthori
-
-            thresh = self.calThresh(img_rgb_data)
-
-            img_rgb_data[img_rgb_data > thresh] = thresh
-            min_value = np.min(img_rgb_data)
-            max_value = np.max(img_rgb_data)
-
-            img_rgb_data = (img_rgb_data - min_value) * 255. / (max_value - min_value)
-            img_rgb_data = np.uint8(img_rgb_data)
-
-            img_rgb_data = cv2.applyColorMap(img_rgb_data, colormap=cv2.COLORMAP_BONE)
-            # cv2 中的色度图有十几种，其中最常用的是 cv2.COLORMAP_JET，蓝色表示较高的深度值，红色表示较低的深度值。
-            # cv.convertScaleAbs() 函数中的 alpha 的大小与深度图中的有效距离有关，如果像我一样默认深度图中的所有深度值都在有效距离内，并已经手动将16位深度转化为了8位深度，则 alpha 可以设为1。
-            img_rgb_data = cv2.applyColorMap(cv2.convertScaleAbs(img_rgb_data, alpha=1), cv2.COLORMAP_BONE)
-            # image = QtGui.QImage.fromData(self.imageData)
-            imageDepth = QtGui.QImage(img_rgb_data.data, widthD, heightD, widthD * 3, QtGui.QImage.Format_RGB888)
+            self.depthFrame = frame
+            imageDepth = frame.imageDepth
 
         # self.image = image
         # self.imageDepth = imageDepth
@@ -2492,9 +2617,16 @@ class MainWindow(QtWidgets.QMainWindow):
             if self.labelFile.flags is not None:
                 flags.update(self.labelFile.flags)
         self.loadFlags(flags)
+        self.journal.reset(*self.formatShapes())
+        self.history.reset()
         if self._config["keep_prev"] and self.noShapes():
             self.loadShapes(prev_shapes, replace=False)
             self.setDirty()
+        elif edits is not None:
+            self.setDirty()
+            logger.info(
+                "Recovered unsaved edits of {}".format(label_fileColor)
+            )
         else:
             self.setClean()
         # self.canvasLeft.setEnabled(True)
@@ -2517,11 +2649,6 @@ class MainWindow(QtWidgets.QMainWindow):
 
         if filenameRGB is not None:
             # set brightness contrast values
-            dialog = BrightnessContrastDialog(
-                utils.img_data_to_pil(self.imageData),
-                self.onNewBrightnessContrast,
-                parent=self,
-            )
             brightness, contrast = self.brightnessContrast_values.get(
                 self.filename, (None, None)
             )
@@ -2533,12 +2660,19 @@ class MainWindow(QtWidgets.QMainWindow):
                 _, contrast = self.brightnessContrast_values.get(
                     self.recentFiles[0], (None, None)
                 )
-            if brightness is not None:
-                dialog.slider_brightness.setValue(brightness)
-            if contrast is not None:
-                dialog.slider_contrast.setValue(contrast)
             self.brightnessContrast_values[self.filename] = (brightness, contrast)
             if brightness is not None or contrast is not None:
+                # the dialog decodes the image again, so only build it when
+                # there is something to apply
+                dialog = BrightnessContrastDialog(
+                    utils.img_data_to_pil(self.imageData),
+                    self.onNewBrightnessContrast,
+                    parent=self,
+                )
+                if brightness is not None:
+                    dialog.slider_brightness.setValue(brightness)
+                if contrast is not None:
+                    dialog.slider_contrast.setValue(contrast)
                 dialog.onNewValue(None)
 
             # TODO 搞清這些函數是幹啥的
@@ -2573,6 +2707,8 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.UpdatePInfo()   # auto save
                 
         self.patientINFO.Update.clicked.connect(lambda: self.UpdatePInfo())
+        if filenameRGB is not None:
+            self.prefetchNeighbours(filenameRGB)
         return True
 
     def resizeEvent(self, event):
@@ -2627,6 +2763,14 @@ class MainWindow(QtWidgets.QMainWindow):
     def closeEvent(self, event):
         if not self.mayContinue():
             event.ignore()
+        else:
+            self.autosaveWriter.shutdown()
+            if self.journal is not None:
+                self.journal.close()
+            self.cancelImportDir()
+            for thread in self.findChildren(DatasetScanThread):
+                thread.wait()
+            self.prefetcher.shutdown()
         self.settings.setValue(
             "filename", self.filename if self.filename else ""
         )
@@ -2680,7 +2824,7 @@ class MainWindow(QtWidgets.QMainWindow):
         if self.filename is None:
             return
 
-        currIndex = self.imageList.index(osp.basename(self.filename))
+        currIndex = self.fileListWidget.row(osp.basename(self.filename))
         if currIndex - 1 >= 0:
             filename = self.imageList[currIndex - 1]
             if filename and load:
@@ -2709,8 +2853,10 @@ class MainWindow(QtWidgets.QMainWindow):
         if self.filename is None:
             filename = self.imageList[0]
         else:
-            currIndex = self.imageList.index(osp.basename(self.filename))
-            if currIndex + 1 < len(self.imageList):
+            currIndex = self.fileListWidget.row(osp.basename(self.filename))
+            if currIndex == -1:
+                filename = self.imageList[0]
+            elif currIndex + 1 < len(self.imageList):
                 filename = self.imageList[currIndex + 1]
             else:
                 filename = self.imageList[-1]
@@ -2798,10 +2944,10 @@ class MainWindow(QtWidgets.QMainWindow):
         current_filename = self.filename
         self.importDirImages(self.lastOpenDir, load=False)
 
-        if current_filename in self.imageList:
+        if self.fileListWidget.row(current_filename) != -1:
             # retain currently selected file
             self.fileListWidget.setCurrentRow(
-                self.imageList.index(current_filename)
+                self.fileListWidget.row(current_filename)
             )
             self.fileListWidget.repaint()
 
@@ -2864,6 +3010,9 @@ class MainWindow(QtWidgets.QMainWindow):
     def closeFile(self, _value=False):
         if not self.mayContinue():
             return
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
         self.resetState()
         self.setClean()
         self.toggleActions(False)
@@ -2889,12 +3038,14 @@ class MainWindow(QtWidgets.QMainWindow):
             return
 
         label_file = self.getLabelFile()
+        self.autosaveWriter.cancel(label_file)
+        if self.journal is not None and self.journal.label_file == label_file:
+            self.journal.discard()
         if osp.exists(label_file):
             os.remove(label_file)
             logger.info("Label file is removed: {}".format(label_file))
 
-            item = self.fileListWidget.currentItem()
-            item.setCheckState(Qt.Unchecked)
+            self.fileListWidget.setChecked(osp.basename(self.filename), False)
 
             self.resetState()
 
@@ -2930,6 +3081,8 @@ class MainWindow(QtWidgets.QMainWindow):
             mb.Save,
         )
         if answer == mb.Discard:
+            if self.journal is not None:
+                self.journal.discard()
             return True
         elif answer == mb.Save:
             self.saveFile()
@@ -3037,11 +3190,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
     @property
     def imageList(self):
-        lst = []
-        for i in range(self.fileListWidget.count()):
-            item = self.fileListWidget.item(i)
-            lst.append(item.text())
-        return lst
+        # the list held by the model, do not modify it
+        return self.fileListWidget.names()
 
     def importDroppedImageFiles(self, imageFiles):
         extensions = [
@@ -3051,9 +3201,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.filename = None
         for file in imageFiles:
-            if file in self.imageList or not file.lower().endswith(
-                tuple(extensions)
-            ):
+            if self.fileListWidget.row(
+                osp.basename(file)
+            ) != -1 or not file.lower().endswith(tuple(extensions)):
                 continue
             label_file = osp.splitext(file)[0] + ".json"
             if self.output_dir:
@@ -3061,15 +3211,13 @@ class MainWindow(QtWidgets.QMainWindow):
                 label_file = osp.join(self.output_dir, label_file_without_path)
             fileBasename = osp.basename(file)
             self.lastOpenDir = file.replace(fileBasename, "")
-            item = QtWidgets.QListWidgetItem(fileBasename)
-            item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-            if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(
-                label_file
-            ):
-                item.setCheckState(Qt.Checked)
-            else:
-                item.setCheckState(Qt.Unchecked)
-            self.fileListWidget.addItem(item)
+            self.fileListWidget.addFiles(
+                [fileBasename],
+                [
+                    QtCore.QFile.exists(label_file)
+                    and LabelFile.is_label_file(label_file)
+                ],
+            )
 
         if len(self.imageList) > 1:
             self.actions.openNextImg.setEnabled(True)
@@ -3087,30 +3235,70 @@ class MainWindow(QtWidgets.QMainWindow):
         if not self.mayContinue() or not dirpath:
             return
 
+        self.cancelImportDir()
         self.lastOpenDir = dirpath
         self.filename = None
         self.fileListWidget.clear()
-        for filename in self.scanAllImages(dirpath):
-            a=filename.find('color')
-            if filename.find('color')!=-1:
-                if pattern and pattern not in filename:
-                    continue
-                RGB_file = osp.splitext(filename)[0]
-                label_file = RGB_file[:RGB_file.find('color')]+ "label.json"
-                if self.output_dir:
-                    label_file_without_path = osp.basename(label_file)
-                    label_file = osp.join(self.output_dir, label_file_without_path)
-                item = QtWidgets.QListWidgetItem(os.path.basename(filename))  # only show the basename path
-                # item = QtWidgets.QListWidgetItem(filename)  
-                item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-                if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(
-                    label_file
-                ):
-                    item.setCheckState(Qt.Checked)
-                else:
-                    item.setCheckState(Qt.Unchecked)
-                self.fileListWidget.addItem(item)
-        self.openNextImg(load=load)
+
+        # frames are streamed into the file list by a background scan
+        thread = DatasetScanThread(
+            self.datasetIndex, dirpath, self.imageExtensions(), parent=self
+        )
+        thread.framesFound.connect(
+            functools.partial(self.addImportedFrames, thread, pattern, load)
+        )
+        thread.finished.connect(functools.partial(self.importDirDone, thread))
+        self.importThread = thread
+        self.importLabel.setText(str(self.tr("Scanning %s...")) % dirpath)
+        self.importLabel.show()
+        self.importProgress.show()
+        self.importCancelButton.show()
+        thread.start()
+
+    def addImportedFrames(self, thread, pattern, load, frames):
+        if thread is not self.importThread:
+            return
+        names = []
+        checked = []
+        for frame in frames:
+            filename = frame.color
+            if pattern and pattern not in filename:
+                continue
+            if self.output_dir:
+                label_file = self.getLabelFileSelect(filenameRGB=filename)
+                labelFileExists = QtCore.QFile.exists(label_file)
+            else:
+                # the index already knows which label files exist
+                labelFileExists = frame.label is not None
+            names.append(os.path.basename(filename))  # only show the basename path
+            checked.append(labelFileExists)
+        self.fileListWidget.addFiles(names, checked)
+        self.importLabel.setText(
+            str(self.tr("Found %d frames")) % self.fileListWidget.count()
+        )
+        # open the first frame without waiting for the rest
+        if self.filename is None:
+            self.openNextImg(load=load)
+
+    def importDirDone(self, thread):
+        thread.deleteLater()
+        if thread is not self.importThread:
+            return
+        self.importThread = None
+        self.importProgress.hide()
+        self.importCancelButton.hide()
+        self.importLabel.setText(
+            str(self.tr("%d frames")) % self.fileListWidget.count()
+        )
+
+    def cancelImportDir(self):
+        if self.importThread is None:
+            return
+        self.importThread.requestInterruption()
+        self.importThread = None
+        self.importProgress.hide()
+        self.importCancelButton.hide()
+        self.importLabel.hide()
 
 
     def importDirImages(self, dirpath, pattern=None, load=True):
@@ -3123,6 +3311,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.lastOpenDir = dirpath
         self.filename = None
         self.fileListWidget.clear()
+        names = []
+        checked = []
         for filename in self.scanAllImages(dirpath):
             if pattern and pattern not in filename:
                 continue
@@ -3130,30 +3320,23 @@ class MainWindow(QtWidgets.QMainWindow):
             if self.output_dir:
                 label_file_without_path = osp.basename(label_file)
                 label_file = osp.join(self.output_dir, label_file_without_path)
-            item = QtWidgets.QListWidgetItem(filename)
-            item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-            if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(
-                label_file
-            ):
-                item.setCheckState(Qt.Checked)
-            else:
-                item.setCheckState(Qt.Unchecked)
-            self.fileListWidget.addItem(item)
+            names.append(filename)
+            checked.append(
+                QtCore.QFile.exists(label_file)
+                and LabelFile.is_label_file(label_file)
+            )
+        self.fileListWidget.addFiles(names, checked)
         self.openNextImg(load=load)
 
 
     #用来扫描这个文件夹里的所有图片，可以改造来分开深度和普通图
     def scanAllImages(self, folderPath):
-        extensions = [
-            ".%s" % fmt.data().decode().lower()
-            for fmt in QtGui.QImageReader.supportedImageFormats()
-        ]
-
-        images = []
-        for root, dirs, files in os.walk(folderPath):
-            for file in files:
-                if file.lower().endswith(tuple(extensions)):
-                    relativePath = osp.join(root, file)
-                    images.append(relativePath)
-        images = natsort.os_sorted(images)
-        return images
+        return self.datasetIndex.scan(folderPath, self.imageExtensions())
+
+    def imageExtensions(self):
+        if self._imageExtensions is None:
+            self._imageExtensions = [
+                ".%s" % fmt.data().decode().lower()
+                for fmt in QtGui.QImageReader.supportedImageFormats()
+            ]
+        return self._imageExtensions
@@ -0,0 +1,107 @@
+import collections
+import threading
+import time
+
+from labelme.label_file import write_json
+from labelme.logger import logger
+
+
+class AutosaveWriter(object):
+
+    """Write label files on a background thread, coalescing rapid saves.
+
+    A file submitted again before its write started is only written once,
+    with the latest data, after no new data came in for delay seconds.
+    Writes of the same writer never run concurrently, so a synchronous
+    :meth:`write` is never overwritten by older queued data. The callback
+    given with the data is called in the writer thread once it is written,
+    the errback with the exception if writing it failed.
+    """
+
+    def __init__(self, delay=0.5):
+        self.delay = delay
+        # filename -> (data, deadline, callback, errback), by deadline
+        self._pending = collections.OrderedDict()
+        self._cond = threading.Condition()
+        self._writeLock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __contains__(self, filename):
+        with self._cond:
+            return filename in self._pending
+
+    def submit(self, filename, data, callback=None, errback=None):
+        with self._cond:
+            self._pending[filename] = (
+                data,
+                time.time() + self.delay,
+                callback,
+                errback,
+            )
+            self._pending.move_to_end(filename)
+            self._cond.notify()
+
+    def write(self, filename, data):
+        """Write data now in the calling thread, dropping queued data."""
+        with self._cond:
+            self._pending.pop(filename, None)
+        with self._writeLock:
+            write_json(filename, data)
+
+    def cancel(self, filename):
+        with self._cond:
+            self._pending.pop(filename, None)
+
+    def flush(self):
+        """Write everything queued and wait for the running write."""
+        with self._cond:
+            pending = self._pending
+            self._pending = collections.OrderedDict()
+        with self._writeLock:
+            for filename, (data, _, callback, errback) in pending.items():
+                self._write(filename, data, callback, errback)
+
+    def shutdown(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _write(self, filename, data, callback=None, errback=None):
+        # must be called with self._writeLock held
+        try:
+            write_json(filename, data)
+        except Exception as e:
+            logger.error("Failed autosaving {}: {}".format(filename, e))
+            if errback is not None:
+                errback(e)
+            return
+        if callback is not None:
+            callback()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._pending:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                filename, (data, deadline, callback, errback) = next(
+                    iter(self._pending.items())
+                )
+                wait = deadline - time.time()
+                if wait > 0 and not self._closed:
+                    self._cond.wait(wait)
+                    continue
+                del self._pending[filename]
+                # taken before releasing the condition, so a write() of the
+                # same file that drops the queued data runs after this one
+                self._writeLock.acquire()
+            try:
+                self._write(filename, data, callback, errback)
+            finally:
+                self._writeLock.release()
@@ -0,0 +1,291 @@
+import collections
+import os
+import os.path as osp
+import threading
+
+import cv2
+import numpy as np
+
+from labelme.logger import logger
+from labelme import utils
+
+
+class CalibrationError(Exception):
+    pass
+
+
+# ray lookup tables of the cameras seen so far, keyed by intrinsics and
+# image size, so the patient directories of one device share them
+_RAY_LUTS = collections.OrderedDict()
+_RAY_LUTS_SIZE = 4
+_ray_luts_lock = threading.Lock()
+
+
+class Camera(object):
+
+    """Pinhole camera with OpenCV distortion coefficients.
+
+    Up to 8 coefficients (k1, k2, p1, p2, k3, k4, k5, k6) are used.
+    """
+
+    def __init__(self, camera_matrix, distortion=None):
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        if self.camera_matrix.shape != (3, 3):
+            raise CalibrationError(
+                "Camera matrix must be 3x3: {}".format(
+                    self.camera_matrix.shape
+                )
+            )
+        coefficients = np.zeros(8)
+        if distortion is not None:
+            distortion = np.asarray(distortion, dtype=np.float64).ravel()[:8]
+            coefficients[: len(distortion)] = distortion
+        self.distortion = coefficients
+
+    def rays(self, size):
+        """Return the (height, width, 2) normalized coordinates of pixels.
+
+        Pixel (x, y) looks along the ray (rays[y, x, 0], rays[y, x, 1], 1).
+        """
+        width, height = size
+        key = (
+            self.camera_matrix.tobytes(),
+            self.distortion.tobytes(),
+            width,
+            height,
+        )
+        with _ray_luts_lock:
+            if key in _RAY_LUTS:
+                _RAY_LUTS.move_to_end(key)
+                return _RAY_LUTS[key]
+        x, y = np.meshgrid(
+            np.arange(width, dtype=np.float32),
+            np.arange(height, dtype=np.float32),
+        )
+        pixels = np.stack([x.ravel(), y.ravel()], axis=1).reshape(-1, 1, 2)
+        rays = cv2.undistortPoints(
+            pixels, self.camera_matrix, self.distortion
+        ).reshape(height, width, 2)
+        with _ray_luts_lock:
+            _RAY_LUTS[key] = rays
+            while len(_RAY_LUTS) > _RAY_LUTS_SIZE:
+                _RAY_LUTS.popitem(last=False)
+        return rays
+
+    def unproject(self, points, size):
+        """Return the normalized coordinates of (n, 2) pixel positions.
+
+        The ray table of an image of size (width, height) is interpolated
+        bilinearly; points outside of it get NaN.
+        """
+        rays = self.rays(size)
+        width, height = size
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+        with np.errstate(invalid="ignore"):
+            inside = (x >= 0) & (x <= width - 1) & (y >= 0) & (y <= height - 1)
+        x = np.where(inside, x, 0)
+        y = np.where(inside, y, 0)
+        x0 = np.minimum(np.floor(x).astype(np.intp), max(width - 2, 0))
+        y0 = np.minimum(np.floor(y).astype(np.intp), max(height - 2, 0))
+        x1 = np.minimum(x0 + 1, width - 1)
+        y1 = np.minimum(y0 + 1, height - 1)
+        fx = (x - x0)[:, None]
+        fy = (y - y0)[:, None]
+        normalized = (
+            rays[y0, x0] * (1 - fx) * (1 - fy)
+            + rays[y0, x1] * fx * (1 - fy)
+            + rays[y1, x0] * (1 - fx) * fy
+            + rays[y1, x1] * fx * fy
+        )
+        normalized[~inside] = np.nan
+        return normalized
+
+    def project(self, points):
+        """Return the pixel positions of (..., 3) camera space points."""
+        points = np.asarray(points, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = points[..., 0] / points[..., 2]
+            y = points[..., 1] / points[..., 2]
+        k1, k2, p1, p2, k3, k4, k5, k6 = self.distortion
+        r2 = x * x + y * y
+        radial = (1 + r2 * (k1 + r2 * (k2 + r2 * k3))) / (
+            1 + r2 * (k4 + r2 * (k5 + r2 * k6))
+        )
+        xd = x * radial + 2 * p1 * x * y + p2 * (r2 + 2 * x * x)
+        yd = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * x * y
+        fx, skew, cx = self.camera_matrix[0]
+        fy, cy = self.camera_matrix[1, 1:]
+        return np.stack([fx * xd + skew * yd + cx, fy * yd + cy], axis=-1)
+
+
+class Calibration(object):
+
+    """Intrinsics of the color and depth cameras and the transform between.
+
+    ``calibration.yml`` is read with cv2.FileStorage and holds::
+
+        color_camera_matrix: 3x3 matrix
+        color_distortion_coefficients: 1xN matrix, optional
+        depth_camera_matrix: 3x3 matrix
+        depth_distortion_coefficients: 1xN matrix, optional
+        R: 3x3 matrix, rotation from depth to color camera space
+        T: 3x1 matrix, translation from depth to color camera space
+
+    T is in the unit of the depth images, millimetres.
+    """
+
+    filename = "calibration.yml"
+
+    # depths searched along the ray of a color pixel, in millimetres
+    search_range = (200, 8000)
+    search_steps = 256
+
+    def __init__(self, color, depth, R, T):
+        self.color = color
+        self.depth = depth
+        self.R = np.asarray(R, dtype=np.float64).reshape(3, 3)
+        self.T = np.asarray(T, dtype=np.float64).reshape(3)
+
+    @classmethod
+    def load(cls, filename):
+        storage = cv2.FileStorage(filename, cv2.FILE_STORAGE_READ)
+        if not storage.isOpened():
+            raise CalibrationError("Failed opening {}".format(filename))
+        try:
+
+            def read(name, required=True):
+                node = storage.getNode(name)
+                if node.empty():
+                    if required:
+                        raise CalibrationError(
+                            "{} has no {}".format(filename, name)
+                        )
+                    return None
+                return node.mat()
+
+            return cls(
+                color=Camera(
+                    read("color_camera_matrix"),
+                    read("color_distortion_coefficients", required=False),
+                ),
+                depth=Camera(
+                    read("depth_camera_matrix"),
+                    read("depth_distortion_coefficients", required=False),
+                ),
+                R=read("R"),
+                T=read("T"),
+            )
+        finally:
+            storage.release()
+
+    def lift(self, points, depth, radius=2):
+        """Return the depth camera space positions of (n, 2) depth pixels.
+
+        The depth of a point is the median of the valid values within
+        radius pixels in the raw depth image; points without valid depth
+        get NaN.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        height, width = depth.shape[:2]
+        z = utils.sample_depth(depth, points, radius=radius)
+        rays = self.depth.unproject(points, (width, height))
+        camera = np.concatenate([rays, np.ones((len(points), 1))], axis=1)
+        camera *= z[:, None]
+        return camera
+
+    def depth_to_color(self, points, depth):
+        """Map (n, 2) depth image pixels to the color image, see lift."""
+        camera = self.lift(points, depth)
+        return self.color.project(camera.dot(self.R.T) + self.T)
+
+    def color_to_depth(self, points, depth, color_size):
+        """Map (n, 2) color image pixels of an image of color_size to depth.
+
+        A color pixel sees a ray that is a line in the depth image. The
+        point is the first one on the line where the measured depth meets
+        the depth of the ray, searched coarse to fine for all points at
+        once. Points whose line does not meet the depth surface get NaN.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        rays = self.color.unproject(points, color_size)
+        rays = np.concatenate([rays, np.ones((len(points), 1))], axis=1)
+        z_min, z_max = self.search_range
+        z = np.linspace(z_min, z_max, self.search_steps)[None, :]
+        z = np.repeat(z, len(points), axis=0)
+        step = (z_max - z_min) / (self.search_steps - 1.0)
+        rows = np.arange(len(points))
+        for i in range(3):
+            _, error = self._match(rays, z, depth)
+            error = np.where(np.isnan(error), np.inf, error)
+            best = np.argmin(error, axis=1)
+            if i == 0:
+                # the first surface the ray meets is the one the color
+                # camera sees, not the one it comes closest to
+                crossing = error <= self._tolerance(z)
+                first = np.argmax(crossing, axis=1)
+                best = np.where(crossing[rows, first], first, best)
+            z_best = z[rows, best]
+            # search again around the best depth with a finer step
+            z = z_best[:, None] + np.linspace(-step, step, 33)[None, :]
+            step /= 16.0
+        pixels, error = self._match(rays, z_best[:, None], depth)
+        pixels = pixels[:, 0]
+        valid = error[:, 0] <= self._tolerance(z_best)
+        pixels[~valid] = np.nan
+        return pixels
+
+    def _tolerance(self, z):
+        # how far the depth measured along a ray may be from the depth of
+        # the ray for it to meet the surface there, the coarse search step
+        # plus the noise of the sensor
+        step = (self.search_range[1] - self.search_range[0]) / (
+            self.search_steps - 1.0
+        )
+        return step + 0.01 * z
+
+    def _match(self, rays, z, depth):
+        # pixels in depth of the color rays at depths z, and how far the
+        # measured depth there is from the depth of the point
+        height, width = depth.shape[:2]
+        camera = rays[:, None, :] * z[:, :, None]
+        camera = (camera - self.T).dot(self.R)
+        pixels = self.depth.project(camera)
+        with np.errstate(invalid="ignore"):
+            x = np.round(pixels[..., 0])
+            y = np.round(pixels[..., 1])
+            inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        measured = depth[
+            np.where(inside, y, 0).astype(np.intp),
+            np.where(inside, x, 0).astype(np.intp),
+        ].astype(np.float64)
+        measured[~inside | (measured == 0)] = np.nan
+        return pixels, np.abs(measured - camera[..., 2])
+
+
+_calibrations = {}
+_calibrations_lock = threading.Lock()
+
+
+def get_calibration(dirpath):
+    """Return the :class:`Calibration` of a patient directory, or None.
+
+    The file is parsed once and again only when its mtime changes.
+    """
+    filename = osp.join(dirpath, Calibration.filename)
+    try:
+        mtime = os.stat(filename).st_mtime_ns
+    except OSError:
+        return None
+    with _calibrations_lock:
+        cached = _calibrations.get(filename)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    try:
+        calibration = Calibration.load(filename)
+    except (CalibrationError, cv2.error) as e:
+        logger.warn("Failed loading calibration {}: {}".format(filename, e))
+        calibration = None
+    with _calibrations_lock:
+        _calibrations[filename] = (mtime, calibration)
+    return calibration
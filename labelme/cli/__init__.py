@@ -1,6 +1,10 @@
 # flake8: noqa
 
+from . import compile_keypoints
 from . import draw_json
 from . import draw_label_png
+from . import export_coco_keypoints
 from . import json_to_dataset
+from . import lift_joints
 from . import on_docker
+from . import validate
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import argparse
+import os.path as osp
+
+from labelme.config import get_config
+from labelme.dataset_index import DatasetIndex
+from labelme.keypoint_store import KeypointStore
+from labelme.logger import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile the label files under a directory into a "
+        "keypoint store, parsing only the files changed since the last run."
+    )
+    parser.add_argument("root", help="dataset directory")
+    parser.add_argument("out", help="keypoint store directory")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of processes parsing label files",
+    )
+    args = parser.parse_args()
+
+    # the index of the app, directories opened there are not listed again
+    index = get_config()["dataset_index"]
+    if index is not None:
+        index = osp.expanduser(index)
+    store = KeypointStore.build(
+        args.root,
+        args.out,
+        num_workers=args.workers,
+        index=DatasetIndex(index),
+    )
+    logger.info("Saved {} frames to: {}".format(len(store), args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+
+import argparse
+import concurrent.futures
+import datetime
+import io
+import json
+import os
+import os.path as osp
+import shutil
+import tempfile
+
+import numpy as np
+
+from labelme.config import get_config
+from labelme.dataset_index import DatasetIndex
+from labelme.keypoint_store import JOINT_INDEX
+from labelme.keypoint_store import JOINTS
+from labelme.keypoint_store import read_keypoints
+from labelme.keypoint_store import VIEWS
+from labelme.logger import logger
+from labelme import utils
+
+
+SKELETON = [
+    ("HEADTOP", "NECK"),
+    ("NECK", "SHOULDER_LEFT"),
+    ("NECK", "SHOULDER_RIGHT"),
+    ("SHOULDER_LEFT", "ELBOW_LEFT"),
+    ("SHOULDER_RIGHT", "ELBOW_RIGHT"),
+    ("ELBOW_LEFT", "WRIST_LEFT"),
+    ("ELBOW_RIGHT", "WRIST_RIGHT"),
+    ("NECK", "GROIN"),
+    ("GROIN", "HIP_LEFT"),
+    ("GROIN", "HIP_RIGHT"),
+    ("HIP_LEFT", "KNEE_LEFT"),
+    ("HIP_RIGHT", "KNEE_RIGHT"),
+    ("KNEE_LEFT", "ANKLE_LEFT"),
+    ("KNEE_RIGHT", "ANKLE_RIGHT"),
+    ("ANKLE_LEFT", "HEEL_LEFT"),
+    ("ANKLE_RIGHT", "HEEL_RIGH"),
+    ("ANKLE_LEFT", "BIGTOE_LEFT"),
+    ("ANKLE_RIGHT", "BIGTOE_RIGHT"),
+    ("ANKLE_LEFT", "SMALLTOE_LEFT"),
+    ("ANKLE_RIGHT", "SMALLTOE_RIGHT"),
+    ("NOSE", "EYE_LEFT"),
+    ("NOSE", "EYE_RIGHT"),
+    ("EYE_LEFT", "EAR_LEFT"),
+    ("EYE_RIGHT", "EAR_RIGHT"),
+]
+
+
+def _annotation(points, visible, occluded):
+    # COCO visibility: 0 not labelled, 1 labelled but occluded, 2 visible
+    v = np.where(visible, np.where(occluded, 1, 2), 0)
+    keypoints = np.zeros((len(JOINTS), 3))
+    keypoints[visible, :2] = points[visible]
+    keypoints[:, 2] = v
+    if visible.any():
+        x1, y1 = points[visible].min(axis=0)
+        x2, y2 = points[visible].max(axis=0)
+        bbox = [float(x1), float(y1), float(x2 - x1), float(y2 - y1)]
+    else:
+        bbox = [0.0, 0.0, 0.0, 0.0]
+    return dict(
+        category_id=1,
+        keypoints=[float(k) for k in keypoints.ravel()],
+        num_keypoints=int(visible.sum()),
+        bbox=bbox,
+        area=bbox[2] * bbox[3],
+        iscrowd=0,
+    )
+
+
+def _convert(args):
+    # return {view: (image, annotation)} for a frame, or the exception
+    frame, root, views = args
+    try:
+        keypoints = read_keypoints(frame.label)
+        entries = {}
+        for view in views:
+            filename = frame.color if view == "rgb" else frame.depth
+            if filename is None:
+                continue
+            width, height = utils.img_file_to_size(filename)
+            image = dict(
+                file_name=osp.relpath(filename, root),
+                height=height,
+                width=width,
+            )
+            annotation = _annotation(
+                keypoints["points_" + view],
+                keypoints["visible_" + view],
+                keypoints["occluded_" + view],
+            )
+            entries[view] = (image, annotation)
+        return entries
+    except Exception as e:
+        return e
+
+
+class CocoWriter(object):
+
+    """Write a COCO json one image at a time.
+
+    Images are written to the output file as they come and annotations to
+    a temporary file that is appended on close, so memory use does not
+    grow with the number of images.
+    """
+
+    def __init__(self, filename, categories):
+        self.filename = filename
+        self._file = io.open(filename, "w", encoding="utf-8")
+        self._annotations = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.count = 0
+        now = datetime.datetime.now()
+        header = dict(
+            info=dict(
+                description=None,
+                url=None,
+                version=None,
+                year=now.year,
+                contributor=None,
+                date_created=now.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            ),
+            licenses=[dict(url=None, id=0, name=None)],
+            categories=categories,
+        )
+        # the header without its closing brace, images follow
+        self._file.write(json.dumps(header)[:-1] + ', "images": [')
+
+    def add(self, image, annotation):
+        self.count += 1
+        separator = ", " if self.count > 1 else ""
+        image = dict(image, id=self.count, license=0)
+        annotation = dict(annotation, id=self.count, image_id=self.count)
+        self._file.write(separator + json.dumps(image))
+        self._annotations.write(separator + json.dumps(annotation))
+
+    def close(self):
+        self._file.write('], "annotations": [')
+        self._annotations.seek(0)
+        shutil.copyfileobj(self._annotations, self._file)
+        self._annotations.close()
+        self._file.write("]}")
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("input_dir", help="input annotated directory")
+    parser.add_argument("output_dir", help="output directory")
+    parser.add_argument(
+        "--views", nargs="+", choices=VIEWS, default=VIEWS, help="views"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of processes converting label files",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=4096,
+        help="number of label files converted at a time",
+    )
+    args = parser.parse_args()
+
+    if not osp.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    index = get_config()["dataset_index"]
+    if index is not None:
+        index = osp.expanduser(index)
+    root = osp.abspath(args.input_dir)
+    frames = [
+        frame
+        for frame in DatasetIndex(index).iter_frames(root)
+        if frame.label is not None
+    ]
+    categories = [
+        dict(
+            id=1,
+            name="person",
+            supercategory="person",
+            keypoints=JOINTS,
+            skeleton=[
+                [JOINT_INDEX[a] + 1, JOINT_INDEX[b] + 1] for a, b in SKELETON
+            ],
+        )
+    ]
+    writers = {
+        view: CocoWriter(
+            osp.join(args.output_dir, "keypoints_{}.json".format(view)),
+            categories,
+        )
+        for view in args.views
+    }
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        # in batches, so converted frames do not pile up in memory
+        for start in range(0, len(frames), args.batch_size):
+            batch = frames[start : start + args.batch_size]
+            results = executor.map(
+                _convert,
+                [(frame, root, args.views) for frame in batch],
+                chunksize=64,
+            )
+            for frame, entries in zip(batch, results):
+                if isinstance(entries, Exception):
+                    logger.warn(
+                        "Failed converting {}: {}".format(frame.label, entries)
+                    )
+                    continue
+                for view, (image, annotation) in entries.items():
+                    writers[view].add(image, annotation)
+    for writer in writers.values():
+        writer.close()
+        logger.info(
+            "Saved {} images to: {}".format(writer.count, writer.filename)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+import argparse
+import concurrent.futures
+import os.path as osp
+
+import cv2
+import numpy as np
+
+from labelme.calibration import get_calibration
+from labelme.config import get_config
+from labelme.dataset_index import DatasetIndex
+from labelme.keypoint_store import JOINTS
+from labelme.keypoint_store import read_keypoints
+from labelme.logger import logger
+
+
+def lift_frame(frame, radius=2):
+    """Return the (26, 3) depth camera space joints of a frame and validity.
+
+    The depth of a joint of shapes_depth is the median of the raw depth
+    around it, see :meth:`Calibration.lift`. Joints are invalid if they are
+    not labelled or have no depth, all of them are if the frame has no
+    depth image or calibration.
+    """
+    joints = np.full((len(JOINTS), 3), np.nan, dtype=np.float32)
+    calibration = get_calibration(osp.dirname(frame.label))
+    if calibration is None or frame.depth is None:
+        return joints, np.zeros(len(JOINTS), dtype=bool)
+    keypoints = read_keypoints(frame.label)
+    depth = cv2.imread(frame.depth, cv2.IMREAD_ANYDEPTH)
+    if depth is None:
+        raise IOError("Failed reading depth image: {}".format(frame.depth))
+    visible = keypoints["visible_depth"]
+    joints[visible] = calibration.lift(
+        keypoints["points_depth"][visible], depth, radius=radius
+    )
+    return joints, ~np.isnan(joints).any(axis=1)
+
+
+def _lift(args):
+    # worker of main, failures are reported not raised
+    frame, radius = args
+    try:
+        return lift_frame(frame, radius=radius)
+    except Exception as e:
+        return e
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Lift the depth view joints of all labelled frames to "
+        "3D with the raw depth and calibration.yml of each directory.",
+    )
+    parser.add_argument("input_dir", help="input annotated directory")
+    parser.add_argument("out", help="output npz file")
+    parser.add_argument(
+        "--radius",
+        type=int,
+        default=2,
+        help="pixels around a joint its depth is the median of",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of processes lifting frames",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=4096,
+        help="number of frames lifted at a time",
+    )
+    args = parser.parse_args()
+
+    index = get_config()["dataset_index"]
+    if index is not None:
+        index = osp.expanduser(index)
+    root = osp.abspath(args.input_dir)
+    frames = [
+        frame
+        for frame in DatasetIndex(index).iter_frames(root)
+        if frame.label is not None
+    ]
+
+    joints = np.full((len(frames), len(JOINTS), 3), np.nan, np.float32)
+    valid = np.zeros((len(frames), len(JOINTS)), bool)
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        for start in range(0, len(frames), args.batch_size):
+            batch = frames[start : start + args.batch_size]
+            results = executor.map(
+                _lift, [(frame, args.radius) for frame in batch], chunksize=16
+            )
+            for row, result in enumerate(results, start):
+                if isinstance(result, Exception):
+                    logger.warn(
+                        "Failed lifting {}: {}".format(
+                            frames[row].label, result
+                        )
+                    )
+                    continue
+                joints[row], valid[row] = result
+
+    files = np.array([osp.relpath(frame.label, root) for frame in frames])
+    np.savez(args.out, joints=joints, valid=valid, files=files)
+    logger.info(
+        "Saved {} frames, {} valid joints to: {}".format(
+            len(frames), valid.sum(), args.out
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
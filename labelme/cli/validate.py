@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+import argparse
+import collections
+import concurrent.futures
+import csv
+import io
+import json
+import os.path as osp
+import sys
+
+from labelme.config import get_config
+from labelme.dataset_index import DatasetIndex
+from labelme.keypoint_store import JOINT_INDEX
+from labelme.keypoint_store import JOINTS
+from labelme.keypoint_store import VIEWS
+from labelme.logger import logger
+from labelme import utils
+
+
+Issue = collections.namedtuple("Issue", ["file", "view", "issue", "detail"])
+
+
+def validate_frame(frame):
+    """Return the :class:`Issue` list of the label file of a frame.
+
+    The issues are unparseable, calibration_mismatch, too_many_labels,
+    duplicate_label, unknown_label, missing_joint and out_of_bounds.
+    """
+    issues = []
+
+    def add(view, issue, detail=""):
+        issues.append(Issue(frame.label, view, issue, detail))
+
+    try:
+        with io.open(frame.label, encoding="utf-8") as f:
+            data = json.load(f)
+        shapes = {view: data["shapes_" + view] for view in VIEWS}
+        labels = {
+            view: [shape["label"] for shape in shapes[view]] for view in VIEWS
+        }
+    except Exception as e:
+        add("", "unparseable", "{}: {}".format(type(e).__name__, e))
+        return issues
+
+    calibration_exist = data.get("calibrationExist")
+    if calibration_exist is not None and bool(calibration_exist) != (
+        frame.calibration is not None
+    ):
+        add(
+            "",
+            "calibration_mismatch",
+            "calibrationExist is {} but calibration.yml {}".format(
+                calibration_exist,
+                "exists" if frame.calibration else "does not exist",
+            ),
+        )
+
+    sizes = {}
+    try:
+        if data.get("imageWidth") and data.get("imageHeight"):
+            sizes["rgb"] = (data["imageWidth"], data["imageHeight"])
+        elif frame.color is not None:
+            sizes["rgb"] = utils.img_file_to_size(frame.color)
+        if frame.depth is not None:
+            sizes["depth"] = utils.img_file_to_size(frame.depth)
+    except (IOError, OSError) as e:
+        add("", "unparseable", "image: {}".format(e))
+
+    for view in VIEWS:
+        if len(shapes[view]) > len(JOINTS):
+            add(view, "too_many_labels", str(len(shapes[view])))
+        counts = collections.Counter(labels[view])
+        for label, count in counts.items():
+            if count > 1:
+                add(view, "duplicate_label", "{} x{}".format(label, count))
+            if label not in JOINT_INDEX:
+                add(view, "unknown_label", label)
+        labelled = set()
+        for shape in shapes[view]:
+            points = shape.get("points")
+            if not points:
+                continue
+            labelled.add(shape["label"])
+            if view not in sizes:
+                continue
+            width, height = sizes[view]
+            for x, y in points:
+                if not (0 <= x < width and 0 <= y < height):
+                    add(
+                        view,
+                        "out_of_bounds",
+                        "{} ({}, {}) not in {}x{}".format(
+                            shape["label"], x, y, width, height
+                        ),
+                    )
+        missing = [label for label in JOINTS if label not in labelled]
+        if missing:
+            add(view, "missing_joint", " ".join(missing))
+    return issues
+
+
+def _validate(frame):
+    # worker of main, a crash of one file must not end the scan
+    try:
+        return validate_frame(frame)
+    except Exception as e:
+        return [Issue(frame.label, "", "unparseable", str(e))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Check all label files under a directory.",
+    )
+    parser.add_argument("input_dir", help="input annotated directory")
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="report file, csv if it ends with .csv and json otherwise; "
+        "the json report is printed if not given",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of processes checking label files",
+    )
+    args = parser.parse_args()
+
+    index = get_config()["dataset_index"]
+    if index is not None:
+        index = osp.expanduser(index)
+    root = osp.abspath(args.input_dir)
+    frames = [
+        frame
+        for frame in DatasetIndex(index).iter_frames(root)
+        if frame.label is not None
+    ]
+
+    issues = []
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        for frame_issues in executor.map(_validate, frames, chunksize=256):
+            issues.extend(
+                issue._replace(file=osp.relpath(issue.file, root))
+                for issue in frame_issues
+            )
+
+    counts = collections.Counter(issue.issue for issue in issues)
+    for issue, count in sorted(counts.items()):
+        logger.info("{}: {}".format(issue, count))
+    logger.info("Checked {} label files".format(len(frames)))
+
+    if args.output and args.output.lower().endswith(".csv"):
+        with io.open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(Issue._fields)
+            writer.writerows(issues)
+        return
+    report = dict(
+        root=root,
+        files=len(frames),
+        counts=counts,
+        issues=[issue._asdict() for issue in issues],
+    )
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import collections
+import json
+import os
+import os.path as osp
+import sqlite3
+import time
+
+import natsort
+from qtpy import QtCore
+
+from labelme.logger import logger
+from labelme.preview_cache import DepthPreviewCache
+
+
+FrameFiles = collections.namedtuple(
+    "FrameFiles", ["color", "depth", "label", "calibration"]
+)
+
+
+class DatasetIndex(object):
+
+    """Persistent index of the files under the directories opened so far.
+
+    The naturally sorted entries of each directory are stored in a sqlite
+    database together with the directory mtime. A rescan stats every
+    directory but only lists the ones whose mtime changed. With filename
+    None nothing is persisted and every scan lists the whole tree.
+    """
+
+    version = 2
+
+    # mtimes this close to now are not trusted, an entry created in the
+    # same clock tick as the listing would go unnoticed
+    mtime_margin = 2 * 10**9
+
+    def __init__(self, filename=None):
+        self.filename = filename
+
+    def _connect(self):
+        connection = sqlite3.connect(self.filename or ":memory:")
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.version:
+            # the index is only a cache, drop it rather than migrating
+            connection.execute("DROP TABLE IF EXISTS dirs")
+            connection.execute("DROP TABLE IF EXISTS roots")
+            connection.execute("PRAGMA user_version = %d" % self.version)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS dirs "
+            "(path TEXT PRIMARY KEY, mtime_ns INTEGER, entries TEXT)"
+        )
+        return connection
+
+    def _listdir(self, connection, dirpath):
+        # return [(name, is_dir), ...] in natural order, or None
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            return None
+        row = connection.execute(
+            "SELECT mtime_ns, entries FROM dirs WHERE path = ?", (dirpath,)
+        ).fetchone()
+        if row is not None and row[0] == mtime:
+            return json.loads(row[1])
+
+        entries = []
+        try:
+            for entry in os.scandir(dirpath):
+                if entry.name == DepthPreviewCache.dirname:
+                    continue
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and entry.is_dir():
+                    # links to directories are not walked, like os.walk
+                    # does by default, and are not files either
+                    continue
+                entries.append((entry.name, is_dir))
+        except OSError:
+            return None
+        entries = natsort.os_sorted(entries, key=lambda entry: entry[0])
+        if time.time_ns() - mtime < self.mtime_margin:
+            mtime = -1
+        connection.execute(
+            "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+            (dirpath, mtime, json.dumps(entries)),
+        )
+        return entries
+
+    def _walk(self, connection, dirpath):
+        # yield (dirpath, names, existing) depth first, in the order
+        # os_sorted would put the paths; names of one directory are split
+        # around its subdirectories
+        entries = self._listdir(connection, dirpath)
+        if entries is None:
+            return
+        existing = {name for name, is_dir in entries if not is_dir}
+        names = []
+        for name, is_dir in entries:
+            if not is_dir:
+                names.append(name)
+                continue
+            if names:
+                yield dirpath, names, existing
+                names = []
+            for item in self._walk(connection, osp.join(dirpath, name)):
+                yield item
+        if names:
+            yield dirpath, names, existing
+
+    def iter_files(self, root, extensions=None):
+        """Yield the paths of the files under root in natural order.
+
+        extensions is a list of lower case suffixes to keep, e.g. [".jpg"].
+        """
+        if extensions is not None:
+            extensions = tuple(extensions)
+        connection = self._connect()
+        try:
+            for dirpath, names, _ in self._walk(connection, root):
+                for name in names:
+                    if extensions is None or name.lower().endswith(extensions):
+                        yield osp.join(dirpath, name)
+        finally:
+            connection.commit()
+            connection.close()
+
+    def iter_frames(self, root, extensions=None):
+        """Yield a :class:`FrameFiles` for each color image under root.
+
+        The depth, label and calibration entries are None if the file does
+        not exist.
+        """
+        if extensions is not None:
+            extensions = tuple(extensions)
+        connection = self._connect()
+        try:
+            for dirpath, names, existing in self._walk(connection, root):
+
+                def get(name):
+                    if name in existing:
+                        return osp.join(dirpath, name)
+
+                for name in names:
+                    if name.find("color") == -1:
+                        continue
+                    if extensions is not None and not name.lower().endswith(
+                        extensions
+                    ):
+                        continue
+                    prefix = name[: name.find("color")]
+                    yield FrameFiles(
+                        color=osp.join(dirpath, name),
+                        depth=get(prefix + "depth.png"),
+                        label=get(prefix + "label.json"),
+                        calibration=get("calibration.yml"),
+                    )
+        finally:
+            connection.commit()
+            connection.close()
+
+    def scan(self, root, extensions=None):
+        return list(self.iter_files(root, extensions))
+
+    def frames(self, root, extensions=None):
+        return list(self.iter_frames(root, extensions))
+
+
+class DatasetScanThread(QtCore.QThread):
+
+    """Scan a directory with :meth:`DatasetIndex.iter_frames` off the GUI.
+
+    Frames are emitted in lists through framesFound, the first one as soon
+    as it is found and then at most every interval seconds or chunk_size
+    frames.
+    """
+
+    framesFound = QtCore.Signal(list)
+
+    def __init__(
+        self,
+        index,
+        root,
+        extensions=None,
+        chunk_size=500,
+        interval=0.1,
+        parent=None,
+    ):
+        super(DatasetScanThread, self).__init__(parent)
+        self.index = index
+        self.root = root
+        self.extensions = extensions
+        self.chunk_size = chunk_size
+        self.interval = interval
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            logger.error("Failed scanning {}: {}".format(self.root, e))
+
+    def _run(self):
+        frames = []
+        emitted = 0
+        for frame in self.index.iter_frames(self.root, self.extensions):
+            if self.isInterruptionRequested():
+                return
+            frames.append(frame)
+            if (
+                len(frames) >= self.chunk_size
+                or time.time() - emitted >= self.interval
+            ):
+                self.framesFound.emit(frames)
+                frames = []
+                emitted = time.time()
+        if frames:
+            self.framesFound.emit(frames)
@@ -0,0 +1,204 @@
+import io
+import json
+import os
+import os.path as osp
+import tempfile
+import threading
+
+from labelme.label_file import LabelFile
+from labelme.logger import logger
+
+
+VIEWS = ["rgb", "depth"]
+
+
+def _normalize(shape):
+    shape = dict(shape)
+    if shape.get("points") is not None:
+        shape["points"] = [list(point) for point in shape["points"]]
+    return shape
+
+
+def apply_edits(shapes, edits):
+    """Return shapes, as in LabelFile.shapesRGB, with edits of a view applied.
+
+    A shape keeps its position if its label is edited, new labels are
+    appended and deleted ones are dropped.
+    """
+    applied = []
+    done = set()
+    for shape in shapes:
+        label = shape["label"]
+        if label not in edits:
+            applied.append(shape)
+        elif label not in done:
+            done.add(label)
+            if edits[label] is not None:
+                applied.append(LabelFile.load_shape(edits[label]))
+    for label, shape in edits.items():
+        if label not in done and shape is not None:
+            applied.append(LabelFile.load_shape(shape))
+    return applied
+
+
+class EditJournal(object):
+
+    """Append-only log of the shapes edited since a label file was saved.
+
+    Each line is one JSON record with the absolute state of a shape,
+    ``{"view": "rgb", "label": "NECK", "shape": {...}}``, where shape is
+    null if the shape was deleted. Once the log grows past compact_size
+    records it is rewritten in the background as one snapshot record,
+    ``{"snapshot": {"rgb": {label: shape}, "depth": {...}}}``. The file is
+    removed when the label file is saved or the edits are discarded, so a
+    journal found when opening a label file holds the edits of a session
+    that crashed.
+    """
+
+    suffix = ".journal"
+    compact_size = 500
+
+    def __init__(self, label_file):
+        self.label_file = label_file
+        self.filename = label_file + self.suffix
+        self.seq = 0
+        self._state = {view: {} for view in VIEWS}
+        self._records = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def recover(self):
+        """Return {view: {label: shape or None}} left by a crash, or None."""
+        if not osp.exists(self.filename):
+            return None
+        edits = {view: {} for view in VIEWS}
+        try:
+            with io.open(self.filename, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the write of the last record was cut off
+                        break
+                    if "snapshot" in record:
+                        for view in VIEWS:
+                            edits[view].update(record["snapshot"][view])
+                    else:
+                        edits[record["view"]][record["label"]] = record[
+                            "shape"
+                        ]
+        except (IOError, OSError, KeyError, TypeError) as e:
+            logger.warn("Failed reading {}: {}".format(self.filename, e))
+            return None
+        if not any(edits.values()):
+            return None
+        return edits
+
+    def reset(self, shapes_rgb, shapes_depth):
+        """Set the shapes recorded edits are compared against."""
+        with self._lock:
+            for view, shapes in zip(VIEWS, [shapes_rgb, shapes_depth]):
+                self._state[view] = {
+                    shape["label"]: _normalize(shape) for shape in shapes
+                }
+
+    def record(self, shapes_rgb, shapes_depth):
+        """Append the shapes that changed since the last call."""
+        lines = []
+        with self._lock:
+            for view, shapes in zip(VIEWS, [shapes_rgb, shapes_depth]):
+                state = self._state[view]
+                current = {
+                    shape["label"]: _normalize(shape) for shape in shapes
+                }
+                for label, shape in current.items():
+                    if state.get(label) != shape:
+                        lines.append((view, label, shape))
+                for label, shape in state.items():
+                    if shape is not None and label not in current:
+                        lines.append((view, label, None))
+                for view_, label, shape in lines:
+                    if view_ == view:
+                        state[label] = shape
+            if not lines:
+                return
+            try:
+                if self._file is None:
+                    self._file = io.open(self.filename, "a", encoding="utf-8")
+                for view, label, shape in lines:
+                    self._file.write(
+                        json.dumps(
+                            dict(view=view, label=label, shape=shape),
+                            ensure_ascii=False,
+                        )
+                        + "\n"
+                    )
+                self._file.flush()
+            except (IOError, OSError) as e:
+                logger.error("Failed writing {}: {}".format(self.filename, e))
+                return
+            self.seq += 1
+            self._records += len(lines)
+            compact = self._records >= self.compact_size
+        if compact:
+            thread = threading.Thread(target=self._compact)
+            thread.daemon = True
+            thread.start()
+
+    def _compact(self):
+        with self._lock:
+            if self._records < self.compact_size:
+                return
+            self._writeSnapshot()
+
+    def _writeSnapshot(self):
+        # must be called with self._lock held
+        self._close()
+        try:
+            fd, tmp_filename = tempfile.mkstemp(
+                suffix=".tmp", dir=osp.dirname(osp.abspath(self.filename))
+            )
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(
+                    json.dumps(dict(snapshot=self._state), ensure_ascii=False)
+                    + "\n"
+                )
+            os.replace(tmp_filename, self.filename)
+        except (IOError, OSError) as e:
+            logger.error("Failed compacting {}: {}".format(self.filename, e))
+            return
+        self._records = 1
+
+    def mark_saved(self, seq):
+        """Drop the edits up to seq, which are in the label file now.
+
+        Edits recorded after seq are kept as one snapshot record.
+        """
+        with self._lock:
+            if seq != self.seq:
+                self._writeSnapshot()
+                return
+            self._remove()
+
+    def discard(self):
+        with self._lock:
+            self._remove()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remove(self):
+        self._close()
+        self._records = 0
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error("Failed removing {}: {}".format(self.filename, e))
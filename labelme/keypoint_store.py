@@ -0,0 +1,274 @@
+import concurrent.futures
+import io
+import json
+import os
+import os.path as osp
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from labelme.dataset_index import DatasetIndex
+from labelme.logger import logger
+
+
+# joints in the order of the default label file, see saveDefaultLabels
+JOINTS = [
+    "HEADTOP",
+    "NECK",
+    "SHOULDER_LEFT",
+    "SHOULDER_RIGHT",
+    "ELBOW_LEFT",
+    "ELBOW_RIGHT",
+    "WRIST_LEFT",
+    "WRIST_RIGHT",
+    "HIP_LEFT",
+    "HIP_RIGHT",
+    "GROIN",
+    "KNEE_LEFT",
+    "KNEE_RIGHT",
+    "ANKLE_LEFT",
+    "ANKLE_RIGHT",
+    "EYE_LEFT",
+    "EYE_RIGHT",
+    "EAR_LEFT",
+    "EAR_RIGHT",
+    "NOSE",
+    "BIGTOE_LEFT",
+    "BIGTOE_RIGHT",
+    "SMALLTOE_LEFT",
+    "SMALLTOE_RIGHT",
+    "HEEL_LEFT",
+    "HEEL_RIGH",
+]
+JOINT_INDEX = {label: i for i, label in enumerate(JOINTS)}
+
+VIEWS = ["rgb", "depth"]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def read_keypoints(filename):
+    """Return the joints of a label file as arrays.
+
+    The result is a dict with ``points_<view>`` of shape (26, 2), NaN for
+    joints without points, ``visible_<view>`` of shape (26,) and the patient
+    metadata. ``occluded_<view>`` marks the joints with the occlusion flag,
+    or all of them if the frame has it. Labels that are not in JOINTS are
+    ignored.
+    """
+    with io.open(filename, encoding="utf-8") as f:
+        data = json.load(f)
+    occluded_frame = bool((data.get("flags") or {}).get("occlusion"))
+    keypoints = {}
+    for view in VIEWS:
+        points = np.full((len(JOINTS), 2), np.nan)
+        occluded = np.zeros(len(JOINTS), dtype=bool)
+        for shape in data["shapes_" + view]:
+            i = JOINT_INDEX.get(shape["label"])
+            if i is None or not shape.get("points"):
+                continue
+            points[i] = shape["points"][0]
+            occluded[i] = occluded_frame or bool(
+                (shape.get("flags") or {}).get("occlusion")
+            )
+        keypoints["points_" + view] = points
+        keypoints["visible_" + view] = ~np.isnan(points[:, 0])
+        keypoints["occluded_" + view] = occluded
+    keypoints["patientHeight"] = _to_float(data.get("patientHeight"))
+    keypoints["patientWeight"] = _to_float(data.get("patientWeight"))
+    keypoints["patientPose"] = data.get("patientPose")
+    return keypoints
+
+
+def _read(filename):
+    # worker of KeypointStore.build, failures are reported not raised
+    try:
+        return read_keypoints(filename)
+    except Exception as e:
+        return e
+
+
+class KeypointStore(object):
+
+    """Joints of all label files under a directory in a few numpy arrays.
+
+    A store is a directory with one ``.npy`` file per column, read with
+    memory mapping, and ``frames.json`` listing the label files relative to
+    the dataset root in row order::
+
+        store = KeypointStore.build("data/", "data.keypoints")
+        store.points["rgb"]  # (frames, 26, 2) float32, NaN if not labelled
+        store.visible["depth"]  # (frames, 26) bool
+        store.files[0]  # "patient000/patient000_..._label.json"
+    """
+
+    version = 1
+    columns = ["points_rgb", "points_depth", "visible_rgb", "visible_depth"]
+    columns += ["patientHeight", "patientWeight", "mtime_ns"]
+
+    def __init__(self, path):
+        self.path = path
+        with io.open(osp.join(path, "frames.json"), encoding="utf-8") as f:
+            table = json.load(f)
+        if table.get("version") != self.version:
+            raise ValueError(
+                "Unsupported keypoint store version: {}".format(
+                    table.get("version")
+                )
+            )
+        self.root = table["root"]
+        self.files = table["files"]
+        self.patientPose = table["patientPose"]
+        arrays = {}
+        for column in self.columns:
+            arrays[column] = np.load(
+                osp.join(path, column + ".npy"), mmap_mode="r"
+            )
+        self.points = {view: arrays["points_" + view] for view in VIEWS}
+        self.visible = {view: arrays["visible_" + view] for view in VIEWS}
+        self.patientHeight = arrays["patientHeight"]
+        self.patientWeight = arrays["patientWeight"]
+        self.mtime_ns = arrays["mtime_ns"]
+
+    def __len__(self):
+        return len(self.files)
+
+    @classmethod
+    def build(cls, root, path, num_workers=None, index=None):
+        """Compile the label files under root into a store at path.
+
+        Rows of an existing store at path are reused for the label files
+        whose mtime did not change, only the others are parsed, with
+        num_workers processes. Label files are listed with index, a
+        :class:`DatasetIndex`.
+        """
+        if index is None:
+            index = DatasetIndex()
+        root = osp.abspath(root)
+        previous = {}
+        try:
+            store = cls(path)
+        except (IOError, OSError, ValueError, KeyError):
+            store = None
+        if store is not None and store.root == root:
+            previous = {name: i for i, name in enumerate(store.files)}
+
+        files = []
+        mtimes = []
+        for filename in index.iter_files(root, [".json"]):
+            if not filename.endswith("label.json"):
+                continue
+            try:
+                mtime = os.stat(filename).st_mtime_ns
+            except OSError:
+                continue
+            # iter_files joins the names onto root
+            files.append(filename[len(osp.join(root, "")) :])
+            mtimes.append(mtime)
+
+        n = len(files)
+        columns = {
+            "points_rgb": np.full((n, len(JOINTS), 2), np.nan, np.float32),
+            "points_depth": np.full((n, len(JOINTS), 2), np.nan, np.float32),
+            "visible_rgb": np.zeros((n, len(JOINTS)), bool),
+            "visible_depth": np.zeros((n, len(JOINTS)), bool),
+            "patientHeight": np.full(n, np.nan, np.float32),
+            "patientWeight": np.full(n, np.nan, np.float32),
+            "mtime_ns": np.array(mtimes, np.int64).reshape(n),
+        }
+        poses = [None] * n
+
+        changed = []
+        reused = []
+        for row, (name, mtime) in enumerate(zip(files, mtimes)):
+            i = previous.get(name)
+            if i is None or store.mtime_ns[i] != mtime:
+                changed.append(row)
+            else:
+                reused.append((row, i))
+        if reused:
+            rows, old_rows = np.array(reused).T
+            for column in cls.columns:
+                if column != "mtime_ns":
+                    columns[column][rows] = store._column(column)[old_rows]
+            for row, i in reused:
+                poses[row] = store.patientPose[i]
+
+        results = []
+        if changed:
+            with concurrent.futures.ProcessPoolExecutor(num_workers) as pool:
+                results = list(
+                    pool.map(
+                        _read,
+                        [osp.join(root, files[row]) for row in changed],
+                        chunksize=64,
+                    )
+                )
+        for row, keypoints in zip(changed, results):
+            if isinstance(keypoints, Exception):
+                logger.warn(
+                    "Failed reading {}: {}".format(files[row], keypoints)
+                )
+                # parsed again by the next build
+                columns["mtime_ns"][row] = -1
+                continue
+            for column in cls.columns:
+                if column != "mtime_ns":
+                    columns[column][row] = keypoints[column]
+            poses[row] = keypoints["patientPose"]
+
+        # a label file saved in the same clock tick as this build would
+        # keep its mtime, so recent files are parsed again next time
+        recent = time.time_ns() - DatasetIndex.mtime_margin
+        columns["mtime_ns"][columns["mtime_ns"] > recent] = -1
+
+        table = dict(
+            version=cls.version, root=root, files=files, patientPose=poses
+        )
+        cls._write(path, columns, table)
+        logger.info(
+            "Compiled {} label files into {}, {} parsed".format(
+                n, path, len(changed)
+            )
+        )
+        return cls(path)
+
+    def _column(self, column):
+        if column.startswith("points_"):
+            return self.points[column[len("points_") :]]
+        if column.startswith("visible_"):
+            return self.visible[column[len("visible_") :]]
+        return getattr(self, column)
+
+    @staticmethod
+    def _write(path, columns, table):
+        # the new store is written next to the old one and swapped in, so
+        # the table and arrays of a store always belong together; readers
+        # of the old store keep their memory maps
+        path = osp.abspath(path)
+        tmp_path = tempfile.mkdtemp(
+            prefix=osp.basename(path) + ".", dir=osp.dirname(path)
+        )
+        for column, array in columns.items():
+            np.save(osp.join(tmp_path, column + ".npy"), array)
+        with io.open(
+            osp.join(tmp_path, "frames.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(table, f, ensure_ascii=False)
+        os.chmod(tmp_path, 0o755)
+        if osp.exists(path):
+            old_path = tempfile.mkdtemp(
+                prefix=osp.basename(path) + ".", dir=osp.dirname(path)
+            )
+            os.replace(path, osp.join(old_path, "store"))
+            os.replace(tmp_path, path)
+            shutil.rmtree(old_path)
+        else:
+            os.replace(tmp_path, path)
@@ -2,7 +2,10 @@ import base64
 import contextlib
 import io
 import json
+import os
 import os.path as osp
+import shutil
+import tempfile
 
 import PIL.Image
 
@@ -28,6 +31,30 @@ def open(name, mode):
     return
 
 
+def write_json(filename, data):
+    """Write data to filename through a temporary file and a rename.
+
+    The file is always either the previous or the new version, never a
+    truncated one.
+    """
+    fd, tmp_filename = tempfile.mkstemp(
+        prefix=osp.basename(filename) + ".",
+        suffix=".tmp",
+        dir=osp.dirname(osp.abspath(filename)),
+    )
+    try:
+        with io.open(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        try:
+            shutil.copymode(filename, tmp_filename)
+        except OSError:
+            os.chmod(tmp_filename, 0o644)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.remove(tmp_filename)
+        raise
+
+
 class LabelFileError(Exception):
     pass
 
@@ -40,7 +67,11 @@ class LabelFile(object):
         self.shapesRGB = []
         self.shapesDepth=[]
         self.imagePath = None
+        self.imageFile = None
         self.imageData = None
+        # shapes as they are in the file, see merge_shapes
+        self.savedShapesRGB = None
+        self.savedShapesDepth = None
         if filename is not None:
             self.load(filename)
         self.filename = filename
@@ -53,21 +84,59 @@ class LabelFile(object):
             logger.error("Failed opening image file: {}".format(filename))
             return
 
+        ext = osp.splitext(filename)[1].lower()
+        if PY2 and QT4:
+            format = "PNG"
+        elif ext in [".jpg", ".jpeg"]:
+            format = "JPEG"
+        else:
+            format = "PNG"
+
+        # PIL.Image.open only parses the header, so the file bytes can be
+        # returned as is when there is nothing to transpose or convert.
+        orientation = utils.get_exif_orientation(image_pil)
+        if orientation in [None, 1] and image_pil.format == format:
+            with io.open(filename, "rb") as f:
+                return f.read()
+
         # apply orientation to image according to exif
         image_pil = utils.apply_exif_orientation(image_pil)
 
         with io.BytesIO() as f:
-            ext = osp.splitext(filename)[1].lower()
-            if PY2 and QT4:
-                format = "PNG"
-            elif ext in [".jpg", ".jpeg"]:
-                format = "JPEG"
-            else:
-                format = "PNG"
             image_pil.save(f, format=format)
             f.seek(0)
             return f.read()
 
+    @property
+    def imageData(self):
+        # read lazily, the caller usually has the image bytes already
+        if self._imageData is None and self.imageFile is not None:
+            self._imageData = self.load_image_file(self.imageFile)
+        return self._imageData
+
+    @imageData.setter
+    def imageData(self, value):
+        self._imageData = value
+
+    @staticmethod
+    def load_shape(s):
+        """Return the shape dict loadLabels takes for a saved shape."""
+        shape_keys = [
+            "label",
+            "points",
+            "group_id",
+            "shape_type",
+            "flags",
+        ]
+        return dict(
+            label=s["label"],
+            points=s["points"],
+            shape_type=s.get("shape_type", "polygon"),
+            flags=s.get("flags", {}),
+            group_id=s.get("group_id"),
+            other_data={k: v for k, v in s.items() if k not in shape_keys},
+        )
+
     def load(self, filename):
         keys = [
             "version",
@@ -76,13 +145,6 @@ class LabelFile(object):
             "shapes_depth",# polygonal annotations
             "flags",  # image level flags
         ]
-        shape_keys = [
-            "label",
-            "points",
-            "group_id",
-            "shape_type",
-            "flags",
-        ]
         try:
             with open(filename, "r") as f:
                 data = json.load(f)
@@ -108,42 +170,17 @@ class LabelFile(object):
             #         imageData = utils.img_data_to_png_data(imageData)
             # else:
                 # relative path from label file to relative path from cwd
-            imagePath = osp.join(osp.dirname(filename), data["imagePath"]+"_color.jpg")
-            imageData = self.load_image_file(imagePath)
+            imageFile = osp.join(osp.dirname(filename), data["imagePath"]+"_color.jpg")
             flags = data.get("flags") or {}
             imagePath = data["imagePath"]
             # self._check_image_height_and_width(
-            #     base64.b64encode(imageData).decode("utf-8"),
+            #     imageData,
             #     data.get("imageHeight"),
             #     data.get("imageWidth"),
             # )
-            shapesRGB = [
-                dict(
-                    label=s["label"],
-                    points=s["points"],
-                    shape_type=s.get("shape_type", "polygon"),
-                    flags=s.get("flags", {}),
-                    group_id=s.get("group_id"),
-                    other_data={
-                        k: v for k, v in s.items() if k not in shape_keys
-                    },
-                )
-                for s in data["shapes_rgb"]
-            ]
-
-            shapesDepth = [
-                dict(
-                    label=s["label"],
-                    points=s["points"],
-                    shape_type=s.get("shape_type", "polygon"),
-                    flags=s.get("flags", {}),
-                    group_id=s.get("group_id"),
-                    other_data={
-                        k: v for k, v in s.items() if k not in shape_keys
-                    },
-                )
-                for s in data["shapes_depth"]
-            ]
+            shapesRGB = [self.load_shape(s) for s in data["shapes_rgb"]]
+
+            shapesDepth = [self.load_shape(s) for s in data["shapes_depth"]]
         except Exception as e:
             raise LabelFileError(e)
 
@@ -157,25 +194,63 @@ class LabelFile(object):
         self.shapesRGB = shapesRGB
         self.shapesDepth=shapesDepth
         self.imagePath = imagePath
-        self.imageData = imageData
+        self.imageFile = imageFile
+        self.imageData = None
         self.filename = filename
         self.otherData = otherData
+        self._setSavedShapes(data["shapes_rgb"], data["shapes_depth"])
+
+    def _setSavedShapes(self, shapes_rgb, shapes_depth):
+        self.savedShapesRGB = list(shapes_rgb)
+        self.savedShapesDepth = list(shapes_depth)
+        self._savedIndex = [
+            self._index_shapes(self.savedShapesRGB),
+            self._index_shapes(self.savedShapesDepth),
+        ]
+
+    @staticmethod
+    def _index_shapes(shapes):
+        index = {}
+        for i, shape in enumerate(shapes):
+            index.setdefault(shape["label"], []).append(i)
+        return index
+
+    def merge_shapes(self, shapes_rgb, shapes_depth):
+        """Return the saved shapes with the given ones replacing their labels.
+
+        Every saved entry whose label matches one of the given shapes is
+        replaced by it; given shapes with a label that is not saved are
+        dropped and saved labels that are not given are kept.
+        """
+        merged = []
+        for saved, index, shapes in zip(
+            [self.savedShapesRGB, self.savedShapesDepth],
+            self._savedIndex,
+            [shapes_rgb, shapes_depth],
+        ):
+            saved = list(saved)
+            for shape in shapes:
+                for i in index.get(shape["label"], []):
+                    saved[i] = shape
+            merged.append(saved)
+        return merged
 
     @staticmethod
     def _check_image_height_and_width(imageData, imageHeight, imageWidth):
-        img_arr = utils.img_b64_to_arr(imageData)
-        if imageHeight is not None and img_arr.shape[0] != imageHeight:
+        # imageData is the encoded image, only its header is parsed
+        width, height = utils.img_data_to_size(imageData)
+        if imageHeight is not None and height != imageHeight:
             logger.error(
                 "imageHeight does not match with imageData or imagePath, "
                 "so getting imageHeight from actual image."
             )
-            imageHeight = img_arr.shape[0]
-        if imageWidth is not None and img_arr.shape[1] != imageWidth:
+            imageHeight = height
+        if imageWidth is not None and width != imageWidth:
             logger.error(
                 "imageWidth does not match with imageData or imagePath, "
                 "so getting imageWidth from actual image."
             )
-            imageWidth = img_arr.shape[1]
+            imageWidth = width
         return imageHeight, imageWidth
 
     #TODO 保存文件的最底层函数
@@ -190,12 +265,18 @@ class LabelFile(object):
         imageData=None,
         otherData=None,
         flags=None,
+        writer=None,
     ):
+        """Save the shapes to filename.
+
+        The JSON is written with writer(filename, data) if given, e.g. to
+        queue it on a background thread, and with write_json otherwise.
+        """
         if imageData is not None:
-            imageData = base64.b64encode(imageData).decode("utf-8")
             imageHeight, imageWidth = self._check_image_height_and_width(
                 imageData, imageHeight, imageWidth
             )
+            imageData = base64.b64encode(imageData).decode("utf-8")
         if otherData is None:
             otherData = {}
         if flags is None:
@@ -211,9 +292,12 @@ class LabelFile(object):
             assert key not in data
             data[key] = value
         try:
-            with open(filename, "w") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if writer is None:
+                write_json(filename, data)
+            else:
+                writer(filename, data)
             self.filename = filename
+            self._setSavedShapes(shapes_rgb, shapes_depth)
         except Exception as e:
             raise LabelFileError(e)
 
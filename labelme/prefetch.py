@@ -0,0 +1,252 @@
+import collections
+import concurrent.futures
+import copy
+import os
+import threading
+
+import cv2
+import numpy as np
+from qtpy import QtGui
+
+from labelme.label_file import LabelFile
+from labelme.label_file import LabelFileError
+from labelme.logger import logger
+from labelme import utils
+
+
+_local = threading.local()
+
+
+def _renderer():
+    # one renderer per thread, its lookup table is scratch space
+    renderer = getattr(_local, "renderer", None)
+    if renderer is None:
+        renderer = _local.renderer = utils.DepthRenderer()
+    return renderer
+
+
+def read_depth_image(filename):
+    depth = cv2.imread(filename, cv2.IMREAD_ANYDEPTH)
+    if depth is None:
+        logger.error("Failed opening depth file: {}".format(filename))
+    return depth
+
+
+def load_depth_preview(filename, preview_cache=None):
+    """Return the 8-bit colormapped preview of a 16-bit depth image.
+
+    Returns the BGR preview, the depth threshold and the depth image, or
+    (None, None, None) if the file cannot be read. The depth image is not
+    read at all, and None is returned for it, when preview_cache has an
+    entry for it.
+    """
+    cached = None
+    depth = None
+    if preview_cache is not None:
+        cached = preview_cache.get(filename)
+    if cached is not None:
+        gray, thresh = cached
+    else:
+        depth = read_depth_image(filename)
+        if depth is None:
+            return None, None, None
+        gray, thresh = _renderer().normalize(depth)
+        if preview_cache is not None:
+            preview_cache.put(filename, gray, thresh)
+    # the preview is cached with the frame, so it gets its own buffer
+    preview = np.empty(gray.shape + (3,), dtype=np.uint8)
+    return utils.colorize_depth(gray, out=preview), thresh, depth
+
+
+def _mtime(filename):
+    try:
+        return os.stat(filename).st_mtime_ns
+    except OSError:
+        return None
+
+
+class Frame(object):
+
+    """Decoded color/depth pair of one frame and its parsed label file."""
+
+    def __init__(self, filenameRGB=None, filenameDepth=None, labelPath=None):
+        self.filenameRGB = filenameRGB
+        self.filenameDepth = filenameDepth
+        self.labelPath = labelPath
+        self.imageData = None
+        self.image = None
+        self._depth = None
+        self.depthPreview = None
+        self.depthThresh = None
+        self.imageDepth = None
+        self.labelFile = None
+        self.labelMtime = None
+
+    @property
+    def depth(self):
+        # the preview may come from the cache, so read the raw values lazily
+        if self._depth is None and self.filenameDepth is not None:
+            self._depth = read_depth_image(self.filenameDepth)
+        return self._depth
+
+    @classmethod
+    def load(
+        cls,
+        filenameRGB=None,
+        filenameDepth=None,
+        labelPath=None,
+        preview_cache=None,
+    ):
+        frame = cls(filenameRGB, filenameDepth, labelPath)
+        if filenameRGB is not None:
+            frame.imageData = LabelFile.load_image_file(filenameRGB)
+            if frame.imageData:
+                frame.image = QtGui.QImage.fromData(frame.imageData)
+        if filenameDepth is not None:
+            (
+                frame.depthPreview,
+                frame.depthThresh,
+                frame._depth,
+            ) = load_depth_preview(filenameDepth, preview_cache=preview_cache)
+            if frame.depthPreview is not None:
+                height, width = frame.depthPreview.shape[:2]
+                # QImage does not own the buffer, so the preview array is
+                # kept alive alongside it.
+                frame.imageDepth = QtGui.QImage(
+                    frame.depthPreview.data,
+                    width,
+                    height,
+                    width * 3,
+                    QtGui.QImage.Format_RGB888,
+                )
+        if labelPath is not None:
+            frame.labelMtime = _mtime(labelPath)
+            if frame.labelMtime is not None and LabelFile.is_label_file(
+                labelPath
+            ):
+                try:
+                    frame.labelFile = LabelFile(labelPath)
+                except LabelFileError as e:
+                    logger.warn(
+                        "Failed loading label file {}: {}".format(labelPath, e)
+                    )
+        return frame
+
+    def isStale(self):
+        return (
+            self.labelPath is not None
+            and _mtime(self.labelPath) != self.labelMtime
+        )
+
+
+class FramePrefetcher(object):
+
+    """Bounded LRU cache of decoded frames filled by a worker pool.
+
+    Keys are ``(filenameRGB, filenameDepth, labelPath)`` tuples, the same
+    arguments :meth:`Frame.load` is called with.
+    """
+
+    def __init__(
+        self, cache_size=16, lookahead=3, num_workers=2, preview_cache=None
+    ):
+        self.lookahead = max(0, lookahead)
+        self.preview_cache = preview_cache
+        # The current frame and its neighbours on both sides must fit.
+        self.cache_size = max(cache_size, 2 * self.lookahead + 1)
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        if self.lookahead and num_workers > 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=num_workers
+            )
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def _evict(self):
+        # must be called with self._lock held
+        while len(self._cache) > self.cache_size:
+            _, evicted = self._cache.popitem(last=False)
+            evicted.cancel()
+
+    def get(self, key):
+        """Return the frame for key, loading it synchronously on a miss.
+
+        The label file of the returned frame is a private copy, so callers
+        may modify it without corrupting the cache.
+        """
+        with self._lock:
+            future = self._cache.get(key)
+            if future is not None:
+                self._cache.move_to_end(key)
+
+        frame = None
+        if future is not None and not future.cancelled():
+            try:
+                frame = future.result()
+            except Exception as e:
+                logger.error("Failed prefetching {}: {}".format(key, e))
+            if frame is not None and frame.isStale():
+                frame = None
+
+        if frame is None:
+            frame = Frame.load(*key, preview_cache=self.preview_cache)
+            future = concurrent.futures.Future()
+            future.set_result(frame)
+            with self._lock:
+                self._cache[key] = future
+                self._cache.move_to_end(key)
+                self._evict()
+
+        served = copy.copy(frame)
+        served.labelFile = copy.deepcopy(frame.labelFile)
+        return served
+
+    def prefetch(self, keys):
+        """Schedule keys for background decoding, nearest first."""
+        if self._executor is None:
+            return
+        keys = keys[: 2 * self.lookahead]
+        with self._lock:
+            for key in keys:
+                if key not in self._cache:
+                    self._cache[key] = self._executor.submit(
+                        Frame.load, *key, preview_cache=self.preview_cache
+                    )
+            # the nearest neighbours are the most recently used
+            for key in reversed(keys):
+                self._cache.move_to_end(key)
+            self._evict()
+
+    def invalidate(self, labelPath):
+        """Drop cached frames whose label file is labelPath."""
+        with self._lock:
+            for key in [k for k in self._cache if k[2] == labelPath]:
+                self._cache.pop(key).cancel()
+
+    def clear(self):
+        with self._lock:
+            for future in self._cache.values():
+                future.cancel()
+            self._cache.clear()
+
+    def shutdown(self):
+        self.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def neighbour_rows(row, count, lookahead):
+    """Return the rows around row ordered by distance, next before prev."""
+    rows = []
+    for offset in range(1, lookahead + 1):
+        for neighbour in (row + offset, row - offset):
+            if 0 <= neighbour < count:
+                rows.append(neighbour)
+    return rows
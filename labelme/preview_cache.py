@@ -0,0 +1,119 @@
+import hashlib
+import os
+import os.path as osp
+import tempfile
+import threading
+
+import numpy as np
+
+from labelme.logger import logger
+
+
+class DepthPreviewCache(object):
+
+    """On-disk cache of normalized depth previews and their thresholds.
+
+    Entries are ``.npz`` files named after the path, mtime and size of the
+    depth image, so editing or replacing the image misses the cache. They
+    are stored in cache_dir, or in ``.labelme_cache`` next to the depth
+    images if it is None. Reading an entry bumps its mtime and the least
+    recently used entries are removed when a directory outgrows max_size
+    bytes.
+    """
+
+    dirname = ".labelme_cache"
+    suffix = ".npz"
+
+    def __init__(self, cache_dir=None, max_size=1024**3):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, filename):
+        if self.cache_dir is not None:
+            return self.cache_dir
+        return osp.join(osp.dirname(osp.abspath(filename)), self.dirname)
+
+    def _path(self, filename):
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        key = "{}\0{}\0{}".format(
+            osp.abspath(filename), stat.st_mtime_ns, stat.st_size
+        )
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest() + self.suffix
+        return osp.join(self._dir(filename), name)
+
+    def get(self, filename):
+        """Return (gray, thresh) cached for filename, or None."""
+        if not self.max_size:
+            return None
+        path = self._path(filename)
+        if path is None or not osp.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                gray, thresh = data["gray"], data["thresh"][()]
+            os.utime(path)
+        except Exception as e:
+            logger.warn("Failed reading preview cache {}: {}".format(path, e))
+            return None
+        return gray, thresh
+
+    def put(self, filename, gray, thresh):
+        if not self.max_size:
+            return
+        path = self._path(filename)
+        if path is None:
+            return
+        cache_dir = osp.dirname(path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # write to a temporary file first, readers never see half of it
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, gray=gray, thresh=np.asarray(thresh))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warn("Failed writing preview cache {}: {}".format(path, e))
+            return
+        self._add(cache_dir, osp.getsize(path))
+
+    def _entries(self, cache_dir):
+        entries = []
+        for name in os.listdir(cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(osp.join(cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+        return entries
+
+    def _add(self, cache_dir, size):
+        with self._lock:
+            if cache_dir not in self._sizes:
+                self._sizes[cache_dir] = sum(
+                    entry[1] for entry in self._entries(cache_dir)
+                )
+            else:
+                self._sizes[cache_dir] += size
+            if self._sizes[cache_dir] > self.max_size:
+                self._sizes[cache_dir] = self._evict(cache_dir)
+
+    def _evict(self, cache_dir):
+        # must be called with self._lock held
+        entries = sorted(self._entries(cache_dir))
+        total = sum(entry[1] for entry in entries)
+        for _, size, name in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(osp.join(cache_dir, name))
+            except OSError:
+                continue
+            total -= size
+        return total
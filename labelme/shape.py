@@ -1,16 +1,13 @@
 import copy
 import math
 
+import numpy as np
 from qtpy import QtCore
 from qtpy import QtGui
 
 import labelme.utils
 
 
-# TODO(unknown):
-# - [opt] Store paths instead of creating new ones at each paint.
-
-
 DEFAULT_LINE_COLOR = QtGui.QColor(0, 255, 0, 128)  # bf hovering
 DEFAULT_FILL_COLOR = QtGui.QColor(0, 255, 0, 128)  # hovering
 DEFAULT_SELECT_LINE_COLOR = QtGui.QColor(255, 255, 255)  # selected
@@ -43,6 +40,11 @@ class Shape(object):
     point_type = P_ROUND
     point_size = 8
     scale = 1.0
+    # below this many points numpy costs more than it saves
+    vectorize_min_points = 16
+
+    # bumped whenever the points of any shape change, see version
+    generation = 0
 
     def __init__(
         self,
@@ -54,6 +56,8 @@ class Shape(object):
     ):
         self.label = label
         self.group_id = group_id
+        self._labelAnchor = None
+        self._points = None
         self.points = []
         self.fill = False
         self.selected = False
@@ -96,35 +100,78 @@ class Shape(object):
         ]:
             raise ValueError("Unexpected shape_type: {}".format(value))
         self._shape_type = value
+        self._paths = {}
+
+    @property
+    def points(self):
+        """List of the QPointF of the points, built from xy when needed.
+
+        Edit the points with the methods of Shape or by assigning a new
+        list, changing the QPointF in place is not seen by the shape.
+        """
+        if self._points is None:
+            self._points = [QtCore.QPointF(x, y) for x, y in self._xy.tolist()]
+        return self._points
+
+    @points.setter
+    def points(self, value):
+        if value is None:
+            value = []
+        if not isinstance(value, np.ndarray):
+            value = [(p.x(), p.y()) for p in value]
+        self._setXY(np.array(value, dtype=np.float64).reshape(-1, 2))
+
+    @property
+    def xy(self):
+        """Read only (n, 2) array of the points."""
+        return self._xy
+
+    def _setXY(self, xy):
+        # the array is never changed in place, so copies can share it
+        xy.flags.writeable = False
+        self._xy = xy
+        self._invalidate()
+
+    def _invalidate(self):
+        # drop what is cached from the points, call after changing them
+        self._points = None
+        self._labelAnchor = None
+        self._paths = {}
+        Shape.generation += 1
+        self.version = Shape.generation
 
     def close(self):
         self._closed = True
+        self._paths.pop("line", None)
 
     def addPoint(self, point):
-        if self.points and point == self.points[0]:
+        if len(self._xy) and point == QtCore.QPointF(*self._xy[0]):
             self.close()
         else:
-            self.points.append(point)
+            self._setXY(np.append(self._xy, [[point.x(), point.y()]], axis=0))
 
     def canAddPoint(self):
         return self.shape_type in ["polygon", "linestrip"]
 
     def popPoint(self):
-        if self.points:
-            return self.points.pop()
+        if len(self._xy):
+            point = QtCore.QPointF(*self._xy[-1])
+            self._setXY(self._xy[:-1])
+            return point
         return None
 
     def insertPoint(self, i, point):
-        self.points.insert(i, point)
+        self._setXY(np.insert(self._xy, i, [point.x(), point.y()], axis=0))
 
     def removePoint(self, i):
-        self.points.pop(i)
+        self._setXY(np.delete(self._xy, i, axis=0))
 
     def isClosed(self):
         return self._closed
 
     def setOpen(self):
         self._closed = False
+        self._paths.pop("line", None)
 
     def getRectFromLine(self, pt1, pt2):
         x1, y1 = pt1.x(), pt1.y()
@@ -132,7 +179,7 @@ class Shape(object):
         return QtCore.QRectF(x1, y1, x2 - x1, y2 - y1)
 
     def paint(self, painter):
-        if self.points:
+        if len(self._xy):
             color = (
                 self.select_line_color if self.selected else self.line_color
             )
@@ -141,40 +188,8 @@ class Shape(object):
             pen.setWidth(max(1, int(round(2.0 / self.scale))))
             painter.setPen(pen)
 
-            line_path = QtGui.QPainterPath()
-            vrtx_path = QtGui.QPainterPath()
-
-            if self.shape_type == "rectangle":
-                assert len(self.points) in [1, 2]
-                if len(self.points) == 2:
-                    rectangle = self.getRectFromLine(*self.points)
-                    line_path.addRect(rectangle)
-                for i in range(len(self.points)):
-                    self.drawVertex(vrtx_path, i)
-            elif self.shape_type == "circle":
-                assert len(self.points) in [1, 2]
-                if len(self.points) == 2:
-                    rectangle = self.getCircleRectFromLine(self.points)
-                    line_path.addEllipse(rectangle)
-                for i in range(len(self.points)):
-                    self.drawVertex(vrtx_path, i)
-            elif self.shape_type == "linestrip":
-                line_path.moveTo(self.points[0])
-                for i, p in enumerate(self.points):
-                    line_path.lineTo(p)
-                    self.drawVertex(vrtx_path, i)
-            else:
-                line_path.moveTo(self.points[0])
-                # Uncommenting the following line will draw 2 paths
-                # for the 1st vertex, and make it non-filled, which
-                # may be desirable.
-                # self.drawVertex(vrtx_path, 0)
-
-                for i, p in enumerate(self.points):
-                    line_path.lineTo(p)
-                    self.drawVertex(vrtx_path, i)
-                if self.isClosed():
-                    line_path.lineTo(self.points[0])
+            line_path = self._linePath()
+            vrtx_path = self._vertexPath()
 
             painter.drawPath(line_path)
             painter.drawPath(vrtx_path)
@@ -187,6 +202,57 @@ class Shape(object):
                 )
                 painter.fillPath(line_path, color)
 
+    def _linePath(self):
+        # outline drawn by paint, built again after the points change
+        if self._paths.get("line") is not None:
+            return self._paths["line"]
+        line_path = QtGui.QPainterPath()
+        if self.shape_type == "rectangle":
+            assert len(self.points) in [1, 2]
+            if len(self.points) == 2:
+                rectangle = self.getRectFromLine(*self.points)
+                line_path.addRect(rectangle)
+        elif self.shape_type == "circle":
+            assert len(self.points) in [1, 2]
+            if len(self.points) == 2:
+                rectangle = self.getCircleRectFromLine(self.points)
+                line_path.addEllipse(rectangle)
+        elif self.shape_type == "linestrip":
+            line_path.moveTo(self.points[0])
+            for p in self.points:
+                line_path.lineTo(p)
+        else:
+            line_path.moveTo(self.points[0])
+            for p in self.points:
+                line_path.lineTo(p)
+            if self.isClosed():
+                line_path.lineTo(self.points[0])
+        self._paths["line"] = line_path
+        return line_path
+
+    def _vertexPath(self):
+        # vertex handles drawn by paint, their size depends on the zoom
+        # and the highlighted vertex too
+        key = (
+            self.scale,
+            self.point_size,
+            self.point_type,
+            self._highlightIndex,
+            self._highlightMode,
+        )
+        if self._highlightIndex is not None:
+            self._vertex_fill_color = self.hvertex_fill_color
+        else:
+            self._vertex_fill_color = self.vertex_fill_color
+        cached = self._paths.get("vertex")
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        vrtx_path = QtGui.QPainterPath()
+        for i in range(len(self.points)):
+            self.drawVertex(vrtx_path, i)
+        self._paths["vertex"] = (key, vrtx_path)
+        return vrtx_path
+
     def drawVertex(self, path, i):
         d = self.point_size / self.scale
         shape = self.point_type
@@ -206,28 +272,61 @@ class Shape(object):
             assert False, "unsupported vertex shape"
 
     def nearestVertex(self, point, epsilon):
-        min_distance = float("inf")
-        min_i = None
-        for i, p in enumerate(self.points):
-            dist = labelme.utils.distance(p - point)
-            if dist <= epsilon and dist < min_distance:
-                min_distance = dist
-                min_i = i
-        return min_i
+        if len(self._xy) < self.vectorize_min_points:
+            dist = [
+                math.hypot(x - point.x(), y - point.y())
+                for x, y in self._xy.tolist()
+            ]
+        else:
+            dist = np.hypot(
+                self._xy[:, 0] - point.x(), self._xy[:, 1] - point.y()
+            )
+        return self._nearest(dist, epsilon)
 
     def nearestEdge(self, point, epsilon):
-        min_distance = float("inf")
-        post_i = None
-        for i in range(len(self.points)):
-            line = [self.points[i - 1], self.points[i]]
-            dist = labelme.utils.distancetoline(point, line)
-            if dist <= epsilon and dist < min_distance:
-                min_distance = dist
-                post_i = i
-        return post_i
+        """Return the index i of the nearest edge, points i - 1 to i."""
+        if len(self._xy) < self.vectorize_min_points:
+            points = self.points
+            dist = [
+                labelme.utils.distancetoline(point, (points[i - 1], points[i]))
+                for i in range(len(points))
+            ]
+            return self._nearest(dist, epsilon)
+        # utils.distancetoline of all edges at once
+        p2 = self._xy
+        p1 = np.concatenate([p2[-1:], p2[:-1]])
+        d = p2 - p1
+        a = (point.x(), point.y()) - p1
+        b = (point.x(), point.y()) - p2
+        length = np.hypot(d[:, 0], d[:, 1])
+        cross = np.abs(d[:, 0] * a[:, 1] - d[:, 1] * a[:, 0])
+        dist = np.divide(
+            cross, length, out=np.zeros_like(cross), where=length != 0
+        )
+        dist = np.where(
+            (a * d).sum(axis=1) < 0,
+            np.hypot(a[:, 0], a[:, 1]),
+            np.where(
+                (b * d).sum(axis=1) > 0, np.hypot(b[:, 0], b[:, 1]), dist
+            ),
+        )
+        return self._nearest(dist, epsilon)
+
+    @staticmethod
+    def _nearest(dist, epsilon):
+        # index of the first smallest distance if it is within epsilon
+        if not len(dist):
+            return None
+        if isinstance(dist, list):
+            i = min(range(len(dist)), key=dist.__getitem__)
+        else:
+            i = int(np.argmin(dist))
+        if dist[i] <= epsilon:
+            return i
+        return None
 
     def containsPoint(self, point):
-        return self.makePath().contains(point)
+        return self._path().contains(point)
 
     def getCircleRectFromLine(self, line):
         """Computes parameters to draw with `QPainterPath::addEllipse`"""
@@ -240,6 +339,12 @@ class Shape(object):
         return rectangle
 
     def makePath(self):
+        return QtGui.QPainterPath(self._path())
+
+    def _path(self):
+        # cached makePath, the outline hit tests and bounds use
+        if self._paths.get("path") is not None:
+            return self._paths["path"]
         if self.shape_type == "rectangle":
             path = QtGui.QPainterPath()
             if len(self.points) == 2:
@@ -254,16 +359,40 @@ class Shape(object):
             path = QtGui.QPainterPath(self.points[0])
             for p in self.points[1:]:
                 path.lineTo(p)
+        self._paths["path"] = path
         return path
 
     def boundingRect(self):
-        return self.makePath().boundingRect()
+        return self._path().boundingRect()
+
+    def bounds(self):
+        """Return (x_min, y_min, x_max, y_max) of the points, or None."""
+        if not len(self._xy):
+            return None
+        x_min, y_min = self._xy.min(axis=0).tolist()
+        x_max, y_max = self._xy.max(axis=0).tolist()
+        return x_min, y_min, x_max, y_max
+
+    def labelAnchor(self):
+        """Return the (x, y) the label is drawn at, or None without points.
+
+        It is left of the center of the bounds of the points and computed
+        again only after they change.
+        """
+        if self._labelAnchor is None and len(self._xy):
+            x_min, y_min, x_max, y_max = self.bounds()
+            x = int((x_min + x_max) / 2)
+            y = int((y_min + y_max) / 2)
+            self._labelAnchor = (x - 20, y)
+        return self._labelAnchor
 
     def moveBy(self, offset):
-        self.points = [p + offset for p in self.points]
+        self._setXY(self._xy + [offset.x(), offset.y()])
 
     def moveVertexBy(self, i, offset):
-        self.points[i] = self.points[i] + offset
+        xy = self._xy.copy()
+        xy[i] += [offset.x(), offset.y()]
+        self._setXY(xy)
 
     def highlightVertex(self, i, action):
         """Highlight a vertex appropriately based on the current action
@@ -281,13 +410,21 @@ class Shape(object):
         self._highlightIndex = None
 
     def copy(self):
-        return copy.deepcopy(self)
+        shape = copy.copy(self)
+        # xy and the paths are shared until one of them is edited
+        shape._points = None
+        shape._paths = dict(self._paths)
+        shape.flags = copy.deepcopy(self.flags)
+        shape.other_data = copy.deepcopy(self.other_data)
+        return shape
 
     def __len__(self):
-        return len(self.points)
+        return len(self._xy)
 
     def __getitem__(self, key):
         return self.points[key]
 
     def __setitem__(self, key, value):
-        self.points[key] = value
+        xy = self._xy.copy()
+        xy[key] = [value.x(), value.y()]
+        self._setXY(xy)
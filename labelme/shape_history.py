@@ -0,0 +1,223 @@
+import collections
+
+import numpy as np
+
+
+# rough size of a change record besides the points, in bytes
+RECORD_SIZE = 200
+
+ShapeState = collections.namedtuple(
+    "ShapeState", ["xy", "label", "group_id", "shape_type", "flags"]
+)
+
+# The change of the shapes of one canvas. removed and added are lists of
+# (index, shape, state), modified of (shape, state before, state after).
+# order is None, or the shape lists before and after if the shapes kept
+# were reordered.
+Change = collections.namedtuple(
+    "Change", ["canvas", "removed", "added", "modified", "order"]
+)
+
+
+def shape_state(shape):
+    """Return the :class:`ShapeState` an edit of a shape can change.
+
+    Shapes never change their points array in place, so the state shares it
+    with the shape.
+    """
+    flags = dict(shape.flags) if shape.flags is not None else None
+    return ShapeState(
+        shape.xy, shape.label, shape.group_id, shape.shape_type, flags
+    )
+
+
+def _same_state(a, b):
+    return (
+        (a.xy is b.xy or np.array_equal(a.xy, b.xy))
+        and a.label == b.label
+        and a.group_id == b.group_id
+        and a.shape_type == b.shape_type
+        and a.flags == b.flags
+    )
+
+
+def _restore(shape, state):
+    if shape.xy is not state.xy:
+        shape.points = state.xy
+    shape.label = state.label
+    shape.group_id = state.group_id
+    if shape.shape_type != state.shape_type:
+        shape.shape_type = state.shape_type
+    shape.flags = dict(state.flags) if state.flags is not None else None
+
+
+def _inverse(change):
+    order = change.order
+    if order is not None:
+        order = order[1], order[0]
+    return Change(
+        change.canvas,
+        change.added,
+        change.removed,
+        [(shape, after, before) for shape, before, after in change.modified],
+        order,
+    )
+
+
+def _size(command):
+    size = 0
+    for change in command:
+        for _, _, state in change.removed + change.added:
+            size += RECORD_SIZE + state.xy.nbytes
+        for _, before, after in change.modified:
+            size += RECORD_SIZE + before.xy.nbytes + after.xy.nbytes
+        if change.order is not None:
+            size += 8 * (len(change.order[0]) + len(change.order[1]))
+    return size
+
+
+class ShapeHistory(object):
+
+    """Undo and redo history of the shapes of several canvases.
+
+    The canvases commit after each edit. A commit compares the shapes of
+    every canvas with the state of the last commit and pushes one command
+    with the shapes removed, added and modified, so the history holds the
+    changes only and an edit touching both canvases is undone at once. The
+    oldest commands are dropped once the history outgrows max_size bytes.
+    """
+
+    def __init__(self, max_size=1024**2):
+        self.max_size = max_size
+        self._canvases = []
+        # canvas -> shapes and {shape: state} of the last commit
+        self._shapes = {}
+        self._states = {}
+        self._undo = collections.deque()
+        self._redo = []
+        self._size = 0
+
+    def addCanvas(self, canvas):
+        self._canvases.append(canvas)
+        self._track(canvas)
+
+    @property
+    def canUndo(self):
+        return bool(self._undo)
+
+    @property
+    def canRedo(self):
+        return bool(self._redo)
+
+    def reset(self):
+        """Forget the commands and take the shapes as they are now."""
+        self._undo.clear()
+        self._redo = []
+        self._size = 0
+        for canvas in self._canvases:
+            self._track(canvas)
+
+    def commit(self):
+        """Push the changes since the last commit, return True if any."""
+        command = [
+            change
+            for change in (self._diff(canvas) for canvas in self._canvases)
+            if change is not None
+        ]
+        if not command:
+            return False
+        for change in command:
+            self._commit(change)
+        self._redo = []
+        self._undo.append((command, _size(command)))
+        self._size += self._undo[-1][1]
+        while self._size > self.max_size and len(self._undo) > 1:
+            self._size -= self._undo.popleft()[1]
+        return True
+
+    def undo(self):
+        """Undo the last command, return its inverse :class:`Change` list.
+
+        Edits not committed yet are committed first, so they are undone.
+        """
+        self.commit()
+        if not self._undo:
+            return []
+        command, size = self._undo.pop()
+        self._size -= size
+        self._redo.append(command)
+        return [self._apply(_inverse(change)) for change in command]
+
+    def redo(self):
+        """Redo the last command undone, return its :class:`Change` list."""
+        if not self._redo:
+            return []
+        command = self._redo.pop()
+        size = _size(command)
+        self._undo.append((command, size))
+        self._size += size
+        return [self._apply(change) for change in command]
+
+    def _track(self, canvas):
+        self._shapes[canvas] = list(canvas.shapes)
+        self._states[canvas] = {
+            shape: shape_state(shape) for shape in canvas.shapes
+        }
+
+    def _diff(self, canvas):
+        shapes = self._shapes[canvas]
+        states = self._states[canvas]
+        current = canvas.shapes
+        indices = {shape: i for i, shape in enumerate(current)}
+        removed = [
+            (i, shape, states[shape])
+            for i, shape in enumerate(shapes)
+            if shape not in indices
+        ]
+        added = []
+        modified = []
+        for i, shape in enumerate(current):
+            state = shape_state(shape)
+            if shape not in states:
+                added.append((i, shape, state))
+            elif not _same_state(states[shape], state):
+                modified.append((shape, states[shape], state))
+        order = None
+        kept_before = [shape for shape in shapes if shape in indices]
+        kept_after = [shape for shape in current if shape in states]
+        if kept_before != kept_after:
+            order = tuple(shapes), tuple(current)
+        if not (removed or added or modified or order):
+            return None
+        return Change(canvas, removed, added, modified, order)
+
+    def _commit(self, change):
+        states = self._states[change.canvas]
+        for _, shape, _ in change.removed:
+            del states[shape]
+        for _, shape, state in change.added:
+            states[shape] = state
+        for shape, _, state in change.modified:
+            states[shape] = state
+        self._shapes[change.canvas] = list(change.canvas.shapes)
+
+    def _apply(self, change):
+        shapes = change.canvas.shapes
+        if change.order is not None:
+            shapes[:] = change.order[1]
+        else:
+            for _, shape, _ in change.removed:
+                shapes.remove(shape)
+            for i, shape, _ in change.added:
+                shapes.insert(i, shape)
+        states = self._states[change.canvas]
+        for _, shape, _ in change.removed:
+            del states[shape]
+        for _, shape, state in change.added:
+            _restore(shape, state)
+            states[shape] = shape_state(shape)
+        for shape, _, state in change.modified:
+            _restore(shape, state)
+            states[shape] = shape_state(shape)
+        self._shapes[change.canvas] = list(shapes)
+        return change
@@ -0,0 +1,130 @@
+import collections
+import math
+
+from labelme.shape import Shape
+
+
+def shape_bounds(shape):
+    """Return the (x_min, y_min, x_max, y_max) a shape covers, or None.
+
+    Unlike Shape.bounds it includes the whole circle of circle shapes, so
+    it covers all that nearestVertex, nearestEdge and containsPoint can
+    hit and what paint draws, vertex handles aside.
+    """
+    bounds = shape.bounds()
+    if bounds is None:
+        return None
+    x1, y1, x2, y2 = bounds
+    if shape.shape_type == "circle" and len(shape) == 2:
+        (cx, cy), (px, py) = shape.xy.tolist()
+        r = math.hypot(px - cx, py - cy)
+        x1, y1 = min(x1, cx - r), min(y1, cy - r)
+        x2, y2 = max(x2, cx + r), max(y2, cy + r)
+    return x1, y1, x2, y2
+
+
+class ShapeGrid(object):
+
+    """Uniform grid over the bounds of shapes for hit testing.
+
+    A shape is binned into the cells its bounds overlap, so a query only
+    looks at the shapes near a point. The grid follows the shape list
+    given to :meth:`sync`: shapes are added, removed and binned again when
+    their points change, which Shape tracks with its version.
+    """
+
+    # in image pixels
+    cell_size = 64
+    # shapes overlapping more cells are kept out of the grid and always
+    # returned, e.g. a polygon around the whole patient
+    max_cells = 64
+
+    def __init__(self):
+        self._cells = collections.defaultdict(set)
+        self._large = set()
+        # shape -> (version, bounds, cells)
+        self._entries = {}
+        self._order = {}
+        self._shapes = []
+        self._generation = None
+
+    def sync(self, shapes):
+        """Index the shapes of a z-ordered list, the last one on top."""
+        if shapes != self._shapes:
+            added = set(shapes)
+            for shape in list(self._entries):
+                if shape not in added:
+                    self._remove(shape)
+            self._shapes = list(shapes)
+            self._order = {shape: i for i, shape in enumerate(shapes)}
+        elif Shape.generation == self._generation:
+            return
+        for shape in self._shapes:
+            entry = self._entries.get(shape)
+            if entry is None or entry[0] != shape.version:
+                self._add(shape)
+        self._generation = Shape.generation
+
+    def query(self, point, epsilon):
+        """Return the shapes whose bounds are within epsilon of a point.
+
+        They are ordered top first, as mouseMoveEvent walks them.
+        """
+        x, y = point.x(), point.y()
+        cx1, cy1 = self._cell(x - epsilon, y - epsilon)
+        cx2, cy2 = self._cell(x + epsilon, y + epsilon)
+        candidates = set(self._large)
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self._cells):
+            for cell in self._cells.values():
+                candidates.update(cell)
+        else:
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    cell = self._cells.get((cx, cy))
+                    if cell:
+                        candidates.update(cell)
+        shapes = []
+        for shape in candidates:
+            x1, y1, x2, y2 = self._entries[shape][1]
+            if (
+                x1 - epsilon <= x <= x2 + epsilon
+                and y1 - epsilon <= y <= y2 + epsilon
+            ):
+                shapes.append(shape)
+        shapes.sort(key=self._order.__getitem__, reverse=True)
+        return shapes
+
+    def _cell(self, x, y):
+        return (
+            int(math.floor(x / self.cell_size)),
+            int(math.floor(y / self.cell_size)),
+        )
+
+    def _add(self, shape):
+        self._remove(shape)
+        bounds = shape_bounds(shape)
+        cells = None
+        if bounds is not None:
+            cx1, cy1 = self._cell(bounds[0], bounds[1])
+            cx2, cy2 = self._cell(bounds[2], bounds[3])
+            if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > self.max_cells:
+                self._large.add(shape)
+            else:
+                cells = [
+                    (cx, cy)
+                    for cx in range(cx1, cx2 + 1)
+                    for cy in range(cy1, cy2 + 1)
+                ]
+                for cell in cells:
+                    self._cells[cell].add(shape)
+        self._entries[shape] = (shape.version, bounds, cells)
+
+    def _remove(self, shape):
+        entry = self._entries.pop(shape, None)
+        if entry is None:
+            return
+        self._large.discard(shape)
+        for cell in entry[2] or []:
+            self._cells[cell].discard(shape)
+            if not self._cells[cell]:
+                del self._cells[cell]
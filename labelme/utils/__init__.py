@@ -2,12 +2,21 @@
 
 from ._io import lblsave
 
+from .depth import DepthRenderer
+from .depth import colorize_depth
+from .depth import depth_histogram
+from .depth import depth_threshold
+from .depth import sample_depth
+
 from .image import apply_exif_orientation
+from .image import get_exif_orientation
 from .image import img_arr_to_b64
 from .image import img_b64_to_arr
 from .image import img_data_to_arr
 from .image import img_data_to_pil
+from .image import img_data_to_size
 from .image import img_data_to_png_data
+from .image import img_file_to_size
 from .image import img_pil_to_data
 
 from .shape import labelme_shapes_to_label
@@ -0,0 +1,146 @@
+import warnings
+
+import numpy as np
+
+
+_BONE_LUT = None
+
+
+def _bone_lut():
+    # The preview used to be rendered by applying COLORMAP_BONE twice, the
+    # second time on the BGR result, which OpenCV converts to gray first.
+    # Both steps only depend on the 8-bit input value, so they collapse into
+    # one 256 entry table.
+    global _BONE_LUT
+    if _BONE_LUT is None:
+        import cv2
+
+        gray = np.arange(256, dtype=np.uint8).reshape(1, 256)
+        bgr = cv2.applyColorMap(gray, cv2.COLORMAP_BONE)
+        bgr = cv2.applyColorMap(
+            cv2.convertScaleAbs(bgr, alpha=1), cv2.COLORMAP_BONE
+        )
+        _BONE_LUT = bgr.reshape(256, 3)
+    return _BONE_LUT
+
+
+def depth_histogram(depth):
+    return np.bincount(depth.ravel(), minlength=65536)
+
+
+def depth_threshold(depth, ratio=0.97, hist=None):
+    """Return mean + 3 * std of the lowest ratio of the depth values.
+
+    Same cutoff as sorting the values and taking the first ratio of them,
+    computed from a 65536 bin histogram instead.
+    """
+    if hist is None:
+        hist = depth_histogram(depth)
+    n_keep = int(ratio * depth.size)
+    if n_keep == 0:
+        return np.uint16(0)
+
+    # number of pixels of each value among the lowest n_keep
+    counts = np.minimum(hist, np.maximum(n_keep - (np.cumsum(hist) - hist), 0))
+    values = np.arange(counts.size, dtype=np.float64)
+    mean = np.dot(counts, values) / n_keep
+    sigma = np.sqrt(np.dot(counts, (values - mean) ** 2) / n_keep)
+    return np.uint16(mean + 3 * sigma)
+
+
+def _index_lut(hist, thresh):
+    # uint16 -> uint8 table of the clipped and stretched depth values
+    nonzero = np.flatnonzero(hist)
+    min_value = nonzero[0]
+    max_value = min(nonzero[-1], thresh)
+
+    values = np.arange(65536, dtype=np.float64)
+    np.clip(values, min_value, max_value, out=values)
+    if max_value > min_value:
+        values -= min_value
+        values *= 255.0
+        values /= max_value - min_value
+    else:
+        values[:] = 0
+    return values.astype(np.uint8)
+
+
+def _buffer(buffer, shape):
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=np.uint8)
+    return buffer
+
+
+def colorize_depth(gray, out=None):
+    """Colormap an 8-bit image returned by :meth:`DepthRenderer.normalize`."""
+    return np.take(_bone_lut(), gray, axis=0, out=out)
+
+
+class DepthRenderer(object):
+
+    """Render 16-bit depth images to the 8-bit BGR preview.
+
+    The depth values are clipped at :func:`depth_threshold`, stretched to
+    [0, 255] and colormapped, all through one uint16 -> BGR lookup table
+    that is rebuilt for each frame.
+    """
+
+    def __init__(self):
+        self._lut = np.empty((65536, 3), dtype=np.uint8)
+        self._out = None
+        self._gray = None
+
+    def normalize(self, depth, out=None):
+        """Return the 8-bit image before colormapping and the threshold.
+
+        Like :meth:`render`, a buffer is reused when out is not given.
+        """
+        if out is None:
+            out = self._gray = _buffer(self._gray, depth.shape)
+        hist = depth_histogram(depth)
+        thresh = depth_threshold(depth, hist=hist)
+        np.take(_index_lut(hist, thresh), depth, out=out)
+        return out, thresh
+
+    def render(self, depth, out=None):
+        """Render depth into out, or into a buffer reused across calls.
+
+        The returned array is overwritten by the next call without out, so
+        pass a fresh one when the preview has to outlive it.
+        """
+        if out is None:
+            out = self._out = _buffer(self._out, depth.shape + (3,))
+        hist = depth_histogram(depth)
+        thresh = depth_threshold(depth, hist=hist)
+        np.take(_bone_lut(), _index_lut(hist, thresh), axis=0, out=self._lut)
+        np.take(self._lut, depth, axis=0, out=out)
+        return out
+
+
+def sample_depth(depth, points, radius=2):
+    """Return the median of the valid depth around each (x, y) point.
+
+    Zero depth values are invalid. The window is (2 * radius + 1) pixels
+    wide and clipped at the image border; points without any valid value
+    in it, or outside of the image, get NaN.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    height, width = depth.shape[:2]
+    offsets = np.arange(-radius, radius + 1)
+    with np.errstate(invalid="ignore"):
+        x = np.round(points[:, 0])
+        y = np.round(points[:, 1])
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    x = np.where(inside, x, 0).astype(np.intp)
+    y = np.where(inside, y, 0).astype(np.intp)
+    xs = np.clip(x[:, None] + offsets, 0, width - 1)
+    ys = np.clip(y[:, None] + offsets, 0, height - 1)
+    # (n, window, window) values around each point
+    values = depth[ys[:, :, None], xs[:, None, :]].astype(np.float64)
+    values = values.reshape(len(points), len(offsets) ** 2)
+    values[values == 0] = np.nan
+    values[~inside] = np.nan
+    with warnings.catch_warnings():
+        # windows without any valid value are expected
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmedian(values, axis=1)
@@ -1,5 +1,6 @@
 import base64
 import io
+import struct
 
 import numpy as np
 import PIL.ExifTags
@@ -56,14 +57,14 @@ def img_data_to_png_data(img_data):
             return f.read()
 
 
-def apply_exif_orientation(image):
+def get_exif_orientation(image):
     try:
         exif = image._getexif()
     except AttributeError:
         exif = None
 
     if exif is None:
-        return image
+        return None
 
     exif = {
         PIL.ExifTags.TAGS[k]: v
@@ -71,9 +72,13 @@ def apply_exif_orientation(image):
         if k in PIL.ExifTags.TAGS
     }
 
-    orientation = exif.get("Orientation", None)
+    return exif.get("Orientation", None)
 
-    if orientation == 1:
+
+def apply_exif_orientation(image):
+    orientation = get_exif_orientation(image)
+
+    if orientation is None or orientation == 1:
         # do nothing
         return image
     elif orientation == 2:
@@ -99,3 +104,62 @@ def apply_exif_orientation(image):
         return image.transpose(PIL.Image.ROTATE_90)
     else:
         return image
+
+
+def _jpeg_size(f):
+    # walk the markers up to the start of frame, skipping the segments
+    # before it, e.g. exif, by their length
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0xD8 or marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            return None
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        length = struct.unpack(">H", header)[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            sof = f.read(5)
+            if len(sof) < 5:
+                return None
+            height, width = struct.unpack(">HH", sof[1:])
+            return width, height
+        f.seek(length - 2, io.SEEK_CUR)
+
+
+def img_file_to_size(f):
+    """Return the (width, height) of an image from its header.
+
+    f is a filename or a binary file object. JPEG and PNG headers are
+    parsed directly, other formats are left to PIL, which also stops at
+    the header.
+    """
+    if not hasattr(f, "read"):
+        with io.open(f, "rb") as f:
+            return img_file_to_size(f)
+    start = f.tell()
+    signature = f.read(24)
+    size = None
+    if signature[:8] == b"\x89PNG\r\n\x1a\n" and signature[12:16] == b"IHDR":
+        size = struct.unpack(">II", signature[16:24])
+    elif signature[:2] == b"\xff\xd8":
+        f.seek(start + 2)
+        size = _jpeg_size(f)
+    if size is None:
+        f.seek(start)
+        with PIL.Image.open(f) as img_pil:
+            size = img_pil.size
+    return size
+
+
+def img_data_to_size(img_data):
+    """Return the (width, height) of encoded image bytes from the header."""
+    return img_file_to_size(io.BytesIO(img_data))
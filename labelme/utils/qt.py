@@ -1,8 +1,7 @@
+from math import hypot
 from math import sqrt
 import os.path as osp
 
-import numpy as np
-
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
@@ -82,17 +81,20 @@ def distance(p):
 
 
 def distancetoline(point, line):
+    # plain floats, it runs for every edge on every mouse move
     p1, p2 = line
-    p1 = np.array([p1.x(), p1.y()])
-    p2 = np.array([p2.x(), p2.y()])
-    p3 = np.array([point.x(), point.y()])
-    if np.dot((p3 - p1), (p2 - p1)) < 0:
-        return np.linalg.norm(p3 - p1)
-    if np.dot((p3 - p2), (p1 - p2)) < 0:
-        return np.linalg.norm(p3 - p2)
-    if np.linalg.norm(p2 - p1) == 0:
+    x1, y1 = p1.x(), p1.y()
+    x2, y2 = p2.x(), p2.y()
+    x3, y3 = point.x(), point.y()
+    dx, dy = x2 - x1, y2 - y1
+    if (x3 - x1) * dx + (y3 - y1) * dy < 0:
+        return hypot(x3 - x1, y3 - y1)
+    if (x3 - x2) * -dx + (y3 - y2) * -dy < 0:
+        return hypot(x3 - x2, y3 - y2)
+    length = hypot(dx, dy)
+    if length == 0:
         return 0
-    return np.linalg.norm(np.cross(p2 - p1, p1 - p3)) / np.linalg.norm(p2 - p1)
+    return abs(dx * (y1 - y3) - dy * (x1 - x3)) / length
 
 
 def fmtShortcut(text):
@@ -8,6 +8,9 @@ from .color_dialog import ColorDialog
 
 from .file_dialog_preview import FileDialogPreview
 
+from .file_list_widget import FileListModel
+from .file_list_widget import FileListWidget
+
 from .label_dialog import LabelDialog
 from .label_dialog import LabelQLineEdit
 
@@ -4,6 +4,9 @@ from qtpy import QtWidgets
 
 from labelme import QT5
 from labelme.shape import Shape
+from labelme.shape_history import ShapeHistory
+from labelme.spatial_index import shape_bounds
+from labelme.spatial_index import ShapeGrid
 import labelme.utils
 from PyQt5.QtGui import QPainter,QFont,QColor
 
@@ -40,7 +43,6 @@ class Canvas(QtWidgets.QWidget):
     _fill_drawing = False
 
     def __init__(self, *args, **kwargs):
-        self._shapes=[]
         self.epsilon = kwargs.pop("epsilon", 10.0)
         self.double_click = kwargs.pop("double_click", "close")
         if self.double_click not in [None, "close"]:
@@ -49,12 +51,13 @@ class Canvas(QtWidgets.QWidget):
                     self.double_click
                 )
             )
-        self.num_backups = kwargs.pop("num_backups", 10)
+        # the app shares one history between its canvases
+        self.history = kwargs.pop("history", None) or ShapeHistory()
         super(Canvas, self).__init__(*args, **kwargs)
         # Initialise local state.
         self.mode = self.EDIT
         self.shapes = []
-        self.shapesBackups = []
+        self.history.addCanvas(self)
         self.current = None
         self.selectedShapes = []  # save the selected shapes here
         self.selectedShapesCopy = []
@@ -82,6 +85,15 @@ class Canvas(QtWidgets.QWidget):
         self.snapping = True
         self.hShapeIsSelected = False
         self._painter = QtGui.QPainter()
+        self._labelFont = QFont("simsun", 15, QFont.Bold)
+        # drawText puts the baseline at y, drawStaticText the top
+        self._labelAscent = QtGui.QFontMetrics(self._labelFont).ascent()
+        self._labelTexts = {}
+        self._grid = ShapeGrid()
+        # (key, rect, pixmap) of the image and the shapes not in the
+        # overlay, see paintEvent
+        self._static = None
+        self._overlayRect = QtCore.QRect()
         self._cursor = CURSOR_DEFAULT
         # Menus:
         # 0: right-click without selection and dragging of shapes
@@ -115,39 +127,19 @@ class Canvas(QtWidgets.QWidget):
         ]:
             raise ValueError("Unsupported createMode: %s" % value)
         self._createMode = value
-#FIXME store shape这个函数有问题
     def storeShapes(self):
-        shapesBackup = []
-        for shape in self.shapes:
-            shapesBackup.append(shape.copy())
-        if len(self.shapesBackups) > self.num_backups:
-            self.shapesBackups = self.shapesBackups[-self.num_backups - 1 :]
-        self.shapesBackups.append(shapesBackup)
-
-    @property
-    def isShapeRestorable(self):
-        # We save the state AFTER each edit (not before) so for an
-        # edit to be undoable, we expect the CURRENT and the PREVIOUS state
-        # to be in the undo stack.
-        if len(self.shapesBackups) < 2:
-            return False
-        return True
+        # We save the state AFTER each edit, the history keeps what
+        # changed since the previous one.
+        return self.history.commit()
 
     def restoreShape(self):
-        # This does _part_ of the job of restoring shapes.
-        # The complete process is also done in app.py::undoShapeEdit
-        # and app.py::loadShapes and our own Canvas::loadShapes function.
-        if not self.isShapeRestorable:
-            return
-        self.shapesBackups.pop()  # latest
-
-        # The application will eventually call Canvas.loadShapes which will
-        # push this right back onto the stack.
-        shapesBackup = self.shapesBackups.pop()
-        self.shapes = shapesBackup
+        # The history changed self.shapes on undo or redo, the label lists
+        # are updated in app.py::applyShapeChanges.
         self.selectedShapes = []
+        self.selectedShapesCopy = []
         for shape in self.shapes:
             shape.selected = False
+        self.hShape = self.hVertex = self.hEdge = None
         self.update()
 
     def enterEvent(self, ev):
@@ -178,7 +170,7 @@ class Canvas(QtWidgets.QWidget):
     def unHighlight(self):
         if self.hShape:
             self.hShape.highlightClear()
-            self.update()
+            self.updateOverlay()
         self.prevhShape = self.hShape
         self.prevhVertex = self.hVertex
         self.prevhEdge = self.hEdge
@@ -242,7 +234,7 @@ class Canvas(QtWidgets.QWidget):
             elif self.createMode == "point":
                 self.line.points = [self.current[0]]
                 self.line.close()
-            self.repaint()
+            self.updateOverlay()
             self.current.highlightClear()
             return
 
@@ -251,24 +243,24 @@ class Canvas(QtWidgets.QWidget):
             if self.selectedShapesCopy and self.prevPoint:
                 self.overrideCursor(CURSOR_MOVE)
                 self.boundedMoveShapes(self.selectedShapesCopy, pos)
-                self.repaint()
+                self.updateOverlay()
             elif self.selectedShapes:
                 self.selectedShapesCopy = [
                     s.copy() for s in self.selectedShapes
                 ]
-                self.repaint()
+                self.updateOverlay()
             return
 
         # Polygon/Vertex moving.
         if QtCore.Qt.LeftButton & ev.buttons():
             if self.selectedVertex():
                 self.boundedMoveVertex(pos)
-                self.repaint()
+                self.updateOverlay()
                 self.movingShape = True
             elif self.selectedShapes and self.prevPoint:
                 self.overrideCursor(CURSOR_MOVE)
                 self.boundedMoveShapes(self.selectedShapes, pos)
-                self.repaint()
+                self.updateOverlay()
                 self.movingShape = True
             return
 
@@ -277,7 +269,10 @@ class Canvas(QtWidgets.QWidget):
         # - Highlight vertex
         # Update shape/vertex fill and tooltip value accordingly.
         self.setToolTip(self.tr("Image"))
-        for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
+        # only the shapes near the mouse can be hit, see ShapeGrid.query
+        self._grid.sync(self.shapes)
+        candidates = self._grid.query(pos, self.epsilon / self.scale)
+        for shape in [s for s in candidates if self.isVisible(s)]:
             # Look for a nearby vertex to highlight. If that fails,
             # check if we happen to be inside a shape.
             index = shape.nearestVertex(pos, self.epsilon / self.scale)
@@ -293,7 +288,7 @@ class Canvas(QtWidgets.QWidget):
                 self.overrideCursor(CURSOR_POINT)
                 self.setToolTip(self.tr("Click & drag to move point"))
                 self.setStatusTip(self.toolTip())
-                self.update()
+                self.updateOverlay()
                 break
             elif index_edge is not None and shape.canAddPoint():
                 if self.selectedVertex():
@@ -305,7 +300,7 @@ class Canvas(QtWidgets.QWidget):
                 self.overrideCursor(CURSOR_POINT)
                 self.setToolTip(self.tr("Click to create point"))
                 self.setStatusTip(self.toolTip())
-                self.update()
+                self.updateOverlay()
                 break
             elif shape.containsPoint(pos):
                 if self.selectedVertex():
@@ -320,7 +315,7 @@ class Canvas(QtWidgets.QWidget):
                 )
                 self.setStatusTip(self.toolTip())
                 self.overrideCursor(CURSOR_GRAB)
-                self.update()
+                self.updateOverlay()
                 break
         else:  # Nothing found, clear highlights, reset state.
             self.unHighlight()
@@ -400,7 +395,7 @@ class Canvas(QtWidgets.QWidget):
                 group_mode = int(ev.modifiers()) == QtCore.Qt.ControlModifier
                 self.selectShapePoint(pos, multiple_selection_mode=group_mode)
                 self.prevPoint = pos
-                self.repaint()
+                self.update()
         elif ev.button() == QtCore.Qt.RightButton and self.editing():
             group_mode = int(ev.modifiers()) == QtCore.Qt.ControlModifier
             if not self.selectedShapes or (
@@ -408,7 +403,7 @@ class Canvas(QtWidgets.QWidget):
                 and self.hShape not in self.selectedShapes
             ):
                 self.selectShapePoint(pos, multiple_selection_mode=group_mode)
-                self.repaint()
+                self.update()
             self.prevPoint = pos
 
     def mouseReleaseEvent(self, ev):
@@ -421,7 +416,7 @@ class Canvas(QtWidgets.QWidget):
             ):
                 # Cancel the move by deleting the shadow copy.
                 self.selectedShapesCopy = []
-                self.repaint()
+                self.updateOverlay()
         elif ev.button() == QtCore.Qt.LeftButton:
             if self.editing():
                 if (
@@ -434,12 +429,7 @@ class Canvas(QtWidgets.QWidget):
                     )
 
         if self.movingShape and self.hShape:
-            index = self.shapes.index(self.hShape)
-            if (
-                self.shapesBackups[-1][index].points
-                != self.shapes[index].points
-            ):
-                self.storeShapes()
+            if self.storeShapes():
                 self.shapeMoved.emit()
 
             self.movingShape = False
@@ -456,7 +446,7 @@ class Canvas(QtWidgets.QWidget):
             for i, shape in enumerate(self.selectedShapesCopy):
                 self.selectedShapes[i].points = shape.points
         self.selectedShapesCopy = []
-        self.repaint()
+        self.update()
         self.storeShapes()
         return True
 
@@ -623,53 +613,173 @@ class Canvas(QtWidgets.QWidget):
         if not self.boundedMoveShapes(shapes, point - offset):
             self.boundedMoveShapes(shapes, point + offset)
 
-    def count_points_center(self):
-        points=self._shapes
-        pointt=self.shapes.copy()
-
-        shape=[]
-        if len(pointt)!=0:
-            for d in pointt:
-
-
-                label = d.label
-                point = d.points
-                if point == None:
-                    continue
-                x_val=[i.x() for i in point]
-                y_val=[i.y() for i in point]
-
-                x_min = min(x_val)
-                x_max = max(x_val)
-                y_min = min(y_val)
-                y_max = max(y_val)
-                x = int((x_min + x_max) / 2)
-                y = int((y_min + y_max) / 2)
-                shape.append({"label": label, "x": int(x - 20), "y": y,"select":d.selected})
+    def labelText(self, label):
+        """Return the laid out QStaticText of a label, shared by shapes."""
+        text = self._labelTexts.get(label)
+        if text is None:
+            text = QtGui.QStaticText(label)
+            text.setTextFormat(QtCore.Qt.PlainText)
+            # lays it out, so size() is known before it is drawn
+            text.prepare(QtGui.QTransform(), self._labelFont)
+            self._labelTexts[label] = text
+        return text
+
+    def overlayShapes(self):
+        """Return the shapes painted over the static layer.
+
+        They are the ones that change while editing, the selected and the
+        hovered shapes. The hovered shape stays in the static layer too,
+        unless it is moved, so only its highlight is painted over it.
+        """
+        shapes = [s for s in self.shapes if s.selected]
+        if (
+            self.hShape is not None
+            and not self.hShape.selected
+            and self.hShape in self.shapes
+        ):
+            shapes.append(self.hShape)
+        return shapes
+
+    def updateOverlay(self):
+        """Repaint the area of the overlay only, before and after a change.
+
+        Use it when only the overlay shapes, the shape being drawn or the
+        moved copies changed, and update() otherwise.
+        """
+        rect = self._overlayBounds()
+        self.update(rect.united(self._overlayRect))
+        self._overlayRect = rect
+
+    def _overlayBounds(self):
+        # widget rectangle of what paintEvent draws over the static layer
+        shapes = self.overlayShapes() + self.selectedShapesCopy
+        if self.current:
+            shapes += [self.current, self.line]
+        # vertex handles are up to 4 points wide when highlighted
+        margin = (Shape.point_size * 2 + 2) / self.scale + 1
+        rect = QtCore.QRectF()
+        for shape in shapes:
+            bounds = shape_bounds(shape)
+            if bounds is None:
+                continue
+            x1, y1, x2, y2 = bounds
+            rect = rect.united(
+                QtCore.QRectF(x1, y1, x2 - x1, y2 - y1).adjusted(
+                    -margin, -margin, margin, margin
+                )
+            )
+            anchor = shape.labelAnchor()
+            if anchor is not None and shape.label is not None:
+                size = self.labelText(shape.label).size()
+                rect = rect.united(
+                    QtCore.QRectF(
+                        anchor[0], anchor[1] - self._labelAscent, 0, 0
+                    ).adjusted(0, 0, size.width() + 2, size.height() + 2)
+                )
+        if rect.isNull():
+            return QtCore.QRect()
+        rect.translate(self.offsetToCenter())
+        rect = QtCore.QRectF(
+            rect.topLeft() * self.scale, rect.bottomRight() * self.scale
+        )
+        return rect.toAlignedRect().adjusted(-2, -2, 2, 2)
+
+    def _staticLayer(self, overlay):
+        # the image and the shapes not in the overlay but the hovered one,
+        # rendered again only when they, the zoom or the visible area change
+        rect = self.visibleRegion().boundingRect()
+        if rect.isEmpty():
+            rect = self.rect()
+        shapes = [
+            s
+            for s in self.shapes
+            if s not in overlay
+            or (s is self.hShape and not s.selected and not self.movingShape)
+        ]
+        key = (
+            self.pixmap.cacheKey(),
+            self.scale,
+            (rect.x(), rect.y(), rect.width(), rect.height()),
+            self.devicePixelRatioF(),
+            self._hideBackround,
+            tuple(
+                (
+                    id(s),
+                    s.version,
+                    s.label,
+                    s.shape_type,
+                    s.isClosed(),
+                    s.line_color.rgba(),
+                    self.isVisible(s),
+                )
+                for s in shapes
+            ),
+        )
+        if self._static is not None and self._static[0] == key:
+            return self._static[1], self._static[2]
+
+        ratio = self.devicePixelRatioF()
+        if (
+            self._static is not None
+            and self._static[2].size() == rect.size() * ratio
+        ):
+            layer = self._static[2]
         else:
-            for d in points:
-                label=d["label"]
-                point=d["points"]
-                if point==None:
-                    continue
-                x_val=[i[0] for i in point]
-                y_val=[i[1] for i in point]
-
-                x_min=min(x_val)
-                x_max=max(x_val)
-                y_min=min(y_val)
-                y_max=max(y_val)
-                x=int((x_min+x_max)/2)
-                y=int((y_min+y_max)/2)
-                shape.append({"label":label,"x":int(x-20),"y":y,"select":d.selected})
-        return shape
+            layer = QtGui.QPixmap(rect.size() * ratio)
+        layer.setDevicePixelRatio(ratio)
+        layer.fill(QtCore.Qt.transparent)
+        p = QtGui.QPainter(layer)
+        p.setRenderHint(QtGui.QPainter.Antialiasing)
+        p.setRenderHint(QtGui.QPainter.HighQualityAntialiasing)
+        p.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        p.translate(-rect.topLeft())
+        p.scale(self.scale, self.scale)
+        p.translate(self.offsetToCenter())
+
+        p.drawPixmap(0, 0, self.pixmap)
+        for shape in shapes:
+            if not self._hideBackround and self.isVisible(shape):
+                # the highlighted vertex is painted with the overlay
+                index = shape._highlightIndex
+                shape._highlightIndex = None
+                shape.fill = False
+                shape.paint(p)
+                shape._highlightIndex = index
+        self.paintLabels(p, shapes)
+        p.end()
+        self._static = (key, rect, layer)
+        return rect, layer
+
+    def paintLabels(self, p, shapes):
+        #LZX 画label
+        p.setFont(self._labelFont)
+        for shape in shapes:
+            anchor = shape.labelAnchor()
+            if anchor is None or shape.label is None:
+                continue
+            x, y = anchor
+            # rect = QtCore.QRect(x-20, y-10, len(label)*10,20)
+            # p.fillRect(rect,color)
+            if not shape.selected:
+                p.setPen(QColor(0, 255, 0))
+            else:
+                p.setPen(QColor(255, 255, 255))
+            p.drawStaticText(
+                x, y - self._labelAscent, self.labelText(shape.label)
+            )
 
     def paintEvent(self, event):
         if not self.pixmap:
             return super(Canvas, self).paintEvent(event)
 
+        Shape.scale = self.scale
+        overlay = self.overlayShapes()
+        rect, layer = self._staticLayer(set(overlay))
+
         p = self._painter
         p.begin(self)
+        p.drawPixmap(rect.topLeft(), layer)
+
         p.setRenderHint(QtGui.QPainter.Antialiasing)
         p.setRenderHint(QtGui.QPainter.HighQualityAntialiasing)
         p.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
@@ -677,17 +787,11 @@ class Canvas(QtWidgets.QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.offsetToCenter())
 
-        p.drawPixmap(0, 0, self.pixmap)
-
-        selectedshape=[]
-
-        Shape.scale = self.scale
-        for shape in self.shapes:
+        for shape in overlay:
             if (shape.selected or not self._hideBackround) and self.isVisible(
                 shape
             ):
-
-                shape.fill = shape.selected or shape == self.hShape
+                shape.fill = True
                 shape.paint(p)
 
         if self.current:
@@ -698,7 +802,6 @@ class Canvas(QtWidgets.QWidget):
             for s in self.selectedShapesCopy:
                 s.paint(p)
 
-
         if (
             self.fillDrawing()
             and self.createMode == "polygon"
@@ -710,23 +813,11 @@ class Canvas(QtWidgets.QWidget):
             drawing_shape.fill = True
             drawing_shape.paint(p)
 
-        #LZX 画label
-        p.setFont(QFont("simsun",15,QFont.Bold))
-        shapedda=self.count_points_center()
-        for d in shapedda:
-            label=d["label"]
-            x=d['x']
-            y=d['y']
-            selec=d['select']
-            # rect = QtCore.QRect(x-20, y-10, len(label)*10,20)
-            # p.fillRect(rect,color)
-            if not selec:
-                p.setPen(QColor(0, 255, 0))
-            else:
-                p.setPen(QColor(255, 255, 255))
-            p.drawText(x, y, label)
+        self.paintLabels(p, overlay)
 
         p.end()
+        # the overlay may also have changed without updateOverlay
+        self._overlayRect = self._overlayRect.united(self._overlayBounds())
 
     #转换坐标，可能会有用
     def transformPos(self, point):
@@ -749,8 +840,9 @@ class Canvas(QtWidgets.QWidget):
     def finalise(self):
         assert self.current
         self.current.close()
+        # stored by setLastLabel once the shape has a label, or dropped
+        # by undoLastLine
         self.shapes.append(self.current)
-        self.storeShapes()
         self.current = None
         self.setHiding(False)
         self.newShape.emit()
@@ -862,7 +954,7 @@ class Canvas(QtWidgets.QWidget):
             self.boundedMoveShapes(
                 self.selectedShapes, self.prevPoint + offset
             )
-            self.repaint()
+            self.updateOverlay()
             self.movingShape = True
 
     def keyPressEvent(self, ev):
@@ -894,21 +986,16 @@ class Canvas(QtWidgets.QWidget):
                 self.snapping = True
         elif self.editing():
             if self.movingShape and self.selectedShapes:
-                index = self.shapes.index(self.selectedShapes[0])
-                if (
-                    self.shapesBackups[-1][index].points
-                    != self.shapes[index].points
-                ):
-                    self.storeShapes()
+                if self.storeShapes():
                     self.shapeMoved.emit()
 
                 self.movingShape = False
 
-    def setLastLabel(self, text, flags):
+    def setLastLabel(self, text, flags, group_id=None):
         assert text
         self.shapes[-1].label = text
         self.shapes[-1].flags = flags
-        self.shapesBackups.pop()
+        self.shapes[-1].group_id = group_id
         self.storeShapes()
         return self.shapes[-1]
 
@@ -955,6 +1042,30 @@ class Canvas(QtWidgets.QWidget):
         self.hEdge = None
         self.update()
 
+    def mergeShapes(self, shapes):
+        """Add shapes, replacing in place the shapes with the same label.
+
+        Return the shapes replaced, None for the shapes appended. The
+        shapes are not stored, so a merge into both canvases can be undone
+        at once.
+        """
+        indices = {shape.label: i for i, shape in enumerate(self.shapes)}
+        replaced = []
+        for shape in shapes:
+            index = indices.get(shape.label)
+            if index is None:
+                indices[shape.label] = len(self.shapes)
+                self.shapes.append(shape)
+                replaced.append(None)
+            else:
+                replaced.append(self.shapes[index])
+                self.shapes[index] = shape
+        self.hShape = None
+        self.hVertex = None
+        self.hEdge = None
+        self.update()
+        return replaced
+
     def setShapeVisible(self, shape, value):
         self.visible[shape] = value
         self.update()
@@ -970,5 +1081,5 @@ class Canvas(QtWidgets.QWidget):
     def resetState(self):
         self.restoreCursor()
         self.pixmap = None
-        self.shapesBackups = []
+        self.history.reset()
         self.update()
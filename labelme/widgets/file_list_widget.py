@@ -0,0 +1,224 @@
+import fnmatch
+import re
+
+from qtpy import QtCore
+from qtpy.QtCore import Qt
+from qtpy import QtWidgets
+
+
+def file_filter(query, mode="substring"):
+    """Return a predicate on lower case file names, or None to show all.
+
+    Raises re.error if mode is regex and query does not compile.
+    """
+    if not query:
+        return None
+    if mode == "substring":
+        query = query.lower()
+        return lambda name: query in name
+    if mode == "glob":
+        return re.compile(fnmatch.translate(query.lower())).match
+    if mode == "regex":
+        return re.compile(query, re.IGNORECASE).search
+    raise ValueError("Unsupported filter mode: {}".format(mode))
+
+
+class FileListModel(QtCore.QAbstractListModel):
+
+    """Flat list of file names with a labelled flag per row.
+
+    All appended files are kept and setFilter selects the visible ones.
+    Files and visible rows are looked up by name through dicts, so nothing
+    here scales with the number of files except appending and filtering
+    them.
+    """
+
+    def __init__(self, parent=None):
+        super(FileListModel, self).__init__(parent)
+        self._filter = None
+        self._filterKey = (None, None)
+        self._clear()
+
+    def _clear(self):
+        # the filter is kept and applies to the files appended later
+        self._names = []
+        self._lower = []
+        self._checked = bytearray()
+        # indices of the visible files in self._names, None if all are
+        self._visible = None if self._filter is None else []
+        self.names = self._names if self._filter is None else []
+        # name -> index in self._names, and row of the visible ones
+        self._files = {}
+        self._rows = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.names)
+
+    def _file(self, row):
+        if self._visible is None:
+            return row
+        return self._visible[row]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.names[index.row()]
+        if role == Qt.CheckStateRole:
+            if self._checked[self._file(index.row())]:
+                return Qt.Checked
+            return Qt.Unchecked
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def append(self, names, checked):
+        start = len(self._names)
+        lower = [name.lower() for name in names]
+        if self._filter is None:
+            new = range(start, start + len(names))
+        else:
+            new = [
+                start + i for i, name in enumerate(lower) if self._filter(name)
+            ]
+
+        row = len(self.names)
+        if new:
+            self.beginInsertRows(QtCore.QModelIndex(), row, row + len(new) - 1)
+        # self.names is self._names when nothing is filtered
+        self._names.extend(names)
+        self._lower.extend(lower)
+        self._checked.extend(bool(c) for c in checked)
+        for i, name in enumerate(names, start):
+            self._files.setdefault(name, i)
+        if new:
+            if self._visible is not None:
+                self._visible.extend(new)
+                self.names.extend(self._names[i] for i in new)
+            for row, i in enumerate(new, row):
+                self._rows.setdefault(self._names[i], row)
+            self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._clear()
+        self.endResetModel()
+
+    def setFilter(self, query, mode="substring"):
+        """Show only the files matching query, see :func:`file_filter`."""
+        if (query, mode) == self._filterKey:
+            return
+        predicate = file_filter(query, mode)
+
+        prevQuery, prevMode = self._filterKey
+        if predicate is None:
+            visible = None
+        elif (
+            self._visible is not None
+            and mode == prevMode == "substring"
+            and prevQuery.lower() in query.lower()
+        ):
+            # a longer query only narrows the current result
+            visible = [i for i in self._visible if predicate(self._lower[i])]
+        else:
+            visible = [
+                i for i, name in enumerate(self._lower) if predicate(name)
+            ]
+
+        self.beginResetModel()
+        self._filter = predicate
+        self._filterKey = (query, mode)
+        self._visible = visible
+        if visible is None:
+            self.names = self._names
+        else:
+            self.names = [self._names[i] for i in visible]
+        self._rows = {}
+        for row, name in enumerate(self.names):
+            self._rows.setdefault(name, row)
+        self.endResetModel()
+
+    def row(self, name):
+        return self._rows.get(name, -1)
+
+    def isChecked(self, name):
+        i = self._files.get(name)
+        return i is not None and bool(self._checked[i])
+
+    def setChecked(self, name, checked):
+        """Set the labelled flag of a file, shown or hidden by the filter."""
+        i = self._files.get(name)
+        if i is None or self._checked[i] == bool(checked):
+            return
+        self._checked[i] = bool(checked)
+        row = self.row(name)
+        if row != -1:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+
+class FileListWidget(QtWidgets.QListView):
+
+    """View of a :class:`FileListModel` with a QListWidget like interface."""
+
+    itemSelectionChanged = QtCore.Signal()
+
+    def __init__(self):
+        super(FileListWidget, self).__init__()
+        self.setModel(FileListModel(self))
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.selectionModel().selectionChanged.connect(
+            self.itemSelectionChanged
+        )
+
+    def __len__(self):
+        return self.model().rowCount()
+
+    def count(self):
+        return self.model().rowCount()
+
+    def names(self):
+        """Return the visible names, the list is owned by the model."""
+        return self.model().names
+
+    def row(self, name):
+        """Return the row of name, or -1 if it is not listed."""
+        return self.model().row(name)
+
+    def addFiles(self, names, checked):
+        self.model().append(names, checked)
+
+    def setChecked(self, name, checked):
+        self.model().setChecked(name, checked)
+
+    def isChecked(self, name):
+        return self.model().isChecked(name)
+
+    def setFilter(self, query, mode="substring"):
+        """Filter the list, keeping the current file selected if shown.
+
+        Selecting it again does not emit itemSelectionChanged.
+        """
+        current = self.currentIndex().data()
+        self.model().setFilter(query, mode)
+        row = self.row(current)
+        if row != -1:
+            self.selectionModel().blockSignals(True)
+            self.setCurrentRow(row)
+            self.selectionModel().blockSignals(False)
+
+    def currentRow(self):
+        return self.currentIndex().row()
+
+    def setCurrentRow(self, row):
+        self.setCurrentIndex(self.model().index(row))
+
+    def selectedRows(self):
+        return sorted(index.row() for index in self.selectedIndexes())
+
+    def clear(self):
+        self.model().clear()
@@ -62,8 +62,8 @@ class HTMLDelegate(QtWidgets.QStyledItemDelegate):
     def sizeHint(self, option, index):
         thefuckyourshitup_constant = 4
         return QtCore.QSize(
-            self.doc.idealWidth(),
-            self.doc.size().height() - thefuckyourshitup_constant,
+            int(self.doc.idealWidth()),
+            int(self.doc.size().height() - thefuckyourshitup_constant),
         )
 
 
@@ -96,13 +96,62 @@ class LabelListWidgetItem(QtGui.QStandardItem):
 
 class StandardItemModel(QtGui.QStandardItemModel):
 
+    """Item model that maps the shapes of its rows to their items.
+
+    The map follows the model signals, so it stays right when rows are
+    added, removed, cleared or moved by drag and drop, which inserts a
+    copy of the rows and sets their data before removing the old ones.
+    """
+
     itemDropped = QtCore.Signal()
 
+    def __init__(self):
+        super(StandardItemModel, self).__init__()
+        self.shapeItems = {}
+        self._itemShapes = {}
+        self.rowsInserted.connect(self._rowsInserted)
+        self.dataChanged.connect(self._dataChanged)
+        self.rowsAboutToBeRemoved.connect(self._rowsAboutToBeRemoved)
+        self.modelReset.connect(self._modelReset)
+
     def removeRows(self, *args, **kwargs):
         ret = super().removeRows(*args, **kwargs)
         self.itemDropped.emit()
         return ret
 
+    def _rowsInserted(self, parent, first, last):
+        for row in range(first, last + 1):
+            self._index(self.item(row))
+
+    def _dataChanged(self, topLeft, bottomRight, roles=()):
+        if roles and Qt.UserRole not in roles:
+            return
+        for row in range(topLeft.row(), bottomRight.row() + 1):
+            self._index(self.item(row))
+
+    def _rowsAboutToBeRemoved(self, parent, first, last):
+        for row in range(first, last + 1):
+            self._unindex(self.item(row))
+
+    def _modelReset(self):
+        self.shapeItems.clear()
+        self._itemShapes.clear()
+
+    def _index(self, item):
+        if item is None:
+            return
+        shape = item.shape()
+        if self._itemShapes.get(item) is not shape:
+            self._unindex(item)
+        if shape is not None:
+            self.shapeItems[shape] = item
+            self._itemShapes[item] = shape
+
+    def _unindex(self, item):
+        shape = self._itemShapes.pop(item, None)
+        if shape is not None and self.shapeItems.get(shape) is item:
+            del self.shapeItems[shape]
+
 
 class LabelListWidget(QtWidgets.QListView):
 
@@ -170,11 +219,19 @@ class LabelListWidget(QtWidgets.QListView):
         index = self.model().indexFromItem(item)
         self.model().removeRows(index.row(), 1)
 
+    def moveItem(self, item, row):
+        model = self.model()
+        model.insertRow(row, model.takeRow(model.indexFromItem(item).row()))
+
     def selectItem(self, item):
         index = self.model().indexFromItem(item)
         self.selectionModel().select(index, QtCore.QItemSelectionModel.Select)
 
     def findItemByShape(self, shape):
+        item = self.model().shapeItems.get(shape)
+        if item is not None:
+            return item
+        # a shape in several rows is mapped to one of them only
         for row in range(self.model().rowCount()):
             item = self.model().item(row, 0)
             if item.shape() == shape:
@@ -148,6 +148,10 @@ def main():
                 "labelme_draw_json=labelme.cli.draw_json:main",
                 "labelme_draw_label_png=labelme.cli.draw_label_png:main",
                 "labelme_json_to_dataset=labelme.cli.json_to_dataset:main",
+                "labelme_compile_keypoints=labelme.cli.compile_keypoints:main",
+                "labelme_export_coco_keypoints=labelme.cli.export_coco_keypoints:main",  # NOQA
+                "labelme_lift_joints=labelme.cli.lift_joints:main",
+                "labelme_validate=labelme.cli.validate:main",
                 "labelme_on_docker=labelme.cli.on_docker:main",
             ],
         },
@@ -0,0 +1,53 @@
+import json
+import os.path as osp
+import time
+
+from labelme.autosave import AutosaveWriter
+
+
+def _read(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def test_AutosaveWriter(tmpdir):
+    filename = osp.join(str(tmpdir), "patient000_label.json")
+    writer = AutosaveWriter(delay=0.2)
+
+    writer.submit(filename, {"version": 1})
+    writer.submit(filename, {"version": 2})
+    assert filename in writer
+    assert not osp.exists(filename)
+
+    deadline = time.time() + 5
+    while filename in writer and time.time() < deadline:
+        time.sleep(0.05)
+    writer.flush()
+    assert _read(filename) == {"version": 2}
+
+    # a synchronous write drops the queued data
+    writer.submit(filename, {"version": 3})
+    writer.write(filename, {"version": 4})
+    writer.flush()
+    assert _read(filename) == {"version": 4}
+
+    writer.submit(filename, {"version": 5})
+    writer.shutdown()
+    assert _read(filename) == {"version": 5}
+
+
+def test_AutosaveWriter_errback(tmpdir):
+    # the directory of the file does not exist, so the write fails
+    filename = osp.join(str(tmpdir), "missing", "patient000_label.json")
+    writer = AutosaveWriter(delay=0)
+    errors = []
+    writer.submit(
+        filename,
+        {"version": 1},
+        callback=lambda: errors.append(None),
+        errback=errors.append,
+    )
+    writer.shutdown()
+    assert len(errors) == 1
+    assert isinstance(errors[0], OSError)
+    assert not osp.exists(filename)
@@ -0,0 +1,57 @@
+import os.path as osp
+
+import cv2
+import numpy as np
+
+from labelme.calibration import get_calibration
+
+
+def _write_calibration(dirpath):
+    angle = np.deg2rad(3)
+    storage = cv2.FileStorage(
+        osp.join(dirpath, "calibration.yml"), cv2.FILE_STORAGE_WRITE
+    )
+    storage.write(
+        "color_camera_matrix",
+        np.array([[900.0, 0, 640], [0, 900, 360], [0, 0, 1]]),
+    )
+    storage.write(
+        "color_distortion_coefficients",
+        np.array([[0.05, -0.02, 0.001, 0.0005, 0.0]]),
+    )
+    storage.write(
+        "depth_camera_matrix",
+        np.array([[500.0, 0, 320], [0, 500, 288], [0, 0, 1]]),
+    )
+    storage.write(
+        "R",
+        np.array(
+            [
+                [np.cos(angle), 0, np.sin(angle)],
+                [0, 1, 0],
+                [-np.sin(angle), 0, np.cos(angle)],
+            ]
+        ),
+    )
+    storage.write("T", np.array([[-32.0], [-2.0], [4.0]]))
+    storage.release()
+
+
+def test_Calibration(tmpdir):
+    assert get_calibration(str(tmpdir)) is None
+    _write_calibration(str(tmpdir))
+    calibration = get_calibration(str(tmpdir))
+    assert get_calibration(str(tmpdir)) is calibration
+
+    # a floor at 1.5m with a box at 1m
+    depth = np.full((576, 640), 1500, dtype=np.uint16)
+    depth[200:400, 250:400] = 1000
+    depth[:10] = 0
+    points = np.array([[300.0, 300.0], [100.5, 100.25], [500, 450], [5, 5]])
+
+    color = calibration.depth_to_color(points, depth)
+    assert np.isnan(color[3]).all()
+    assert (np.abs(color[:3] - points[:3]) > 10).any()
+
+    back = calibration.color_to_depth(color[:3], depth, (1280, 720))
+    np.testing.assert_allclose(back, points[:3], atol=0.5)
@@ -0,0 +1,86 @@
+import os
+import os.path as osp
+
+from labelme.dataset_index import DatasetIndex
+from labelme.dataset_index import DatasetScanThread
+
+
+def _touch(*paths):
+    filename = osp.join(*paths)
+    if not osp.exists(osp.dirname(filename)):
+        os.makedirs(osp.dirname(filename))
+    open(filename, "w").close()
+    return filename
+
+
+def test_DatasetIndex_scan(tmpdir):
+    root = str(tmpdir.mkdir("data"))
+    _touch(root, "patient010_color.jpg")
+    _touch(root, "patient002_color.jpg")
+    _touch(root, "sub", "patient001_depth.png")
+    os.utime(root, ns=(0, 0))
+
+    index = DatasetIndex(osp.join(str(tmpdir), "index.sqlite3"))
+    assert index.scan(root, [".jpg"]) == [
+        osp.join(root, "patient002_color.jpg"),
+        osp.join(root, "patient010_color.jpg"),
+    ]
+    assert len(index.scan(root)) == 3
+
+    # unchanged directories are not listed again
+    _touch(root, "patient003_color.jpg")
+    os.utime(root, ns=(0, 0))
+    index = DatasetIndex(osp.join(str(tmpdir), "index.sqlite3"))
+    assert len(index.scan(root)) == 3
+
+    os.utime(root, ns=(10**9, 10**9))
+    assert len(index.scan(root)) == 4
+
+
+def test_DatasetIndex_scan_symlink(tmpdir):
+    root = str(tmpdir.mkdir("data"))
+    _touch(root, "patient000_color.jpg")
+    other = _touch(str(tmpdir), "other", "patient001_color.jpg")
+    # links to directories are not followed, a link to the root would
+    # not end otherwise
+    os.symlink(osp.dirname(other), osp.join(root, "other"))
+    os.symlink(root, osp.join(root, "loop"))
+    os.symlink(other, osp.join(root, "patient001_color.jpg"))
+
+    assert DatasetIndex().scan(root, [".jpg"]) == [
+        osp.join(root, "patient000_color.jpg"),
+        osp.join(root, "patient001_color.jpg"),
+    ]
+
+
+def test_DatasetIndex_frames(tmpdir):
+    root = str(tmpdir)
+    color = _touch(root, "patient000_color.jpg")
+    depth = _touch(root, "patient000_depth.png")
+    _touch(root, "patient001_color.jpg")
+    label = _touch(root, "patient001_label.json")
+    calibration = _touch(root, "calibration.yml")
+
+    frames = DatasetIndex().frames(root, [".jpg"])
+    assert [f.color for f in frames] == [
+        color,
+        osp.join(root, "patient001_color.jpg"),
+    ]
+    assert frames[0].depth == depth and frames[0].label is None
+    assert frames[1].depth is None and frames[1].label == label
+    assert frames[0].calibration == calibration
+
+
+def test_DatasetScanThread(qtbot, tmpdir):
+    root = str(tmpdir)
+    for i in range(5):
+        _touch(root, "patient{:03d}_color.jpg".format(i))
+
+    chunks = []
+    thread = DatasetScanThread(DatasetIndex(), root, [".jpg"], chunk_size=2)
+    thread.framesFound.connect(chunks.append)
+    with qtbot.waitSignal(thread.finished):
+        thread.start()
+    qtbot.waitUntil(lambda: sum(len(c) for c in chunks) == 5)
+    assert len(chunks[0]) == 1
+    assert chunks[-1][-1].color == osp.join(root, "patient004_color.jpg")
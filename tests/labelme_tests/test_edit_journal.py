@@ -0,0 +1,80 @@
+import os.path as osp
+import time
+
+from labelme.edit_journal import apply_edits
+from labelme.edit_journal import EditJournal
+from labelme.label_file import LabelFile
+
+
+def _shape(label, x, y):
+    return dict(
+        label=label,
+        points=[[x, y]],
+        group_id=None,
+        shape_type="point",
+        flags={},
+    )
+
+
+def test_EditJournal(tmpdir):
+    label_file = osp.join(str(tmpdir), "patient000_label.json")
+    journal = EditJournal(label_file)
+    journal.reset([_shape("NECK", 1, 2), _shape("HEAD", 3, 4)], [])
+
+    journal.record([_shape("NECK", 1, 2), _shape("HEAD", 3, 4)], [])
+    assert not osp.exists(journal.filename)
+
+    journal.record([_shape("NECK", 5, 6)], [_shape("HEAD", 7, 8)])
+    # the process dies before the label file is saved
+    edits = EditJournal(label_file).recover()
+    assert edits == {
+        "rgb": {"NECK": _shape("NECK", 5, 6), "HEAD": None},
+        "depth": {"HEAD": _shape("HEAD", 7, 8)},
+    }
+
+    shapes = [
+        LabelFile.load_shape(_shape("HEAD", 3, 4)),
+        LabelFile.load_shape(_shape("NECK", 1, 2)),
+        LabelFile.load_shape(_shape("SPINE_NAVAL", 0, 0)),
+    ]
+    applied = apply_edits(shapes, edits["rgb"])
+    assert [s["label"] for s in applied] == ["NECK", "SPINE_NAVAL"]
+    assert applied[0]["points"] == [[5, 6]]
+
+    # edits after the saved state are compacted into a snapshot
+    seq = journal.seq
+    journal.record([_shape("NECK", 9, 9)], [_shape("HEAD", 7, 8)])
+    journal.mark_saved(seq)
+    assert EditJournal(label_file).recover()["rgb"]["NECK"] == _shape(
+        "NECK", 9, 9
+    )
+    journal.mark_saved(journal.seq)
+    assert not osp.exists(journal.filename)
+
+    journal.record([_shape("NECK", 0, 0)], [])
+    journal.discard()
+    assert EditJournal(label_file).recover() is None
+
+
+def test_EditJournal_compact(tmpdir):
+    label_file = osp.join(str(tmpdir), "patient000_label.json")
+    journal = EditJournal(label_file)
+    journal.compact_size = 10
+    for i in range(25):
+        journal.record([_shape("NECK", i, i)], [])
+
+    def count():
+        with open(journal.filename) as f:
+            return len(f.readlines())
+
+    # compaction runs in the background
+    deadline = time.time() + 5
+    while count() >= 25 and time.time() < deadline:
+        time.sleep(0.05)
+    assert count() < 25
+    journal.close()
+    # a record cut off by the crash is ignored
+    with open(journal.filename, "a") as f:
+        f.write('{"view": "rgb", "lab')
+    edits = EditJournal(label_file).recover()
+    assert edits["rgb"]["NECK"]["points"] == [[24, 24]]
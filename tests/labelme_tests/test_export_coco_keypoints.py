@@ -0,0 +1,56 @@
+import json
+import os.path as osp
+import sys
+
+import numpy as np
+import PIL.Image
+
+from labelme.cli import export_coco_keypoints
+from labelme.keypoint_store import JOINTS
+
+
+def test_export_coco_keypoints(tmpdir, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmpdir))
+    root = osp.join(str(tmpdir), "data")
+    out_dir = osp.join(str(tmpdir), "coco")
+    prefix = osp.join(root, "patient000_1_")
+    tmpdir.mkdir("data")
+    PIL.Image.fromarray(np.zeros((4, 6, 3), np.uint8)).save(
+        prefix + "color.jpg"
+    )
+    PIL.Image.fromarray(np.zeros((3, 5), np.uint16)).save(prefix + "depth.png")
+    shapes = [
+        dict(label=label, points=None, shape_type="point", flags={})
+        for label in JOINTS
+    ]
+    shapes[0]["points"] = [[1, 2]]
+    shapes[1]["points"] = [[3, 5]]
+    shapes[1]["flags"] = {"occlusion": True}
+    with open(prefix + "label.json", "w") as f:
+        json.dump(dict(shapes_rgb=shapes, shapes_depth=shapes[:1]), f)
+
+    monkeypatch.setattr(sys, "argv", ["x", root, out_dir, "--workers", "1"])
+    export_coco_keypoints.main()
+
+    with open(osp.join(out_dir, "keypoints_rgb.json")) as f:
+        data = json.load(f)
+    assert data["categories"][0]["keypoints"] == JOINTS
+    assert data["images"] == [
+        dict(
+            file_name="patient000_1_color.jpg",
+            height=4,
+            width=6,
+            id=1,
+            license=0,
+        )
+    ]
+    annotation = data["annotations"][0]
+    assert annotation["image_id"] == 1
+    assert annotation["keypoints"][:6] == [1, 2, 2, 3, 5, 1]
+    assert annotation["num_keypoints"] == 2
+    assert annotation["bbox"] == [1, 2, 2, 3]
+
+    with open(osp.join(out_dir, "keypoints_depth.json")) as f:
+        data = json.load(f)
+    assert data["images"][0]["height"] == 3
+    assert data["annotations"][0]["num_keypoints"] == 1
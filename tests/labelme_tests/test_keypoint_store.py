@@ -0,0 +1,67 @@
+import json
+import os
+import os.path as osp
+
+import numpy as np
+
+from labelme.keypoint_store import JOINTS
+from labelme.keypoint_store import KeypointStore
+
+
+def _write(filename, neck, height="188.0"):
+    shapes = [
+        dict(label=label, points=None, shape_type="point", flags={})
+        for label in JOINTS
+    ]
+    shapes[JOINTS.index("NECK")]["points"] = [neck]
+    with open(filename, "w") as f:
+        json.dump(
+            dict(
+                shapes_rgb=shapes,
+                shapes_depth=shapes[:1],
+                patientHeight=height,
+                patientPose="HFS_Superman",
+            ),
+            f,
+        )
+
+
+def test_KeypointStore(tmpdir):
+    root = osp.join(str(tmpdir), "data")
+    os.makedirs(osp.join(root, "patient001"))
+    _write(osp.join(root, "patient000_1_label.json"), [1, 2])
+    _write(osp.join(root, "patient001", "patient001_1_label.json"), [3, 4])
+    with open(osp.join(root, "patient000_1_label.json.journal"), "w"):
+        pass
+    path = osp.join(str(tmpdir), "data.keypoints")
+
+    store = KeypointStore.build(root, path, num_workers=1)
+    assert store.files == [
+        "patient000_1_label.json",
+        osp.join("patient001", "patient001_1_label.json"),
+    ]
+    assert isinstance(store.points["rgb"], np.memmap)
+    assert store.points["rgb"].shape == (2, 26, 2)
+    np.testing.assert_array_equal(store.points["rgb"][1, 1], [3, 4])
+    assert store.visible["rgb"].sum() == 2
+    assert not store.visible["depth"].any()
+    np.testing.assert_array_equal(store.patientHeight, [188, 188])
+    assert store.patientPose == ["HFS_Superman"] * 2
+
+    # only the changed file is parsed again
+    filename = osp.join(root, "patient001", "patient001_1_label.json")
+    _write(filename, [5, 6], height=None)
+    os.utime(filename, ns=(0, 10**9))
+    os.utime(osp.join(root, "patient000_1_label.json"), ns=(0, 10**9))
+    store = KeypointStore.build(root, path, num_workers=1)
+    np.testing.assert_array_equal(store.points["rgb"][1, 1], [5, 6])
+    assert np.isnan(store.patientHeight[1])
+
+    # a file keeping its mtime is not read
+    _write(filename, [7, 8])
+    os.utime(filename, ns=(0, 10**9))
+    with open(osp.join(root, "patient000_1_label.json"), "w") as f:
+        f.write("{")
+    store = KeypointStore.build(root, path, num_workers=1)
+    assert not store.visible["rgb"][0].any()
+    np.testing.assert_array_equal(store.points["rgb"][1, 1], [5, 6])
@@ -0,0 +1,48 @@
+import json
+import os.path as osp
+
+from labelme.label_file import LabelFile
+
+
+def _shape(label, points=None):
+    return dict(
+        label=label,
+        points=points,
+        group_id=None,
+        shape_type="point",
+        flags={},
+    )
+
+
+def test_LabelFile_merge_shapes(tmpdir):
+    filename = osp.join(str(tmpdir), "patient000_label.json")
+    with open(filename, "w") as f:
+        json.dump(
+            dict(
+                shapes_rgb=[_shape("NECK"), _shape("HEADTOP")],
+                shapes_depth=[_shape("NECK")],
+                imagePath="patient000_",
+            ),
+            f,
+        )
+    label_file = LabelFile(filename)
+
+    shapes_rgb, shapes_depth = label_file.merge_shapes(
+        [_shape("HEADTOP", [[1, 2]]), _shape("UNKNOWN", [[3, 4]])], []
+    )
+    assert shapes_rgb == [_shape("NECK"), _shape("HEADTOP", [[1, 2]])]
+    assert shapes_depth == [_shape("NECK")]
+    # merging does not touch the saved shapes until they are written
+    assert label_file.savedShapesRGB[1]["points"] is None
+
+    label_file.save(
+        filename,
+        shapes_rgb,
+        shapes_depth,
+        imagePath="patient000_",
+        imageHeight=None,
+        imageWidth=None,
+    )
+    assert label_file.savedShapesRGB[1]["points"] == [[1, 2]]
+    with open(filename) as f:
+        assert json.load(f)["shapes_rgb"] == shapes_rgb
@@ -0,0 +1,54 @@
+import json
+import os.path as osp
+import sys
+
+import cv2
+import numpy as np
+
+from labelme.cli import lift_joints
+from labelme.keypoint_store import JOINTS
+
+
+def test_lift_joints(tmpdir, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmpdir))
+    root = tmpdir.mkdir("data")
+    storage = cv2.FileStorage(
+        osp.join(str(root), "calibration.yml"), cv2.FILE_STORAGE_WRITE
+    )
+    for name in ["color_camera_matrix", "depth_camera_matrix"]:
+        storage.write(
+            name, np.array([[500.0, 0, 320], [0, 500, 288], [0, 0, 1]])
+        )
+    storage.write("R", np.eye(3))
+    storage.write("T", np.zeros((3, 1)))
+    storage.release()
+
+    for i, depth_value in enumerate([1000, 0]):
+        prefix = osp.join(str(root), "patient000_{}_".format(i))
+        cv2.imwrite(prefix + "color.jpg", np.zeros((576, 640, 3), np.uint8))
+        depth = np.full((576, 640), depth_value, np.uint16)
+        if depth_value:
+            depth[100, 420] = 5000  # noise the median ignores
+        cv2.imwrite(prefix + "depth.png", depth)
+        shapes = [
+            dict(label=label, points=None, shape_type="point", flags={})
+            for label in JOINTS
+        ]
+        shapes[1]["points"] = [[420, 100]]
+        with open(prefix + "label.json", "w") as f:
+            json.dump(dict(shapes_rgb=shapes, shapes_depth=shapes), f)
+
+    out = osp.join(str(tmpdir), "joints.npz")
+    monkeypatch.setattr(sys, "argv", ["x", str(root), out, "--workers", "1"])
+    lift_joints.main()
+
+    data = np.load(out)
+    assert data["joints"].shape == (2, 26, 3)
+    assert list(data["files"]) == [
+        "patient000_0_label.json",
+        "patient000_1_label.json",
+    ]
+    assert data["valid"].sum() == 1
+    assert data["valid"][0, 1]
+    np.testing.assert_allclose(data["joints"][0, 1], [200, -376, 1000])
+    assert np.isnan(data["joints"][1]).all()
@@ -0,0 +1,51 @@
+import os.path as osp
+
+import cv2
+import numpy as np
+
+from labelme.prefetch import FramePrefetcher
+from labelme.prefetch import neighbour_rows
+
+
+def _write_frame(tmpdir, name):
+    color = osp.join(str(tmpdir), name + "_color.jpg")
+    depth = osp.join(str(tmpdir), name + "_depth.png")
+    cv2.imwrite(color, np.zeros((24, 32, 3), dtype=np.uint8))
+    cv2.imwrite(depth, np.arange(24 * 32, dtype=np.uint16).reshape(24, 32))
+    return color, depth, osp.join(str(tmpdir), name + "_label.json")
+
+
+def test_FramePrefetcher_get(qtbot, tmpdir):
+    key = _write_frame(tmpdir, "patient000")
+    prefetcher = FramePrefetcher(cache_size=2, lookahead=1)
+
+    frame = prefetcher.get(key)
+    assert frame.image.width() == 32
+    assert frame.imageDepth.height() == 24
+    assert frame.labelFile is None
+    assert key in prefetcher
+
+    prefetcher.invalidate(key[2])
+    assert key not in prefetcher
+    prefetcher.shutdown()
+
+
+def test_FramePrefetcher_prefetch(qtbot, tmpdir):
+    keys = [_write_frame(tmpdir, "patient{:03d}".format(i)) for i in range(5)]
+    prefetcher = FramePrefetcher(cache_size=3, lookahead=1)
+
+    prefetcher.get(keys[2])
+    prefetcher.prefetch([keys[3], keys[1]])
+    assert keys[3] in prefetcher and keys[1] in prefetcher
+    assert prefetcher.get(keys[3]).imageDepth is not None
+
+    prefetcher.prefetch([keys[4], keys[2]])
+    assert len(prefetcher) == 3
+    assert keys[1] not in prefetcher
+    prefetcher.shutdown()
+
+
+def test_neighbour_rows():
+    assert neighbour_rows(0, 5, 2) == [1, 2]
+    assert neighbour_rows(2, 5, 2) == [3, 1, 4, 0]
+    assert neighbour_rows(4, 5, 1) == [3]
@@ -0,0 +1,60 @@
+import os
+import os.path as osp
+
+import cv2
+import numpy as np
+
+from labelme.preview_cache import DepthPreviewCache
+from labelme.prefetch import Frame
+
+
+def _write_depth(tmpdir, name, value=0):
+    filename = osp.join(str(tmpdir), name + "_depth.png")
+    depth = np.arange(24 * 32, dtype=np.uint16).reshape(24, 32) + value
+    cv2.imwrite(filename, depth)
+    return filename
+
+
+def test_DepthPreviewCache(tmpdir):
+    filename = _write_depth(tmpdir, "patient000")
+    cache = DepthPreviewCache()
+    assert cache.get(filename) is None
+
+    frame = Frame.load(filenameDepth=filename, preview_cache=cache)
+    # a miss keeps the depth image it decoded
+    assert frame._depth is not None
+    cache_dir = osp.join(str(tmpdir), ".labelme_cache")
+    assert len(os.listdir(cache_dir)) == 1
+
+    gray, thresh = cache.get(filename)
+    assert gray.shape == (24, 32)
+    assert thresh == frame.depthThresh
+
+    cached = Frame.load(filenameDepth=filename, preview_cache=cache)
+    np.testing.assert_array_equal(cached.depthPreview, frame.depthPreview)
+    assert cached._depth is None
+    assert cached.depth.shape == (24, 32)
+
+    # a modified image misses the cache
+    _write_depth(tmpdir, "patient000", value=1)
+    os.utime(filename, ns=(0, 0))
+    assert cache.get(filename) is None
+
+
+def test_DepthPreviewCache_evict(tmpdir):
+    cache_dir = osp.join(str(tmpdir), "cache")
+    filenames = [
+        _write_depth(tmpdir, "patient{:03d}".format(i)) for i in range(3)
+    ]
+    cache = DepthPreviewCache(cache_dir=cache_dir)
+    cache.put(filenames[0], np.zeros((24, 32), np.uint8), 1)
+    entry_size = osp.getsize(osp.join(cache_dir, os.listdir(cache_dir)[0]))
+    cache.max_size = 2 * entry_size
+
+    cache.put(filenames[1], np.zeros((24, 32), np.uint8), 1)
+    os.utime(cache._path(filenames[1]), ns=(0, 0))
+    cache.put(filenames[2], np.zeros((24, 32), np.uint8), 1)
+    # filenames[1] was the least recently used
+    assert len(os.listdir(cache_dir)) == 2
+    assert cache.get(filenames[1]) is None
+    assert cache.get(filenames[0]) is not None
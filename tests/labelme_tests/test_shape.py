@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from qtpy import QtCore
+
+from labelme.shape import Shape
+
+
+def test_labelAnchor():
+    shape = Shape(label="NECK", shape_type="polygon")
+    assert shape.labelAnchor() is None
+    shape.addPoint(QtCore.QPointF(10, 20))
+    shape.addPoint(QtCore.QPointF(50, 40))
+    assert shape.labelAnchor() == (10, 30)
+
+    shape.moveVertexBy(1, QtCore.QPointF(10, 0))
+    assert shape.labelAnchor() == (15, 30)
+    shape.moveBy(QtCore.QPointF(0, 10))
+    assert shape.labelAnchor() == (15, 40)
+    shape[0] = QtCore.QPointF(0, 0)
+    assert shape.labelAnchor() == (10, 25)
+    shape.popPoint()
+    assert shape.labelAnchor() == (-20, 0)
+    assert shape.copy().labelAnchor() == (-20, 0)
+
+
+def test_nearest():
+    rng = np.random.RandomState(0)
+    for num_points in [1, 2, 5, 40]:
+        shape = Shape(shape_type="polygon")
+        shape.points = rng.uniform(0, 100, (num_points, 2))
+        if num_points > 2:
+            shape[2] = shape[1]  # an edge of zero length
+        vectorized = shape.copy()
+        vectorized.vectorize_min_points = 0
+        for x, y in rng.uniform(-10, 110, (50, 2)):
+            point = QtCore.QPointF(x, y)
+            for epsilon in [5, 30]:
+                assert shape.nearestVertex(
+                    point, epsilon
+                ) == vectorized.nearestVertex(point, epsilon)
+                assert shape.nearestEdge(
+                    point, epsilon
+                ) == vectorized.nearestEdge(point, epsilon)
+
+
+def test_copy():
+    shape = Shape(label="NECK", shape_type="point", flags={"occlusion": False})
+    shape.addPoint(QtCore.QPointF(1, 2))
+    copied = shape.copy()
+    copied.moveBy(QtCore.QPointF(1, 1))
+    copied.flags["occlusion"] = True
+    assert shape.points == [QtCore.QPointF(1, 2)]
+    assert copied.points == [QtCore.QPointF(2, 3)]
+    assert shape.flags == {"occlusion": False}
+    with pytest.raises(ValueError):
+        shape.xy[0, 0] = 0
+
+
+def test_paths():
+    shape = Shape(shape_type="polygon")
+    for x, y in [(0, 0), (10, 0), (10, 10)]:
+        shape.addPoint(QtCore.QPointF(x, y))
+    assert shape.containsPoint(QtCore.QPointF(8, 2))
+    shape.moveBy(QtCore.QPointF(100, 0))
+    assert not shape.containsPoint(QtCore.QPointF(8, 2))
+    assert shape.boundingRect() == QtCore.QRectF(100, 0, 10, 10)
+
+    line_path = shape._linePath()
+    assert shape._linePath() is line_path
+    shape.close()
+    assert shape._linePath().elementCount() == line_path.elementCount() + 1
+
+    vertex_path = shape._vertexPath()
+    assert shape._vertexPath() is vertex_path
+    shape.highlightVertex(0, Shape.MOVE_VERTEX)
+    assert shape._vertexPath() is not vertex_path
@@ -0,0 +1,79 @@
+import numpy as np
+
+from labelme.shape import Shape
+from labelme.shape_history import ShapeHistory
+
+
+class _Canvas(object):
+    def __init__(self, shapes):
+        self.shapes = shapes
+
+
+def _shape(label, x, y):
+    shape = Shape(label=label, shape_type="point", flags={})
+    shape.points = np.array([[x, y]], dtype=float)
+    return shape
+
+
+def test_ShapeHistory():
+    neck, head = _shape("NECK", 1, 2), _shape("HEAD", 3, 4)
+    left = _Canvas([neck, head])
+    right = _Canvas([])
+    history = ShapeHistory()
+    history.addCanvas(left)
+    history.addCanvas(right)
+    assert not history.canUndo
+    assert not history.commit()
+
+    # an edit of both canvases is one command
+    moved = neck.xy
+    neck.points = np.array([[5, 6]], dtype=float)
+    copy = head.copy()
+    right.shapes.append(copy)
+    assert history.commit()
+    left.shapes.remove(head)
+    history.commit()
+    neck.label = "HEADTOP"
+    history.commit()
+
+    changes = history.undo()
+    assert [change.canvas for change in changes] == [left]
+    assert neck.label == "NECK"
+    changes = history.undo()
+    assert left.shapes == [neck, head]
+    assert [shape for _, shape, _ in changes[0].added] == [head]
+    changes = history.undo()
+    assert len(changes) == 2
+    assert neck.xy.tolist() == moved.tolist()
+    assert right.shapes == []
+    assert not history.canUndo
+
+    history.redo()
+    history.redo()
+    assert left.shapes == [neck]
+    assert right.shapes == [copy]
+    assert neck.xy.tolist() == [[5, 6]]
+    assert history.canRedo
+    # a new edit drops what could be redone
+    neck.flags["occluded"] = True
+    assert history.commit()
+    assert not history.canRedo
+    history.undo()
+    assert neck.flags == {}
+
+    history.reset()
+    assert not history.canUndo
+
+
+def test_ShapeHistory_max_size():
+    shape = _shape("NECK", 0, 0)
+    canvas = _Canvas([shape])
+    history = ShapeHistory(max_size=2000)
+    history.addCanvas(canvas)
+    for i in range(100):
+        shape.points = np.array([[i, i]], dtype=float)
+        history.commit()
+    assert 0 < history._size <= 2000
+    while history.canUndo:
+        history.undo()
+    assert shape.xy.tolist()[0][0] > 0
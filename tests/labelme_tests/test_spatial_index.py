@@ -0,0 +1,55 @@
+import random
+
+from qtpy import QtCore
+
+from labelme.shape import Shape
+from labelme.spatial_index import ShapeGrid
+
+
+def _hit(shapes, point, epsilon):
+    # the test of Canvas.mouseMoveEvent
+    for shape in shapes:
+        if (
+            shape.nearestVertex(point, epsilon) is not None
+            or (
+                shape.nearestEdge(point, epsilon) is not None
+                and shape.canAddPoint()
+            )
+            or shape.containsPoint(point)
+        ):
+            return shape
+    return None
+
+
+def _random_shape(rng):
+    shape_type = rng.choice(
+        ["polygon", "rectangle", "point", "circle", "linestrip"]
+    )
+    num_points = dict(polygon=5, linestrip=4, point=1).get(shape_type, 2)
+    x, y = rng.uniform(0, 1200), rng.uniform(0, 700)
+    shape = Shape(shape_type=shape_type)
+    for _ in range(num_points):
+        shape.addPoint(
+            QtCore.QPointF(x + rng.uniform(-80, 80), y + rng.uniform(-80, 80))
+        )
+    return shape
+
+
+def test_ShapeGrid():
+    rng = random.Random(0)
+    shapes = [_random_shape(rng) for _ in range(60)]
+    grid = ShapeGrid()
+    for i in range(300):
+        if i % 50 == 0:
+            shapes.pop(rng.randrange(len(shapes)))
+            shapes.insert(rng.randrange(len(shapes)), _random_shape(rng))
+        if i % 10 == 0:
+            shapes[rng.randrange(len(shapes))].moveBy(
+                QtCore.QPointF(rng.uniform(-100, 100), 0)
+            )
+        point = QtCore.QPointF(rng.uniform(0, 1280), rng.uniform(0, 720))
+        epsilon = rng.choice([1, 10, 200])
+        grid.sync(shapes)
+        assert _hit(grid.query(point, epsilon), point, epsilon) is _hit(
+            list(reversed(shapes)), point, epsilon
+        )
@@ -0,0 +1,72 @@
+import csv
+import json
+import os.path as osp
+import sys
+
+import cv2
+import numpy as np
+
+from labelme.cli import validate
+from labelme.keypoint_store import JOINTS
+
+
+def test_validate(tmpdir, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmpdir))
+    root = tmpdir.mkdir("data")
+    for i in range(2):
+        prefix = osp.join(str(root), "patient000_{}_".format(i))
+        cv2.imwrite(prefix + "color.jpg", np.zeros((40, 60, 3), np.uint8))
+        cv2.imwrite(prefix + "depth.png", np.zeros((30, 50), np.uint16))
+
+    shapes = [
+        dict(label=label, points=[[1, 1]], shape_type="point", flags={})
+        for label in JOINTS
+    ]
+    shapes_depth = [dict(shape) for shape in shapes]
+    shapes_depth[0] = dict(shapes_depth[0], points=[[55, 10]])
+    shapes_depth[1] = dict(shapes_depth[1], points=None)
+    shapes_depth.append(dict(shapes_depth[2]))
+    with open(osp.join(str(root), "patient000_0_label.json"), "w") as f:
+        json.dump(
+            dict(
+                shapes_rgb=shapes,
+                shapes_depth=shapes_depth,
+                calibrationExist=True,
+            ),
+            f,
+        )
+    with open(osp.join(str(root), "patient000_1_label.json"), "w") as f:
+        f.write("{")
+
+    out = osp.join(str(tmpdir), "report.json")
+    monkeypatch.setattr(
+        sys, "argv", ["x", str(root), "-o", out, "--workers", "1"]
+    )
+    validate.main()
+
+    with open(out) as f:
+        report = json.load(f)
+    assert report["files"] == 2
+    assert report["counts"] == {
+        "calibration_mismatch": 1,
+        "duplicate_label": 1,
+        "missing_joint": 1,
+        "out_of_bounds": 1,
+        "too_many_labels": 1,
+        "unparseable": 1,
+    }
+    issues = {issue["issue"]: issue for issue in report["issues"]}
+    assert issues["unparseable"]["file"] == "patient000_1_label.json"
+    assert issues["missing_joint"]["detail"] == JOINTS[1]
+    assert issues["out_of_bounds"]["view"] == "depth"
+
+    out = osp.join(str(tmpdir), "report.csv")
+    monkeypatch.setattr(
+        sys, "argv", ["x", str(root), "-o", out, "--workers", "1"]
+    )
+    validate.main()
+
+    with open(out) as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["file", "view", "issue", "detail"]
+    assert len(rows) == 7
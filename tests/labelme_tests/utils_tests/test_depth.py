@@ -0,0 +1,79 @@
+import os
+import timeit
+
+import cv2
+import numpy as np
+import pytest
+
+from labelme.utils import depth as depth_module
+
+
+def _legacy_render(depth):
+    # the sort based path MainWindow used before DepthRenderer
+    data = depth.copy()
+    flat_data = np.sort(data.flatten())
+    flat_data = flat_data[: int(0.97 * flat_data.size)]
+    thresh = np.uint16(np.mean(flat_data) + 3 * np.std(flat_data))
+
+    data[data > thresh] = thresh
+    min_value = np.min(data)
+    max_value = np.max(data)
+    data = np.uint8((data - min_value) * 255.0 / (max_value - min_value))
+    data = cv2.applyColorMap(data, colormap=cv2.COLORMAP_BONE)
+    data = cv2.applyColorMap(
+        cv2.convertScaleAbs(data, alpha=1), cv2.COLORMAP_BONE
+    )
+    return thresh, data
+
+
+def _random_depth(height, width):
+    random_state = np.random.RandomState(1234)
+    depth = random_state.normal(2000, 300, (height, width))
+    depth[random_state.rand(height, width) < 0.05] = 0
+    depth[random_state.rand(height, width) < 0.01] = 65535
+    return depth.clip(0, 65535).astype(np.uint16)
+
+
+def test_depth_threshold():
+    depth = _random_depth(64, 48)
+    thresh, _ = _legacy_render(depth)
+    assert depth_module.depth_threshold(depth) == thresh
+    assert depth_module.depth_threshold(depth[:1, :1]) == 0
+
+
+def test_DepthRenderer_render():
+    renderer = depth_module.DepthRenderer()
+    for height, width in [(576, 640), (1024, 1024)]:
+        depth = _random_depth(height, width)
+        _, expected = _legacy_render(depth)
+        preview = renderer.render(depth)
+        np.testing.assert_array_equal(preview, expected)
+
+    # the output buffer is reused for frames of the same size
+    assert renderer.render(depth) is preview
+
+    flat = np.full((4, 4), 1000, dtype=np.uint16)
+    assert (renderer.render(flat) == depth_module._bone_lut()[0]).all()
+
+
+@pytest.mark.skipif(
+    not os.environ.get("LABELME_BENCHMARK"),
+    reason="set LABELME_BENCHMARK=1 to run the benchmarks",
+)
+def test_DepthRenderer_benchmark():
+    # run with: LABELME_BENCHMARK=1 pytest -s -k benchmark
+    renderer = depth_module.DepthRenderer()
+    for height, width in [(576, 640), (1024, 1024)]:
+        depth = _random_depth(height, width)
+        renderer.render(depth)
+        legacy = min(
+            timeit.repeat(lambda: _legacy_render(depth), number=1, repeat=10)
+        )
+        current = min(
+            timeit.repeat(lambda: renderer.render(depth), number=1, repeat=10)
+        )
+        print(
+            "{}x{}: legacy {:.1f} ms, DepthRenderer {:.1f} ms".format(
+                width, height, legacy * 1000, current * 1000
+            )
+        )
@@ -1,3 +1,4 @@
+import base64
 import os.path as osp
 
 import numpy as np
@@ -29,3 +30,36 @@ def test_img_data_to_png_data():
         img_data = f.read()
     png_data = image_module.img_data_to_png_data(img_data)
     assert isinstance(png_data, bytes)
+
+
+def test_load_image_file(tmpdir):
+    from labelme.label_file import LabelFile
+
+    img_file = osp.join(str(tmpdir), "patient000_color.jpg")
+    PIL.Image.fromarray(np.zeros((24, 32, 3), dtype=np.uint8)).save(img_file)
+    assert image_module.get_exif_orientation(PIL.Image.open(img_file)) is None
+
+    # nothing to transpose, so the file is not re-encoded
+    with open(img_file, "rb") as f:
+        assert LabelFile.load_image_file(img_file) == f.read()
+
+
+def test_img_file_to_size(tmpdir):
+    img_pil = PIL.Image.fromarray(np.zeros((24, 32, 3), dtype=np.uint8))
+    exif = PIL.Image.Exif()
+    exif[0x010E] = "x" * 5000  # segments before the frame are skipped
+    for ext, kwargs in [
+        ("png", {}),
+        ("jpg", {}),
+        ("jpg", dict(progressive=True, exif=exif.tobytes())),
+        ("bmp", {}),
+    ]:
+        img_file = osp.join(str(tmpdir), "img." + ext)
+        img_pil.save(img_file, **kwargs)
+        assert image_module.img_file_to_size(img_file) == (32, 24)
+        with open(img_file, "rb") as f:
+            img_data = f.read()
+        assert image_module.img_data_to_size(img_data) == (32, 24)
+
+    img_data = image_module.img_arr_to_b64(np.zeros((5, 7), dtype=np.uint16))
+    assert image_module.img_data_to_size(base64.b64decode(img_data)) == (7, 5)
@@ -0,0 +1,122 @@
+from qtpy import QtCore
+from qtpy import QtGui
+
+from labelme.shape import Shape
+from labelme.widgets import Canvas
+
+
+def _mouseMove(canvas, x, y, buttons=QtCore.Qt.NoButton):
+    canvas.mouseMoveEvent(
+        QtGui.QMouseEvent(
+            QtCore.QEvent.MouseMove,
+            QtCore.QPointF(x, y),
+            QtCore.Qt.NoButton,
+            buttons,
+            QtCore.Qt.NoModifier,
+        )
+    )
+
+
+def test_Canvas_updateOverlay(qtbot):
+    canvas = Canvas()
+    canvas.resize(320, 240)
+    image = QtGui.QImage(320, 240, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor(40, 40, 40))
+    canvas.loadPixmap(QtGui.QPixmap.fromImage(image))
+    shapes = []
+    for i, (x, y) in enumerate([(50, 50), (150, 100), (250, 200)]):
+        shape = Shape(label="JOINT{}".format(i), shape_type="point")
+        shape.addPoint(QtCore.QPointF(x, y))
+        shapes.append(shape)
+    canvas.loadShapes(shapes)
+    qtbot.addWidget(canvas)
+    canvas.show()
+
+    rects = []
+    update = canvas.update
+
+    def update_rect(*args):
+        rects.append(args[0] if args else canvas.rect())
+        update(*args)
+
+    canvas.update = update_rect
+
+    # hover a joint, drag it and leave it
+    _mouseMove(canvas, 150, 100)
+    assert canvas.hShape is shapes[1]
+    canvas.selectShapes([shapes[1]])
+    canvas.prevPoint = QtCore.QPointF(150, 100)
+    screen = QtGui.QImage(320, 240, QtGui.QImage.Format_ARGB32)
+    canvas.render(screen)
+    del rects[:]
+    for i in range(10):
+        _mouseMove(canvas, 150 + i * 5, 100 + i * 3, QtCore.Qt.LeftButton)
+    assert all(rect.width() < 160 and rect.height() < 120 for rect in rects)
+    _mouseMove(canvas, 10, 10)
+    assert shapes[1].points == [QtCore.QPointF(195, 127)]
+
+    # what the overlay updates repaint matches a repaint of it all
+    region = QtGui.QRegion()
+    for rect in rects:
+        region += rect
+    painter = QtGui.QPainter(screen)
+    canvas.render(painter, region.boundingRect().topLeft(), region)
+    painter.end()
+    expected = QtGui.QImage(320, 240, QtGui.QImage.Format_ARGB32)
+    canvas.render(expected)
+    assert screen == expected
+
+
+def test_Canvas_hover(qtbot):
+    canvas = Canvas()
+    canvas.resize(320, 240)
+    image = QtGui.QImage(320, 240, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor(40, 40, 40))
+    canvas.loadPixmap(QtGui.QPixmap.fromImage(image))
+    shape = Shape(label="JOINT", shape_type="point")
+    shape.addPoint(QtCore.QPointF(150, 100))
+    canvas.loadShapes([shape])
+    qtbot.addWidget(canvas)
+    canvas.show()
+
+    screen = QtGui.QImage(320, 240, QtGui.QImage.Format_ARGB32)
+    canvas.render(screen)
+    static = canvas._static
+    assert static is not None
+
+    # hovering a shape paints its highlight over the static layer, which
+    # is not rendered again
+    _mouseMove(canvas, 150, 100)
+    assert canvas.hShape is shape
+    hovered = QtGui.QImage(320, 240, QtGui.QImage.Format_ARGB32)
+    canvas.render(hovered)
+    assert canvas._static is static
+    assert hovered != screen
+
+    _mouseMove(canvas, 10, 10)
+    assert canvas.hShape is None
+    left = QtGui.QImage(320, 240, QtGui.QImage.Format_ARGB32)
+    canvas.render(left)
+    assert canvas._static is static
+    assert left == screen
+
+
+def test_Canvas_mergeShapes(qtbot):
+    canvas = Canvas()
+    qtbot.addWidget(canvas)
+
+    def point(label, x):
+        shape = Shape(label=label, shape_type="point")
+        shape.addPoint(QtCore.QPointF(x, x))
+        return shape
+
+    neck, head = point("NECK", 1), point("HEAD", 2)
+    canvas.loadShapes([neck, head])
+    head2, nose = point("HEAD", 3), point("NOSE", 4)
+    assert canvas.mergeShapes([nose, head2]) == [None, head]
+    # replaced shapes keep their place
+    assert canvas.shapes == [neck, head2, nose]
+
+    assert canvas.storeShapes()
+    canvas.history.undo()
+    assert canvas.shapes == [neck, head]
@@ -0,0 +1,74 @@
+from qtpy.QtCore import Qt
+
+from labelme.widgets import FileListWidget
+
+
+def test_FileListWidget(qtbot):
+    widget = FileListWidget()
+    qtbot.addWidget(widget)
+
+    names = ["patient{:03d}_color.jpg".format(i) for i in range(5)]
+    widget.addFiles(names[:3], [True, False, False])
+    widget.addFiles(names[3:], [False, True])
+    assert widget.count() == 5
+    assert widget.names() == names
+    assert widget.row(names[3]) == 3
+    assert widget.row("missing.jpg") == -1
+
+    index = widget.model().index(0)
+    assert widget.model().data(index, Qt.CheckStateRole) == Qt.Checked
+    widget.setChecked(names[1], True)
+    assert widget.isChecked(names[1])
+
+    with qtbot.waitSignal(widget.itemSelectionChanged):
+        widget.setCurrentRow(2)
+    assert widget.currentRow() == 2
+    assert widget.selectedRows() == [2]
+
+    widget.clear()
+    assert widget.count() == 0
+    assert widget.row(names[0]) == -1
+
+
+def test_FileListWidget_setFilter(qtbot):
+    widget = FileListWidget()
+    qtbot.addWidget(widget)
+
+    names = [
+        "patient001_a_color.jpg",
+        "patient002_a_color.jpg",
+        "patient012_b_color.jpg",
+    ]
+    widget.addFiles(names, [False, True, False])
+    widget.setCurrentRow(1)
+
+    with qtbot.assertNotEmitted(widget.itemSelectionChanged):
+        widget.setFilter("PATIENT00")
+    assert widget.names() == names[:2]
+    assert widget.currentRow() == 1
+
+    widget.setFilter("patient002")
+    assert widget.names() == [names[1]]
+    assert widget.isChecked(names[1])
+
+    widget.setFilter("*_a_*", mode="glob")
+    assert widget.names() == names[:2]
+    widget.setFilter(r"patient0\d2", mode="regex")
+    assert widget.names() == names[1:]
+
+    # a hidden file keeps the flag set while it is filtered out
+    with qtbot.assertNotEmitted(widget.model().dataChanged):
+        widget.setChecked(names[0], True)
+    assert widget.isChecked(names[0])
+
+    # files appended later are filtered too
+    widget.addFiles(["patient022_color.jpg", "other.jpg"], [False, False])
+    assert widget.row("patient022_color.jpg") == 2
+    assert widget.row("other.jpg") == -1
+
+    widget.setFilter("")
+    assert widget.count() == 5
+    assert (
+        widget.model().data(widget.model().index(0), Qt.CheckStateRole)
+        == Qt.Checked
+    )
@@ -1,5 +1,13 @@
 # -*- encoding: utf-8 -*-
 
+import os
+import timeit
+
+import pytest
+from qtpy import QtCore
+from qtpy.QtCore import Qt
+
+from labelme.shape import Shape
 from labelme.widgets import LabelListWidget
 from labelme.widgets import LabelListWidgetItem
 
@@ -15,3 +23,85 @@ def test_LabelListWidget(qtbot):
     widget.show()
     qtbot.addWidget(widget)
     qtbot.waitForWindowShown(widget)
+
+
+def test_LabelListWidget_findItemByShape(qtbot):
+    widget = LabelListWidget()
+    qtbot.addWidget(widget)
+    shapes = [Shape(label=str(i)) for i in range(300)]
+    for shape in shapes:
+        widget.addItem(LabelListWidgetItem(shape.label, shape))
+
+    # selecting all the shapes looks each one up, which scanned the rows
+    model = widget.model()
+    assert model.shapeItems == {
+        shape: widget[row] for row, shape in enumerate(shapes)
+    }
+    for shape in shapes:
+        assert widget.findItemByShape(shape).shape() is shape
+
+    widget.removeItem(widget.findItemByShape(shapes[0]))
+    with pytest.raises(ValueError):
+        widget.findItemByShape(shapes[0])
+    widget.moveItem(widget.findItemByShape(shapes[1]), 10)
+    assert widget[10].shape() is shapes[1]
+    assert widget.findItemByShape(shapes[1]) is widget[10]
+
+    # drag and drop inserts a copy of the row and removes the old one
+    model.dropMimeData(
+        model.mimeData([model.index(0, 0)]),
+        Qt.MoveAction,
+        5,
+        0,
+        QtCore.QModelIndex(),
+    )
+    model.removeRows(0, 1)
+    dropped = widget[4].shape()
+    assert dropped.label == "2"
+    assert widget.findItemByShape(dropped) is widget[4]
+    with pytest.raises(ValueError):
+        widget.findItemByShape(shapes[2])
+
+    widget.clear()
+    with pytest.raises(ValueError):
+        widget.findItemByShape(shapes[3])
+
+
+def _scanItem(widget, shape):
+    # the row scan findItemByShape did before the shape map
+    model = widget.model()
+    for row in range(model.rowCount()):
+        item = model.item(row, 0)
+        if item.shape() == shape:
+            return item
+    raise ValueError("cannot find shape: {}".format(shape))
+
+
+@pytest.mark.skipif(
+    not os.environ.get("LABELME_BENCHMARK"),
+    reason="set LABELME_BENCHMARK=1 to run the benchmarks",
+)
+def test_LabelListWidget_findItemByShape_benchmark(qtbot):
+    # run with: LABELME_BENCHMARK=1 pytest -s -k benchmark
+    for rows in [300, 1000]:
+        widget = LabelListWidget()
+        qtbot.addWidget(widget)
+        shapes = [Shape(label=str(i)) for i in range(rows)]
+        for shape in shapes:
+            widget.addItem(LabelListWidgetItem(shape.label, shape))
+
+        def lookup():
+            for shape in shapes:
+                widget.findItemByShape(shape)
+
+        def scan():
+            for shape in shapes:
+                _scanItem(widget, shape)
+
+        mapped = min(timeit.repeat(lookup, number=1, repeat=5))
+        scanned = min(timeit.repeat(scan, number=1, repeat=5))
+        print(
+            "{} rows: row scan {:.1f} ms, shape map {:.1f} ms".format(
+                rows, scanned * 1000, mapped * 1000
+            )
+        )